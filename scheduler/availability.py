@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from typing import List
+
+from model import Slot, Event
+from tables import SlotTable, AvailabilityTable
+
+import numpy as np
+
+# =========== #
+# FEASIBILITY #                         MARK: Feasibility
+# =========== #
+
+@dataclass
+class Feasibility:
+    """Which slots each event may use, answered with one array lookup
+
+    Events with the same windows see the same slots, so instead of an
+    event x slot bitmap there is one row per distinct mask (a class) and every
+    event points at its row. Events without windows all share one class.
+    """
+    event_class: np.ndarray;    # int32, per event, row of allowed
+    allowed: np.ndarray;        # bool, (classes, slots + 1), the last column is the out-of-space sentinel
+
+    @property
+    def n_classes(self) -> int:
+        return len(self.allowed);
+
+    def allows(self, event: int, slot: int) -> bool:
+        return bool(self.allowed[self.event_class[event], slot]);
+
+def merge_windows(starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Sorted windows with overlapping or touching ones joined, so a slot is never split between two"""
+    merged_starts, merged_ends = [int(starts[0])], [int(ends[0])];
+    for start, end in zip(starts[1:].tolist(), ends[1:].tolist()):
+        if start <= merged_ends[-1]:
+            merged_ends[-1] = max(merged_ends[-1], end);
+        else:
+            merged_starts.append(start);
+            merged_ends.append(end);
+
+    return (np.array(merged_starts, dtype=np.int64), np.array(merged_ends, dtype=np.int64));
+
+def build_feasibility(slot_start: np.ndarray, slot_end: np.ndarray, n_events: int, windows: AvailabilityTable) -> Feasibility:
+    """An event may use a slot when the slot (from slot_start on) lies inside one of its windows"""
+    n_slots = len(slot_start);
+
+    anywhere = np.ones(n_slots + 1, dtype=bool);
+    anywhere[n_slots] = False;
+
+    masks = [anywhere];
+    event_class = np.zeros(n_events, dtype=np.int32);
+
+    if len(windows):
+        boundaries = np.flatnonzero(np.diff(windows.event)) + 1;
+        for group in np.split(np.arange(len(windows)), boundaries):
+            starts, ends = merge_windows(windows.start[group], windows.end[group]);
+
+            # only the last window starting at or before the slot can hold it
+            position = np.searchsorted(starts, slot_start, side='right') - 1;
+            inside = (position >= 0) & (slot_end <= ends[np.maximum(position, 0)]);
+
+            event_class[windows.event[group[0]]] = len(masks);
+            masks.append(np.append(inside, False));
+
+    allowed, inverse = np.unique(np.array(masks), axis=0, return_inverse=True);
+
+    return Feasibility(inverse.reshape(-1)[event_class].astype(np.int32), allowed);
+
+def feasibility_of(slots: List[Slot], events: List[Event]) -> Feasibility:
+    """build_feasibility straight from the models"""
+    table = SlotTable.from_models(slots);
+    return build_feasibility(table.adj_start, table.end, len(events), AvailabilityTable.from_models(events));
@@ -0,0 +1,441 @@
+"""Benchmarks for the optimizers, run from the repo root:
+
+    python scheduler/benchmark.py suite --out bench.json
+    python scheduler/benchmark.py compare old.json new.json
+    python scheduler/benchmark.py parallel --events 500 --slots 2000 --workers 1 2 4
+    python scheduler/benchmark.py writes --rows 20000
+    python scheduler/benchmark.py queryplan
+    python scheduler/benchmark.py team --people 50 --workers 0 4
+    python scheduler/benchmark.py rolling --method genetic --window 14
+    python scheduler/benchmark.py encodings --horizon month --events 100
+"""
+from argparse import ArgumentParser
+from dataclasses import asdict
+from json import dump, load
+from platform import python_version
+from random import Random
+from subprocess import run
+from sys import exit
+from tempfile import TemporaryDirectory
+from tracemalloc import get_traced_memory, start as start_tracing, stop as stop_tracing
+from typing import Dict, List
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from model import Slot, Event
+from database import SchedulerStorage
+from optimize import ENGINES, EngineOptions, best_index, run_engine, schedule_with_nsga2
+from exact import EXACT_LIMIT, score
+from team import partition, solve_team
+import routes.cal_routes as cal
+
+import numpy as np
+from pymoo.core.callback import Callback
+
+HORIZONS: Dict[str, int] = {'week': 7, 'month': 30, 'year': 365};
+SLOTS_PER_DAY = 4;
+
+# ========== #
+# GENERATORS #                          MARK: Generators
+# ========== #
+
+def synthetic_calendar(n_events: int, n_slots: int, seed: int = 0, start: datetime = datetime(2030, 1, 7, 8, 0)) -> tuple[List[Slot], List[Event]]:
+    """Seeded slots and events, ordered the same way Scheduler.load_data orders them"""
+    rng = Random(seed);
+    horizon_days = max(1, n_slots // SLOTS_PER_DAY);
+
+    slots: List[Slot] = [];
+    for index in range(n_slots):
+        day, part = divmod(index, SLOTS_PER_DAY);
+        slot_start = start + timedelta(days=day, hours=3 * part, minutes=rng.choice([0, 15, 30]));
+        slot_end = slot_start + timedelta(minutes=rng.choice([30, 60, 90, 120, 150]));
+        slots.append(Slot(slot_start, slot_end, rng.randint(1, 5), index + 1, 0));
+
+    events: List[Event] = [];
+    for index in range(n_events):
+        min_time = rng.choice([15, 30, 45, 60, 90]);
+        max_time = min_time + rng.choice([0, 15, 30, 60]);
+        due_date = start + timedelta(days=rng.randint(1, horizon_days), hours=rng.randint(0, 12));
+        events.append(Event(None, None, rng.randint(1, 5), timedelta(minutes=min_time), timedelta(minutes=max_time), due_date, index + 1));
+
+    slots.sort(key=lambda slot: (slot.priority, slot.start));
+    events.sort(key=lambda event: (-event.priority, event.due_date));
+
+    return (slots, events);
+
+def horizon_calendar(horizon: str, n_events: int, seed: int = 0) -> tuple[List[Slot], List[Event]]:
+    """SLOTS_PER_DAY slots a day over a named horizon, events due anywhere inside it"""
+    return synthetic_calendar(n_events, HORIZONS[horizon] * SLOTS_PER_DAY, seed);
+
+def team_calendar(n_people: int, team_size: int, events_per_person: int, meetings: float, seed: int = 0, start: datetime = datetime(2030, 1, 7, 8, 0)) -> tuple[List[Slot], List[Event]]:
+    """A month for n_people in teams of team_size; a `meetings` share of events needs 2-4 people of one team"""
+    rng = Random(seed);
+    days = HORIZONS['month'];
+
+    slots: List[Slot] = [];
+    for person in range(1, n_people + 1):
+        person_slots, _ = synthetic_calendar(0, days * SLOTS_PER_DAY, seed + person, start);
+        for slot in person_slots:
+            slot.id = len(slots) + 1;
+            slot.person_id = person;
+            slots.append(slot);
+
+    events: List[Event] = [];
+    for index in range(n_people * events_per_person):
+        person = rng.randint(1, n_people);
+        attendees = [person];
+        if rng.random() < meetings:
+            team = range((person - 1) // team_size * team_size + 1, min(n_people, ((person - 1) // team_size + 1) * team_size) + 1);
+            attendees = rng.sample(list(team), min(len(team), rng.randint(2, 4)));
+
+        min_time = rng.choice([15, 30, 45, 60]);
+        due_date = start + timedelta(days=rng.randint(1, days), hours=rng.randint(0, 12));
+        events.append(Event(None, None, rng.randint(1, 5), timedelta(minutes=min_time), timedelta(minutes=min_time + rng.choice([0, 15, 30])), due_date, index + 1, attendees=attendees));
+
+    slots.sort(key=lambda slot: (slot.priority, slot.start));
+    events.sort(key=lambda event: (-event.priority, event.due_date));
+
+    return (slots, events);
+
+# ========== #
+# BENCHMARKS #                          MARK: Benchmarks
+# ========== #
+
+def bench_case(horizon: str, n_events: int, method: str, seed: int, memory: bool = True) -> dict:
+    """One engine on one generated calendar: wall time, evaluation rate, peak memory and objectives
+
+    Peak memory comes from a second, traced run so tracemalloc overhead stays out of the timings.
+    """
+    slots, events = horizon_calendar(horizon, n_events, seed);
+    _, report = run_engine(method, slots, events, EngineOptions());
+
+    peak = 0;
+    if memory:
+        slots, events = horizon_calendar(horizon, n_events, seed);
+        start_tracing();
+        run_engine(method, slots, events, EngineOptions());
+        _, peak = get_traced_memory();
+        stop_tracing();
+
+    return {
+        'horizon': horizon,
+        'events': n_events,
+        'slots': len(slots),
+        'seed': seed,
+        **asdict(report),
+        'evals_per_second': report.evaluations / report.seconds if report.seconds else 0.0,
+        'cache_hit_rate': report.cache_hit_rate,
+        'peak_mb': peak / 2**20,
+    };
+
+def bench_suite(horizons: List[str], sizes: List[int], methods: List[str], seed: int, out: str, memory: bool = True) -> None:
+    results = [];
+    print(f'{"horizon":>7} {"events":>6} {"method":>8} {"engine":>8} {"seconds":>9} {"evals/s":>10} {"peak MB":>8} {"late":>6} {"priority":>9} {"gap":>6}');
+
+    for horizon in horizons:
+        for n_events in sizes:
+            for method in methods:
+                case = bench_case(horizon, n_events, method, seed, memory);
+                results.append(case);
+                print(f'{horizon:>7} {n_events:>6} {method:>8} {case["engine"]:>8} {case["seconds"]:>9.3f} {case["evals_per_second"]:>10.1f} '
+                      f'{case["peak_mb"]:>8.1f} {case["num_late"]:>6.0f} {case["slot_priority"]:>9.2f} {case["gap"]:>6.2f}');
+
+    with open(out, 'w') as file:
+        dump({'meta': run_metadata(), 'results': results}, file, indent=2, default=float);
+    print(f'wrote {len(results)} results to {out}');
+
+def bench_compare(old: str, new: str) -> None:
+    """Per-case wall time and score of two suite result files"""
+    with open(old) as file: before = load(file);
+    with open(new) as file: after = load(file);
+
+    key = lambda case: (case['horizon'], case['events'], case['method']);
+    previous = {key(case): case for case in before['results']};
+
+    print(f'{before["meta"]["commit"][:10]} -> {after["meta"]["commit"][:10]}');
+    print(f'{"horizon":>7} {"events":>6} {"method":>8} {"seconds":>17} {"speedup":>8} {"score":>21}');
+    for case in after['results']:
+        if key(case) not in previous: continue;
+        was = previous[key(case)];
+        print(f'{case["horizon"]:>7} {case["events"]:>6} {case["method"]:>8} {was["seconds"]:>8.3f}->{case["seconds"]:<8.3f} '
+              f'{was["seconds"] / max(case["seconds"], 1e-9):>7.2f}x {was["score"]:>10.2f}->{case["score"]:<10.2f}');
+
+def run_metadata() -> dict:
+    commit = run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True);
+    return {
+        'commit': commit.stdout.strip() or 'unknown',
+        'date': datetime.now().isoformat(),
+        'python': python_version(),
+        'numpy': np.__version__,
+    };
+
+def bench_parallel(n_events: int, n_slots: int, workers: List[int], pool_kind: str, seed: int) -> None:
+    """Wall-clock time of a full NSGA2 run against worker count"""
+    print(f'{n_events} events, {n_slots} slots, {pool_kind} pool');
+    print(f'{"workers":>8} {"seconds":>10} {"speedup":>8}');
+
+    baseline = None;
+    for count in workers:
+        slots, events = synthetic_calendar(n_events, n_slots, seed);
+
+        began = perf_counter();
+        schedule_with_nsga2(slots, events, workers=count, pool_kind=pool_kind);
+        elapsed = perf_counter() - began;
+
+        baseline = baseline or elapsed;
+        print(f'{count:>8} {elapsed:>10.2f} {baseline / elapsed:>7.2f}x');
+
+def bench_team(n_people: int, team_size: int, events_per_person: int, meetings: float, method: str, workers: List[int], pool_kind: str, seed: int) -> None:
+    """Team scheduling wall time against worker count, clusters solved side by side"""
+    slots, events = team_calendar(n_people, team_size, events_per_person, meetings, seed);
+    clusters = partition(slots, events);
+    print(f'{n_people} people, {len(slots)} slots, {len(events)} events, {len(clusters)} clusters ({sum(cluster.joint for cluster in clusters)} joint), {pool_kind} pool');
+    print(f'{"workers":>8} {"seconds":>10} {"speedup":>8} {"late":>6} {"priority":>9}');
+
+    baseline = None;
+    for count in workers:
+        slots, events = team_calendar(n_people, team_size, events_per_person, meetings, seed);
+
+        began = perf_counter();
+        _, _, report = solve_team(partition(slots, events), method, EngineOptions(), count, pool_kind);
+        elapsed = perf_counter() - began;
+
+        baseline = baseline or elapsed;
+        print(f'{count:>8} {elapsed:>10.2f} {baseline / elapsed:>7.2f}x {report.num_late:>6.0f} {report.slot_priority:>9.2f}');
+
+def bench_query_plans(n_events: int, seed: int) -> bool:
+    """Check the calendar queries are served by an index and time them on a large history"""
+    rng = Random(seed);
+    start = datetime(2020, 1, 1, 8, 0);
+
+    with TemporaryDirectory() as directory:
+        storage = SchedulerStorage(f'{directory}/bench.db');
+        conn = storage.get_db_connection();
+        rows = [];
+        for index in range(n_events):
+            event_start = start + timedelta(days=rng.randint(0, 5 * 365), minutes=15 * rng.randint(0, 48));
+            rows.append((f'event {index}', event_start.isoformat(), (event_start + timedelta(minutes=30)).isoformat(),
+                         (event_start + timedelta(days=1)).isoformat(), 30, 60, rng.randint(1, 5), rng.randint(0, 1)));
+        conn.executemany("""
+            INSERT INTO events (name, start, end, due_date, min_time, max_time, priority, completed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows);
+        conn.commit();
+        conn.execute("ANALYZE");
+        conn.close();
+
+        queries = {
+            'month summary': (cal.DAILY_SUMMARY_QUERY, (*cal.month_days(2023, 6), None)),
+            'day events': (cal.DAY_EVENTS_QUERY, cal.day_bounds(2023, 6, 14)),
+            'week slots': (cal.WEEK_SLOTS_QUERY, (None, datetime(2023, 6, 11), datetime(2023, 6, 18))),
+        };
+
+        indexed = True;
+        for name, (query, params) in queries.items():
+            plan = storage.query_plan(query, params);
+            uses_index = all('USING' in detail and 'INDEX' in detail for detail in plan if detail.startswith(('SEARCH', 'SCAN')));
+
+            conn = storage.get_db_connection();
+            began = perf_counter();
+            for _ in range(100): conn.execute(query, params).fetchall();
+            elapsed = (perf_counter() - began) / 100;
+            conn.close();
+
+            indexed = indexed and uses_index;
+            print(f'{name:>13} {"ok" if uses_index else "SCAN":>5} {elapsed * 1000:>8.3f} ms  {" | ".join(plan)}');
+
+    return indexed;
+
+def bench_writes(n_rows: int, seed: int) -> None:
+    """Rows per second of per-row writes against the bulk storage writes"""
+    rng = Random(seed);
+    start = datetime(2030, 1, 7, 8, 0);
+    slots = sorted({(start + timedelta(days=index // 4, hours=3 * (index % 4)), start + timedelta(days=index // 4, hours=3 * (index % 4), minutes=90), rng.randint(1, 5)) for index in range(n_rows)});
+    end = slots[-1][0] + timedelta(days=1);
+
+    def timed(label: str, storage: SchedulerStorage, write) -> None:
+        conn = storage.get_db_connection();
+        cursor = conn.cursor();
+        began = perf_counter();
+        write(cursor);
+        conn.commit();
+        elapsed = perf_counter() - began;
+        conn.close();
+        print(f'{label:>32} {elapsed:>8.3f} s {n_rows / elapsed:>12.0f} rows/s');
+
+    with TemporaryDirectory() as directory:
+        storage = SchedulerStorage(f'{directory}/bench.db');
+
+        def slots_per_row(cursor):
+            cursor.execute("DELETE FROM slots WHERE start >= ? AND start < ?", (start, end));
+            for slot in slots:
+                cursor.execute("INSERT INTO slots (start, end, time_used, priority) VALUES (?, ?, 0, ?)", slot);
+
+        timed('slots, one INSERT per row', storage, slots_per_row);
+
+        conn = storage.get_db_connection();
+        conn.execute("DELETE FROM slots");
+        conn.commit();
+        conn.close();
+
+        timed('slots, replace_slots', storage, lambda cursor: storage.replace_slots(cursor, start, end, slots));
+        timed('slots, replace_slots unchanged', storage, lambda cursor: storage.replace_slots(cursor, start, end, slots));
+
+        conn = storage.get_db_connection();
+        conn.executemany("INSERT INTO events (name, due_date, min_time, max_time, priority) VALUES (?, ?, 30, 60, 3)",
+                         [(f'event {index}', end.isoformat()) for index in range(n_rows)]);
+        conn.commit();
+        conn.close();
+
+        placements = [(index + 1, slot[0].isoformat(), (slot[0] + timedelta(minutes=30)).isoformat()) for index, slot in enumerate(slots)];
+        slot_ids = [(index + 1, 30) for index in range(len(slots))];
+
+        def events_per_row(cursor):
+            for event_id, event_start, event_end in placements:
+                cursor.execute("UPDATE events SET start = ?, end = ? WHERE id = ?", (event_start, event_end, event_id));
+            for slot_id, used in slot_ids:
+                cursor.execute("UPDATE slots SET time_used = ? WHERE id = ?", (used, slot_id));
+
+        timed('events, one UPDATE per row', storage, events_per_row);
+        shifted = [(event_id, event_end, event_end) for event_id, _, event_end in placements];
+        timed('events, save_schedule', storage, lambda cursor: storage.save_schedule(cursor, shifted, slot_ids));
+        timed('events, save_schedule unchanged', storage, lambda cursor: storage.save_schedule(cursor, shifted, slot_ids));
+
+def bench_rolling(horizons: List[str], events_per_day: int, method: str, window_days: int, overlap_days: int, seed: int) -> None:
+    """The whole horizon at once against a rolling window, with the event count growing with the horizon"""
+    print(f'{method}, {events_per_day} events a day, {window_days} day window, {overlap_days} day overlap');
+    print(f'{"horizon":>7} {"events":>6} {"full s":>9} {"rolling s":>10} {"speedup":>8} {"full score":>11} {"rolling score":>14}');
+
+    for horizon in horizons:
+        n_events = events_per_day * HORIZONS[horizon];
+
+        slots, events = horizon_calendar(horizon, n_events, seed);
+        _, full = run_engine(method, slots, events, EngineOptions());
+
+        slots, events = horizon_calendar(horizon, n_events, seed);
+        _, rolling = run_engine(method, slots, events, EngineOptions(window_days=window_days, overlap_days=overlap_days));
+
+        print(f'{horizon:>7} {n_events:>6} {full.seconds:>9.3f} {rolling.seconds:>10.3f} {full.seconds / max(rolling.seconds, 1e-9):>7.2f}x '
+              f'{full.score:>11.2f} {rolling.score:>14.2f}');
+
+class ConvergenceCallback(Callback):
+    """Best score of the front after every generation, against evaluations so far"""
+    def __init__(self):
+        super().__init__();
+        self.history: List[tuple[int, float]] = [];
+
+    def notify(self, algorithm) -> None:
+        F, CV = algorithm.opt.get("F"), algorithm.opt.get("CV");
+        index = best_index(F, CV);
+        self.history.append((algorithm.evaluator.n_eval, float(score(CV[index, 0], F[index, 0]))));
+
+def bench_encodings(horizon: str, n_events: int, seeds: List[int], every: int) -> None:
+    """NSGA2 convergence per evaluation, random-key floats against permutations, averaged over seeds
+
+    Both start from the greedy schedule, whose score is printed as the baseline.
+    """
+    print(f'{horizon}, {n_events} events, seeds {seeds}');
+    greedy = [run_engine('greedy', *horizon_calendar(horizon, n_events, seed), EngineOptions(local_search=0))[1].score for seed in seeds];
+    print(f'greedy score {np.mean(greedy):.1f}');
+    curves: Dict[str, List[List[tuple[int, float]]]] = {'random_key': [], 'permutation': []};
+    seconds: Dict[str, float] = {encoding: 0.0 for encoding in curves};
+
+    for encoding in curves:
+        for seed in seeds:
+            slots, events = horizon_calendar(horizon, n_events, seed);
+            callback = ConvergenceCallback();
+            _, report = run_engine('genetic', slots, events, EngineOptions(callback=callback, encoding=encoding));
+            curves[encoding].append(callback.history);
+            seconds[encoding] += report.seconds / len(seeds);
+
+    print(f'{"generation":>10} ' + ' '.join(f'{encoding + " evals":>17} {"score":>10}' for encoding in curves));
+    longest = max(len(history) for runs in curves.values() for history in runs);
+    for generation in list(range(0, longest, every)) + [longest - 1]:
+        row = [];
+        for runs in curves.values():
+            # a run that stopped early keeps its last value
+            points = [history[min(generation, len(history) - 1)] for history in runs];
+            row.append(f'{np.mean([evals for evals, _ in points]):>17.0f} {np.mean([value for _, value in points]):>10.1f}');
+        print(f'{generation + 1:>10} ' + ' '.join(row));
+
+    print('seconds    ' + ' '.join(f'{seconds[encoding]:>17.3f} {"":>10}' for encoding in curves));
+
+# =========== #
+# DRIVER CODE #
+# =========== #
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__.splitlines()[0]);
+    commands = parser.add_subparsers(dest='command', required=True);
+
+    suite = commands.add_parser('suite', help='every engine over generated week/month/year calendars');
+    suite.add_argument('--horizons', nargs='+', choices=list(HORIZONS), default=list(HORIZONS));
+    # EXACT_LIMIT is the largest size the exact engine solves itself rather than handing over;
+    # 10000 takes NSGA2 a few minutes per horizon, pass --events to leave it out
+    suite.add_argument('--events', type=int, nargs='+', default=[EXACT_LIMIT, 10, 100, 1000, 10000]);
+    suite.add_argument('--methods', nargs='+', choices=list(ENGINES), default=list(ENGINES));
+    suite.add_argument('--seed', type=int, default=0);
+    suite.add_argument('--out', default='bench.json');
+    suite.add_argument('--no-memory', dest='memory', action='store_false', help='skip the traced peak memory run');
+
+    compare = commands.add_parser('compare', help='compare two suite result files');
+    compare.add_argument('old');
+    compare.add_argument('new');
+
+    parallel = commands.add_parser('parallel', help='NSGA2 wall time against worker count');
+    parallel.add_argument('--events', type=int, default=500);
+    parallel.add_argument('--slots', type=int, default=2000);
+    parallel.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8]);
+    parallel.add_argument('--pool', choices=['process', 'thread'], default='process');
+    parallel.add_argument('--seed', type=int, default=0);
+
+    writes = commands.add_parser('writes', help='per-row against bulk slot and schedule writes');
+    writes.add_argument('--rows', type=int, default=20_000);
+    writes.add_argument('--seed', type=int, default=0);
+
+    plans = commands.add_parser('queryplan', help='fail unless the calendar queries use an index');
+    plans.add_argument('--events', type=int, default=50_000);
+    plans.add_argument('--seed', type=int, default=0);
+
+    team = commands.add_parser('team', help='multi-person scheduling against worker count');
+    team.add_argument('--people', type=int, default=50);
+    team.add_argument('--team-size', type=int, default=5);
+    team.add_argument('--events', type=int, default=20, help='per person');
+    team.add_argument('--meetings', type=float, default=0.2, help='share of events with several attendees');
+    team.add_argument('--method', choices=list(ENGINES), default='greedy');
+    team.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4]);
+    team.add_argument('--pool', choices=['process', 'thread'], default='process');
+    team.add_argument('--seed', type=int, default=0);
+
+    rolling = commands.add_parser('rolling', help='whole-horizon against rolling-window solves');
+    rolling.add_argument('--horizons', nargs='+', choices=list(HORIZONS), default=list(HORIZONS));
+    rolling.add_argument('--events', type=int, default=3, help='per day');
+    rolling.add_argument('--method', choices=list(ENGINES), default='genetic');
+    rolling.add_argument('--window', type=int, default=14, help='days');
+    rolling.add_argument('--overlap', type=int, default=2, help='days');
+    rolling.add_argument('--seed', type=int, default=0);
+
+    encodings = commands.add_parser('encodings', help='NSGA2 convergence, random-key against permutation encoding');
+    encodings.add_argument('--horizon', choices=list(HORIZONS), default='month');
+    encodings.add_argument('--events', type=int, default=100);
+    encodings.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2]);
+    encodings.add_argument('--every', type=int, default=10, help='print every n generations');
+
+    args = parser.parse_args();
+
+    if args.command == 'suite':
+        bench_suite(args.horizons, args.events, args.methods, args.seed, args.out, args.memory);
+    elif args.command == 'compare':
+        bench_compare(args.old, args.new);
+    elif args.command == 'parallel':
+        bench_parallel(args.events, args.slots, args.workers, args.pool, args.seed);
+    elif args.command == 'writes':
+        bench_writes(args.rows, args.seed);
+    elif args.command == 'team':
+        bench_team(args.people, args.team_size, args.events, args.meetings, args.method, args.workers, args.pool, args.seed);
+    elif args.command == 'rolling':
+        bench_rolling(args.horizons, args.events, args.method, args.window, args.overlap, args.seed);
+    elif args.command == 'encodings':
+        bench_encodings(args.horizon, args.events, args.seeds, args.every);
+    elif args.command == 'queryplan':
+        exit(0 if bench_query_plans(args.events, args.seed) else 1);
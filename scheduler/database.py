@@ -1,10 +1,106 @@
-from sqlite3 import connect, Row
+from collections import Counter
+from queue import Empty, Full, LifoQueue
+from sqlite3 import connect, Connection, Row
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
 
 DB_PATH = "database.db";
+POOL_SIZE = 8;
+SQL_VARIABLES = 900;    # ids bound per IN (...), under SQLite's old 999 default
+
+# applied to every pooled connection; WAL itself is persistent and set once in _initialize_db
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",      # safe with WAL, skips an fsync per commit
+    "PRAGMA cache_size = -16000",       # 16 MB page cache
+    "PRAGMA mmap_size = 134217728",     # 128 MB memory mapped reads
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",       # wait on a writer instead of failing with "database is locked"
+);
+
+# ============= #
+# DAILY SUMMARY #                       MARK: Daily Summary
+# ============= #
+# per day counts and minutes kept up to date by triggers on events and slots,
+# so calendar views read a row per day instead of scanning the day's events
+
+PRIORITIES = range(1, 6);
+
+DAY = "substr({row}.start, 1, 10)";
+MINUTES = "coalesce(CAST(round((julianday({row}.end) - julianday({row}.start)) * 1440) AS INTEGER), 0)";
+
+# one row per day and person, NULL being the owner, whose calendar holds the events
+def _summary_change(table: str, row: str, sign: str) -> str:
+    """Statements adding (sign '+') or taking away (sign '-') one row of table from its day"""
+    day, minutes = DAY.format(row=row), MINUTES.format(row=row)
+    if table == 'events':
+        person = 'NULL'
+        changes = [f"priority_{p} = priority_{p} {sign} ({row}.completed = 0 AND {row}.priority = {p})" for p in PRIORITIES]
+        changes += [f"completed = completed {sign} ({row}.completed != 0)", f"scheduled_minutes = scheduled_minutes {sign} {minutes}"]
+    else:
+        person = f'{row}.person_id'
+        changes = [f"slot_minutes = slot_minutes {sign} {minutes}", f"used_minutes = used_minutes {sign} {row}.time_used"]
+
+    create = f"INSERT OR IGNORE INTO daily_summary (day, person_id) SELECT {day}, {person} WHERE {row}.start IS NOT NULL;" if sign == '+' else ''
+    return f"{create} UPDATE daily_summary SET {', '.join(changes)} WHERE day = {day} AND person_id IS {person};"
+
+def _summary_triggers(table: str, columns: str) -> str:
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_summary_insert AFTER INSERT ON {table}
+        BEGIN {_summary_change(table, 'NEW', '+')} END;
+
+        CREATE TRIGGER IF NOT EXISTS {table}_summary_delete AFTER DELETE ON {table}
+        BEGIN {_summary_change(table, 'OLD', '-')} END;
+
+        CREATE TRIGGER IF NOT EXISTS {table}_summary_update AFTER UPDATE OF {columns} ON {table}
+        BEGIN {_summary_change(table, 'OLD', '-')} {_summary_change(table, 'NEW', '+')} END;
+    """
+
+DAILY_SUMMARY_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS daily_summary (
+        day DATE NOT NULL,
+        person_id INTEGER DEFAULT NULL,
+        {' '.join(f'priority_{p} INTEGER NOT NULL DEFAULT 0,' for p in PRIORITIES)}
+        completed INTEGER NOT NULL DEFAULT 0,
+        scheduled_minutes INTEGER NOT NULL DEFAULT 0,
+        slot_minutes INTEGER NOT NULL DEFAULT 0,
+        used_minutes INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_summary_day ON daily_summary (day, ifnull(person_id, -1));
+    {_summary_triggers('events', 'start, end, priority, completed')}
+    {_summary_triggers('slots', 'start, end, time_used, person_id')}
+""";
+
+# a summary from before it was kept per person is rebuilt, triggers and all
+DROP_DAILY_SUMMARY = "DROP TABLE daily_summary;" + "".join(
+    f"DROP TRIGGER IF EXISTS {table}_summary_{change};" for table in ('events', 'slots') for change in ('insert', 'delete', 'update')
+);
+
+class PooledConnection:
+    """A sqlite3 connection on loan from the pool; close() hands it back instead of closing it"""
+    def __init__(self, conn: Connection, storage: 'SchedulerStorage'):
+        self._conn = conn
+        self._storage = storage
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *args):
+        return self._conn.__exit__(*args)
+
+    def close(self) -> None:
+        if self._conn is None: return
+        # never hand out a connection with someone else's half-done transaction
+        if self._conn.in_transaction: self._conn.rollback()
+        self._storage._release(self._conn)
+        self._conn = None
 
 class SchedulerStorage:
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, pool_size: int = POOL_SIZE):
         self.db_path = db_path
+        self._pool: LifoQueue = LifoQueue(maxsize=pool_size)
         self._initialize_db()
 
     def _initialize_db(self) -> None:
@@ -40,10 +136,239 @@ class SchedulerStorage:
                     FOREIGN KEY (event_id) REFERENCES events(id),
                     PRIMARY KEY (event_id, start, end)
                 );
+
+                CREATE INDEX IF NOT EXISTS idx_slots_start ON slots (start);
+                CREATE INDEX IF NOT EXISTS idx_events_start ON events (start);
+                CREATE INDEX IF NOT EXISTS idx_events_due_date ON events (due_date);
+                CREATE INDEX IF NOT EXISTS idx_events_completed ON events (completed, due_date);
+
+                CREATE TABLE IF NOT EXISTS dirty_marks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_id INTEGER DEFAULT NULL,
+                    start DATETIME DEFAULT NULL,
+                    end DATETIME DEFAULT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS people (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name VARCHAR(28) NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS event_attendees (
+                    event_id INTEGER,
+                    person_id INTEGER,
+                    FOREIGN KEY (event_id) REFERENCES events(id),
+                    FOREIGN KEY (person_id) REFERENCES people(id),
+                    PRIMARY KEY (event_id, person_id)
+                );
+
+                -- a week of slots repeating from valid_from on, expanded by recurrence.py
+                CREATE TABLE IF NOT EXISTS slot_templates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    person_id INTEGER DEFAULT NULL REFERENCES people(id),
+                    weekday INTEGER NOT NULL,
+                    start INTEGER NOT NULL,
+                    duration INTEGER NOT NULL,
+                    priority INTEGER NOT NULL,
+                    valid_from DATE NOT NULL,
+                    valid_until DATE DEFAULT NULL
+                );
+
+                -- days the templates skip, e.g. weeks saved by hand
+                CREATE TABLE IF NOT EXISTS slot_exceptions (
+                    person_id INTEGER DEFAULT NULL REFERENCES people(id),
+                    day DATE NOT NULL
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_slot_templates_person ON slot_templates (person_id, valid_from);
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_slot_exceptions_day ON slot_exceptions (day, ifnull(person_id, -1));
             """);
+
+            # slots belong to a person, NULL being the calendar's owner; older databases lack the column
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(slots)")]
+            if 'person_id' not in columns:
+                cursor.execute("ALTER TABLE slots ADD COLUMN person_id INTEGER DEFAULT NULL REFERENCES people(id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_slots_person_start ON slots (person_id, start)")
+
+            # older databases get the summary filled from what they already hold
+            summary_columns = [row[1] for row in cursor.execute("PRAGMA table_info(daily_summary)")]
+            if summary_columns and 'person_id' not in summary_columns: cursor.executescript(DROP_DAILY_SUMMARY)
+            cursor.executescript(DAILY_SUMMARY_SCHEMA)
+            if 'person_id' not in summary_columns: self.rebuild_daily_summary(cursor)
+
             conn.commit()
+            # readers keep going while the optimizer writes
+            conn.execute("PRAGMA journal_mode = WAL")
 
-    def get_db_connection(self):
-        conn = connect(self.db_path)
+    def get_db_connection(self) -> PooledConnection:
+        try:
+            conn = self._pool.get_nowait()
+        except Empty:
+            conn = self._connect()
+        return PooledConnection(conn, self)
+
+    def _connect(self) -> Connection:
+        # a pooled connection is only ever used by one thread at a time, but not always the same one
+        conn = connect(self.db_path, check_same_thread=False)
         conn.row_factory = Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
         return conn
+
+    def _release(self, conn: Connection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except Full:
+            conn.close()
+
+    def close(self) -> None:
+        """Close every idle pooled connection"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                return
+
+    def query_plan(self, query: str, params: tuple = ()) -> List[str]:
+        """EXPLAIN QUERY PLAN details, e.g. to check a query is served by an index"""
+        conn = self.get_db_connection()
+        try:
+            return [row['detail'] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+        finally:
+            conn.close()
+
+    # == BULK WRITES == #
+    # run on the caller's cursor so they share its transaction; the caller commits
+
+    def replace_slots(self, cursor, start: datetime, end: datetime, slots: List[tuple[datetime, datetime, int]], person_id: Optional[int] = None) -> bool:
+        """Make person_id's slots starting in [start, end) exactly `slots` (start, end, priority)
+
+        Slots that are already there are left alone, keeping their id and
+        time_used; slots are counted, so duplicate rows beyond what `slots`
+        asks for are removed. Returns whether anything changed.
+        """
+        cursor.execute("SELECT id, start, end, priority FROM slots WHERE person_id IS ? AND start >= ? AND start < ? ORDER BY id", (person_id, start, end))
+        existing: Dict[tuple[datetime, datetime, int], List[int]] = {}
+        for row in cursor.fetchall():
+            key = (datetime.fromisoformat(row['start']), datetime.fromisoformat(row['end']), row['priority'])
+            existing.setdefault(key, []).append(row['id'])
+        wanted = Counter(slots)
+
+        # the oldest rows of a slot are the ones kept
+        removed = [(slot_id,) for key, ids in existing.items() for slot_id in ids[wanted[key]:]]
+        added = [key for key, count in wanted.items() for _ in range(count - len(existing.get(key, [])))]
+
+        cursor.executemany("DELETE FROM slots WHERE id = ?", removed)
+        cursor.executemany("INSERT INTO slots (start, end, time_used, priority, person_id) VALUES (?, ?, 0, ?, ?)", [(*slot, person_id) for slot in sorted(added)])
+
+        return bool(removed or added)
+
+    def replace_templates(self, cursor, week_start: datetime, templates: List[tuple[int, int, int, int]], person_id: Optional[int] = None) -> None:
+        """Repeat (weekday, start minute, duration, priority) slots every week from week_start on
+
+        Templates that started earlier end at week_start, later ones are replaced.
+        """
+        valid_from = week_start.date().isoformat()
+        cursor.execute("DELETE FROM slot_templates WHERE person_id IS ? AND valid_from >= ?", (person_id, valid_from))
+        cursor.execute("""
+            UPDATE slot_templates SET valid_until = ?
+            WHERE person_id IS ? AND (valid_until IS NULL OR valid_until > ?)
+        """, (valid_from, person_id, valid_from))
+        cursor.executemany("""
+            INSERT INTO slot_templates (person_id, weekday, start, duration, priority, valid_from)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(person_id, *template, valid_from) for template in templates])
+
+    def skip_templates(self, cursor, start: datetime, end: datetime, person_id: Optional[int] = None) -> bool:
+        """Keep person_id's templates off the days in [start, end); returns whether any day was new"""
+        days = [(start + timedelta(days=offset)).date().isoformat() for offset in range((end - start).days)]
+        cursor.executemany("INSERT OR IGNORE INTO slot_exceptions (person_id, day) VALUES (?, ?)", [(person_id, day) for day in days])
+        return cursor.rowcount > 0
+
+    def save_schedule(self, cursor, placements: List[tuple[int, str, str]], time_used: List[tuple[int, int]]) -> List[str]:
+        """Write (event id, start, end) placements and (slot id, time_used); unchanged rows are not rewritten
+
+        Returns the old and new starts of the events that moved, for the views showing them.
+        """
+        ids = [event_id for event_id, _, _ in placements]
+        current = {}
+        for first in range(0, len(ids), SQL_VARIABLES):
+            chunk = ids[first:first + SQL_VARIABLES]
+            cursor.execute(f"SELECT id, start, end FROM events WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            current.update({row['id']: (row['start'], row['end']) for row in cursor.fetchall()})
+
+        moved = [(event_id, start, end) for event_id, start, end in placements if event_id in current and current[event_id] != (start, end)]
+        cursor.executemany("UPDATE events SET start = ?, end = ? WHERE id = ?", [(start, end, event_id) for event_id, start, end in moved])
+
+        cursor.executemany("""
+            UPDATE slots SET time_used = ?
+            WHERE id = ? AND time_used != ?
+        """, [(used, slot_id, used) for slot_id, used in time_used])
+
+        return [start for event_id, start, _ in moved if start] + [current[event_id][0] for event_id, _, _ in moved if current[event_id][0]]
+
+    def event_start(self, cursor, event_id: int) -> Optional[str]:
+        """Where an event is scheduled, None when it is not (or does not exist)"""
+        cursor.execute("SELECT start FROM events WHERE id = ?", (event_id,))
+        row = cursor.fetchone()
+        return row['start'] if row else None
+
+    def set_attendees(self, cursor, event_id: int, person_ids: List[Optional[int]]) -> None:
+        """Replace who has to attend an event; None is the calendar's owner, and nobody means the owner alone"""
+        people = set(person_ids)
+        # the owner alone is an ordinary event of the owner's
+        if people == {None}: people = set()
+
+        cursor.execute("DELETE FROM event_attendees WHERE event_id = ?", (event_id,))
+        cursor.executemany("INSERT INTO event_attendees (event_id, person_id) VALUES (?, ?)", [(event_id, person_id) for person_id in people])
+
+    def attendees(self, cursor, event_id: int) -> List[Optional[int]]:
+        """Who set_attendees last stored for an event, None for the owner"""
+        cursor.execute("SELECT person_id FROM event_attendees WHERE event_id = ? ORDER BY person_id", (event_id,))
+        return [row['person_id'] for row in cursor.fetchall()]
+
+    # == DAILY SUMMARY == #
+
+    def rebuild_daily_summary(self, cursor) -> None:
+        """Recount every day from scratch; the triggers keep it current after that"""
+        day, minutes = DAY.format(row='e'), MINUTES.format(row='e')
+        cursor.execute("DELETE FROM daily_summary")
+        cursor.execute(f"""
+            INSERT INTO daily_summary (day, {', '.join(f'priority_{p}' for p in PRIORITIES)}, completed, scheduled_minutes)
+            SELECT {day}, {', '.join(f'sum(e.completed = 0 AND e.priority = {p})' for p in PRIORITIES)}, sum(e.completed != 0), sum({minutes})
+            FROM events e WHERE e.start IS NOT NULL GROUP BY 1
+        """)
+
+        day, minutes = DAY.format(row='s'), MINUTES.format(row='s')
+        cursor.execute(f"""
+            INSERT INTO daily_summary (day, person_id, slot_minutes, used_minutes)
+            SELECT {day}, s.person_id, sum({minutes}), sum(s.time_used)
+            FROM slots s WHERE true GROUP BY 1, 2
+            ON CONFLICT (day, ifnull(person_id, -1)) DO UPDATE SET slot_minutes = excluded.slot_minutes, used_minutes = excluded.used_minutes
+        """)
+
+    # == DIRTY TRACKING == #
+    # writes record what they touched so an incremental optimize only repairs that
+
+    def mark_event_dirty(self, cursor, event_id: int) -> None:
+        cursor.execute("INSERT INTO dirty_marks (event_id) VALUES (?)", (event_id,))
+
+    def mark_window_dirty(self, cursor, start: datetime, end: datetime) -> None:
+        cursor.execute("INSERT INTO dirty_marks (start, end) VALUES (?, ?)", (start, end))
+
+    def get_dirty_marks(self, cursor) -> tuple[int, List[int], List[tuple[datetime, datetime]]]:
+        """(last mark id, dirty event ids, dirty slot windows) recorded since the last optimize"""
+        cursor.execute("SELECT id, event_id, start, end FROM dirty_marks ORDER BY id ASC")
+        rows = cursor.fetchall()
+
+        last_mark = rows[-1]['id'] if rows else 0
+        event_ids = [row['event_id'] for row in rows if row['event_id'] is not None]
+        windows = [
+            (datetime.fromisoformat(row['start']), datetime.fromisoformat(row['end']))
+            for row in rows if row['start'] is not None
+        ]
+        return (last_mark, event_ids, windows)
+
+    def clear_dirty_marks(self, cursor, last_mark: int) -> None:
+        """Drop marks up to last_mark; anything written during the optimize stays dirty"""
+        cursor.execute("DELETE FROM dirty_marks WHERE id <= ?", (last_mark,))
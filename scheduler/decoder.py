@@ -0,0 +1,382 @@
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import Callable, Dict, List
+from datetime import datetime, timedelta
+
+from model import Slot, Event
+from tables import SlotTable, EventTable, AvailabilityTable
+from availability import build_feasibility
+
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1);
+GRID = 15;                  # minutes, durations are rounded to this grid
+OUT_OF_SPACE_PRIORITY = 5.01;
+DECODE_CACHE_SIZE = 20_000;  # signatures kept, each a SIGNATURE_BYTES digest plus its F / G rows, a few MB in all
+SIGNATURE_BYTES = 16;
+
+# ================ #
+# TIME CONVERSIONS #                    MARK: Time
+# ================ #
+
+def to_minutes(value: datetime) -> int:
+    """Whole minutes since EPOCH, floored"""
+    return (value - EPOCH) // timedelta(minutes=1);
+
+def from_minutes(minutes: int) -> datetime:
+    return EPOCH + timedelta(minutes=int(minutes));
+
+def span_minutes(value: timedelta) -> float:
+    return value.total_seconds() / 60;
+
+# ============= #
+# ARRAY BUNDLE  #                       MARK: Arrays
+# ============= #
+
+@dataclass
+class ScheduleArrays:
+    """Slots and events flattened into NumPy arrays of minutes, built once per problem"""
+    slot_start: np.ndarray;     # int64, minutes since EPOCH
+    slot_end: np.ndarray;       # int64, minutes since EPOCH
+    slot_open: np.ndarray;      # int64, minutes since EPOCH, the slot's own start that due dates are checked against
+    slot_priority: np.ndarray;  # float64
+    event_min: np.ndarray;      # float64, minutes
+    event_max: np.ndarray;      # float64, minutes
+    event_due: np.ndarray;      # int64, minutes since EPOCH
+    event_class: np.ndarray;    # int32, availability class of each event, see availability.Feasibility
+    allowed: np.ndarray;        # bool, [class, slot] -> slot usable by that class, sentinel column last
+    next_fit: np.ndarray;       # int32, [class, bucket, i] -> first allowed slot j >= i with length >= bucket * GRID
+
+    @property
+    def n_slots(self) -> int:
+        return len(self.slot_start);
+
+    @property
+    def n_events(self) -> int:
+        return len(self.event_due);
+
+    @property
+    def slot_len(self) -> np.ndarray:
+        return self.slot_end - self.slot_start;
+
+def build_next_fit(slot_len: np.ndarray, max_bucket: int, allowed: np.ndarray) -> np.ndarray:
+    """For every availability class and duration bucket, the index of the first slot at or after i that can hold it"""
+    n_slots = len(slot_len);
+    positions = np.arange(n_slots, dtype=np.int32);
+    table = np.full((len(allowed), max_bucket + 1, n_slots + 1), n_slots, dtype=np.int32);
+
+    for bucket in range(max_bucket + 1):
+        fits = (slot_len >= bucket * GRID) & allowed[:, :n_slots];
+        candidates = np.where(fits, positions, n_slots);
+        # running minimum from the right gives "first fitting slot from here on"
+        table[:, bucket, :n_slots] = np.minimum.accumulate(candidates[:, ::-1], axis=1)[:, ::-1];
+
+    return table;
+
+def build_arrays(slots: List[Slot], events: List[Event]) -> ScheduleArrays:
+    return arrays_from_tables(SlotTable.from_models(slots), EventTable.from_models(events), AvailabilityTable.from_models(events));
+
+def arrays_from_tables(slots: SlotTable, events: EventTable, windows: AvailabilityTable) -> ScheduleArrays:
+    # time already used in a slot (pinned events) is not offered again
+    slot_start = slots.adj_start;
+    slot_end = slots.end;
+    slot_open = slots.start;
+    slot_priority = slots.priority.astype(np.float64);
+
+    event_min = events.min_time.astype(np.float64);
+    event_max = events.max_time.astype(np.float64);
+    event_due = events.due;
+
+    max_bucket = int(np.round(event_max / GRID).max()) + 1 if len(events) else 0;
+    feasibility = build_feasibility(slot_start, slot_end, len(events), windows);
+
+    return ScheduleArrays(
+        slot_start, slot_end, slot_open, slot_priority,
+        event_min, event_max, event_due,
+        feasibility.event_class, feasibility.allowed,
+        build_next_fit(slot_end - slot_start, max_bucket, feasibility.allowed),
+    );
+
+@dataclass
+class Placement:
+    """Where each event landed, indexed like the events passed to build_arrays"""
+    slot: np.ndarray;   # int64, slot index or -1 when out of space
+    start: np.ndarray;  # int64, minutes since EPOCH (undefined when slot == -1)
+    end: np.ndarray;    # int64, minutes since EPOCH (undefined when slot == -1)
+
+    @property
+    def placed(self) -> np.ndarray:
+        return self.slot >= 0;
+
+# ===================== #
+# VECTORIZED POPULATION #               MARK: Population
+# ===================== #
+
+def decode_population(X: np.ndarray, arrays: ScheduleArrays, placements: bool = False, first_fit: bool = False):
+    """Decode every row of X at once; returns F (pop x 2) and G (pop x 1)
+
+    Random-key encoding: the first half of x scales each event from min_time
+    to max_time, the second half sorts the events. See decode_ordered.
+    """
+    n_events = arrays.n_events;
+
+    # order events by second half of x, stable like list.sort
+    order = np.argsort(X[:, n_events:], axis=1, kind='stable');
+    scalars = np.take_along_axis(X[:, :n_events], order, axis=1);
+
+    event_min = arrays.event_min[order];
+    minutes = event_min + scalars * (arrays.event_max[order] - event_min);
+    durations = (np.round(minutes / GRID) * GRID).astype(np.int64);
+
+    return decode_ordered(order, durations, arrays, placements, first_fit);
+
+def duration_buckets(arrays: ScheduleArrays) -> tuple[np.ndarray, np.ndarray]:
+    """Per event, the lowest GRID bucket decode_population can give it and how many more there are"""
+    lowest = np.round(arrays.event_min / GRID).astype(np.int64);
+    return (lowest, np.round(arrays.event_max / GRID).astype(np.int64) - lowest);
+
+def decode_permutations(X: np.ndarray, arrays: ScheduleArrays, placements: bool = False, first_fit: bool = False):
+    """decode_population for the permutation encoding
+
+    The first half of x is each event's duration bucket above its lowest one,
+    the second half is the order to place events in, so nothing needs sorting.
+    """
+    n_events = arrays.n_events;
+    X = X.astype(np.int64, copy=False);
+
+    order = X[:, n_events:];
+    lowest, _ = duration_buckets(arrays);
+    durations = (lowest[order] + np.take_along_axis(X[:, :n_events], order, axis=1)) * GRID;
+
+    return decode_ordered(order, durations, arrays, placements, first_fit);
+
+def decode_ordered(order: np.ndarray, durations: np.ndarray, arrays: ScheduleArrays, placements: bool = False, first_fit: bool = False):
+    """Place events row by row in the given order at the given durations (pop x events, minutes)
+
+    Mirrors optimize_schedule: events are walked in gene order and dropped into
+    the first slot (from the cursor onwards) with enough room left that the
+    event's availability allows. Only the slot under the cursor can be partly
+    used, so the search reduces to one next_fit lookup per individual per event.
+
+    With first_fit=True events are placed the way greedy_scheduler places them
+    instead: into the first slot in list order with room left that opens early
+    enough to finish by the due date, earlier slots included. An event that
+    fits nowhere is left out without ending the schedule. Decoding greedy's
+    order at greedy's durations gives back greedy's schedule.
+
+    Nothing outside the arrays is touched, so calls are safe to run side by
+    side. With placements=True a third value, a Placement of (pop x events)
+    matrices, is returned as well.
+    """
+    pop, n_events = order.shape;
+    n_slots = arrays.n_slots;
+
+    event_min = arrays.event_min[order];
+    event_due = arrays.event_due[order];
+    event_class = arrays.event_class[order];
+
+    total_slot_priority = np.zeros(pop);
+    num_late = np.zeros(pop);
+    sooness = np.zeros(pop);
+
+    rows = np.arange(pop);
+    cursor = np.zeros(pop, dtype=np.int64);
+    used = np.zeros(pop, dtype=np.int64);
+    out_of_space = np.zeros(pop, dtype=bool);
+
+    if placements:
+        placed_slot = np.full((pop, n_events), -1, dtype=np.int64);
+        placed_start = np.zeros((pop, n_events), dtype=np.int64);
+        placed_end = np.zeros((pop, n_events), dtype=np.int64);
+
+    # one zero-length sentinel slot so cursor == n_slots stays indexable
+    slot_len = np.append(arrays.slot_len, 0);
+    slot_start = np.append(arrays.slot_start, 0);
+    slot_priority = np.append(arrays.slot_priority, OUT_OF_SPACE_PRIORITY);
+
+    if first_fit:
+        # minutes left in every slot, per individual; the sentinel never has any
+        # (int32 from here on, the (pop x slots) comparisons are most of the work)
+        remaining = np.tile(slot_len.astype(np.int32), (pop, 1));
+        opened = arrays.slot_open.min() if n_slots else 0;
+        slot_open = (arrays.slot_open - opened).astype(np.int32)[None, :];
+
+    for k in range(n_events):
+        duration = durations[:, k];
+        availability = event_class[:, k];
+
+        if first_fit:
+            # first slot with room that opens by the latest start, the sentinel when there is none
+            latest_start = np.clip(event_due[:, k] - duration - opened, -1, np.iinfo(np.int32).max).astype(np.int32);
+            fits = (remaining >= duration.astype(np.int32)[:, None]) & arrays.allowed[availability];
+            fits[:, :n_slots] &= slot_open <= latest_start[:, None];
+            fits[:, n_slots] = True;
+            cursor = fits.argmax(axis=1);
+            placed = cursor < n_slots;
+
+            start = slot_start[cursor] + slot_len[cursor] - remaining[rows, cursor];
+            remaining[rows, cursor] -= np.where(placed, duration, 0);
+        else:
+            # room left under the cursor, otherwise jump to the next slot that fits
+            fits_here = (slot_len[cursor] - used >= duration) & arrays.allowed[availability, cursor];
+            jump = arrays.next_fit[availability, duration // GRID, np.minimum(cursor + 1, n_slots)];
+            target = np.where(fits_here, cursor, jump);
+
+            out_of_space |= target >= n_slots;
+            placed = ~out_of_space;
+
+            used = np.where(placed & (target == cursor), used, 0);
+            cursor = np.where(placed, target, n_slots);
+
+            start = slot_start[cursor] + used;
+            used = used + np.where(placed, duration, 0);
+
+        end = start + duration;
+
+        if placements:
+            event_index = order[:, k];
+            placed_slot[rows, event_index] = np.where(placed, cursor, -1);
+            placed_start[rows, event_index] = start;
+            placed_end[rows, event_index] = end;
+
+        # calculate objectives
+        late = end + event_min[:, k] > event_due[:, k];
+        days_till_due = np.where(placed, (event_due[:, k] - start) // (24 * 60), 0);
+
+        total_slot_priority += slot_priority[cursor];
+        num_late += np.where(placed, np.where(late, 10, 0), 1);
+        sooness += np.where(placed, 1 - np.power(np.e, 0.2 * days_till_due), 0);
+
+    F = np.column_stack([total_slot_priority, sooness]);
+    G = num_late[:, None];
+
+    if placements:
+        return F, G, Placement(placed_slot, placed_start, placed_end);
+
+    return F, G;
+
+def decode_schedule(x: np.ndarray, arrays: ScheduleArrays, decode: Callable = decode_population) -> tuple[float, int, float, Placement]:
+    """Pure single-individual decode; returns (slot priority, num late, sooness, placement)"""
+    F, G, placement = decode(np.asarray(x)[None, :], arrays, placements=True);
+
+    return (
+        float(F[0, 0]), int(G[0, 0]), float(F[0, 1]),
+        Placement(placement.slot[0], placement.start[0], placement.end[0]),
+    );
+
+# ============ #
+# DECODE CACHE #                        MARK: Cache
+# ============ #
+# the decoder only sees the gene order and the durations rounded to GRID, so
+# many different X rows are the same schedule with the same objectives
+
+def signature(row: np.ndarray) -> bytes:
+    """Fixed-size key of a row, so cache entries cost the same whatever the number of events"""
+    return blake2b(row.tobytes(), digest_size=SIGNATURE_BYTES).digest();
+
+def decode_signatures(X: np.ndarray, arrays: ScheduleArrays) -> List[bytes]:
+    """Per row of X, the event order and duration buckets decode_population would use, as a hashable key"""
+    n_events = arrays.n_events;
+
+    order = np.argsort(X[:, n_events:], axis=1, kind='stable').astype(np.int32);
+    buckets = np.round((arrays.event_min + X[:, :n_events] * (arrays.event_max - arrays.event_min)) / GRID).astype(np.int32);
+
+    return [signature(row) for row in np.hstack([order, buckets])];
+
+def gene_signatures(X: np.ndarray, arrays: ScheduleArrays) -> List[bytes]:
+    """decode_signatures for encodings where equal schedules already have equal genes"""
+    return [signature(row) for row in X.astype(np.int32)];
+
+@dataclass
+class CacheStats:
+    hits: int = 0;
+    misses: int = 0;
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses;
+        return self.hits / total if total else 0.0;
+
+class DecodeCache:
+    """Bounded LRU of F / G rows by decode signature, in front of decode_population
+
+    Rows of one population with the same signature are decoded once; the
+    repeats count as hits.
+    """
+    def __init__(self, arrays: ScheduleArrays, size: int = DECODE_CACHE_SIZE, signatures: Callable[[np.ndarray, ScheduleArrays], List[bytes]] = decode_signatures):
+        self.arrays = arrays;
+        self.size = size;
+        self.signatures = signatures;
+        self.entries: OrderedDict[bytes, tuple[np.ndarray, np.ndarray]] = OrderedDict();
+        self.stats = CacheStats();
+
+    def evaluate(self, X: np.ndarray, decode: Callable[[np.ndarray], tuple[np.ndarray, np.ndarray]]) -> tuple[np.ndarray, np.ndarray]:
+        """F and G for every row of X, calling decode on the missing rows only"""
+        F = np.empty((len(X), 2));
+        G = np.empty((len(X), 1));
+
+        missing: Dict[bytes, List[int]] = {};
+        for row, key in enumerate(self.signatures(X, self.arrays)):
+            entry = self.entries.get(key);
+            if entry is None:
+                missing.setdefault(key, []).append(row);
+                continue;
+
+            self.entries.move_to_end(key);
+            F[row], G[row] = entry;
+
+        self.stats.hits += len(X) - len(missing);
+        self.stats.misses += len(missing);
+        if not missing: return (F, G);
+
+        first = [rows[0] for rows in missing.values()];
+        new_F, new_G = decode(X[first]);
+
+        for (key, rows), f, g in zip(missing.items(), new_F, new_G):
+            F[rows], G[rows] = f, g;
+            self.entries[key] = (f, g);
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False);
+
+        return (F, G);
+
+# ======== #
+# ENCODING #                            MARK: Encoding
+# ======== #
+
+def encode_schedule(slots: List[Slot], events: List[Event], placements: Dict[int, tuple[datetime, datetime]]) -> np.ndarray:
+    """Decision vector that decodes to (roughly) the given event id -> (start, end) placements
+
+    Events are keyed in the order the decoder's slot cursor would reach them:
+    by the list position of the slot holding their start, then by start.
+    Events without a placement go last, at their shortest duration.
+    """
+    n_events = len(events);
+    by_start = sorted(range(len(slots)), key=lambda index: slots[index].start);
+    starts = [slots[index].start for index in by_start];
+
+    scalars = np.zeros(n_events);
+    positions: List[tuple] = [];
+
+    for index, event in enumerate(events):
+        if event.id not in placements:
+            positions.append((len(slots), EPOCH, index));
+            continue;
+
+        start, end = placements[event.id];
+        spread = span_minutes(event.max_time - event.min_time);
+        if spread > 0:
+            scalars[index] = min(max(span_minutes(end - start - event.min_time) / spread, 0), 1);
+
+        found = bisect_right(starts, start) - 1;
+        slot_position = by_start[found] if found >= 0 else len(slots);
+        positions.append((slot_position, start, index));
+
+    keys = np.zeros(n_events);
+    for rank, (_, _, index) in enumerate(sorted(positions)):
+        keys[index] = (rank + 0.5) / n_events;
+
+    return np.concatenate([scalars, keys]);
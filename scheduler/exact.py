@@ -0,0 +1,241 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from math import exp
+from threading import Event as Flag
+from typing import List, Optional
+
+from model import Slot, Event
+from decoder import GRID, OUT_OF_SPACE_PRIORITY, ScheduleArrays, span_minutes, to_minutes
+from availability import feasibility_of
+from tables import SlotTable, EventTable
+
+import numpy as np
+
+EXACT_LIMIT = 9;            # events, above this the exact engine hands over to a heuristic
+NODE_LIMIT = 250_000;       # search nodes before settling for the incumbent
+CANCEL_CHECK = 1024;        # search nodes between looks at the cancel flag
+LATE_WEIGHT = 100;          # one late event outweighs any slot priority difference at EXACT_LIMIT
+BOUND_CHUNK = 512;          # events per event x slot block in lower_bound
+
+# ======= #
+# SCORING #                             MARK: Scoring
+# ======= #
+
+def sooness_term(due: int, start: int) -> float:
+    return 1 - exp(0.2 * ((due - start) // (24 * 60)));
+
+def score(num_late: float, total_slot_priority: float) -> float:
+    """Scalar the exact engine minimizes; sooness only breaks ties"""
+    return LATE_WEIGHT * num_late + total_slot_priority;
+
+def score_schedule(slots: List[Slot], events: List[Event]) -> tuple[float, float, float]:
+    """(num late, total slot priority, sooness) of a finished schedule, scored like the decoder"""
+    by_start = sorted(slots, key=lambda slot: slot.start);
+    starts = [slot.start for slot in by_start];
+
+    num_late: float = 0;
+    total_slot_priority: float = 0;
+    sooness: float = 0;
+
+    for event in events:
+        if not event.is_scheduled:
+            num_late += 1;
+            total_slot_priority += OUT_OF_SPACE_PRIORITY;
+            continue;
+
+        position = bisect_right(starts, event.start) - 1;
+        total_slot_priority += by_start[position].priority if position >= 0 else OUT_OF_SPACE_PRIORITY;
+
+        if event.end + event.min_time > event.due_date:
+            num_late += 10;
+
+        sooness += sooness_term(to_minutes(event.due_date), to_minutes(event.start));
+
+    return (num_late, total_slot_priority, sooness);
+
+# ================ #
+# BRANCH AND BOUND #                    MARK: Branch & Bound
+# ================ #
+
+@dataclass
+class ExactResult:
+    order: List[int];       # event indices in decode order
+    score: float;
+    sooness: float;
+    bound: float;           # lower bound on score over the whole search space
+    optimal: bool;
+    nodes: int;
+
+    @property
+    def gap(self) -> float:
+        return relative_gap(self.score, self.bound);
+
+def relative_gap(value: float, bound: float) -> float:
+    return max(0.0, (value - bound) / max(abs(value), 1e-9));
+
+class BranchAndBound:
+    """Depth-first search over decode orders on the 15 minute grid
+
+    Every event is placed at its shortest grid duration: none of the objectives
+    reward a longer event, and a shorter one never fits worse, so this loses
+    nothing while cutting the branching factor down to the event order.
+    Children are tried earliest due date first to find a good incumbent early.
+    Setting cancelled stops the search the same way the node limit does.
+    """
+    def __init__(self, arrays: ScheduleArrays, node_limit: int = NODE_LIMIT, cancelled: Optional[Flag] = None):
+        self.arrays = arrays;
+        self.node_limit = node_limit;
+        self.cancelled = cancelled;
+
+        n_slots = arrays.n_slots;
+        self.n_events = arrays.n_events;
+        self.durations = [int(round(minutes / GRID) * GRID) for minutes in arrays.event_min];
+        self.event_min = arrays.event_min.tolist();
+        self.event_due = arrays.event_due.tolist();
+
+        # one sentinel past the last slot, standing for "out of space"
+        self.slot_len = arrays.slot_len.tolist() + [0];
+        self.slot_start = arrays.slot_start.tolist() + [0];
+        self.slot_priority = arrays.slot_priority.tolist() + [OUT_OF_SPACE_PRIORITY];
+        self.next_fit = arrays.next_fit;
+        self.allowed = arrays.allowed;
+        self.event_class = arrays.event_class.tolist();
+        self.n_slots = n_slots;
+
+        # cheapest priority and earliest start still reachable from each cursor position
+        self.suffix_priority = np.minimum.accumulate(np.array(self.slot_priority)[::-1])[::-1].tolist();
+        suffix_start = np.minimum.accumulate(arrays.slot_start[::-1])[::-1].tolist() if n_slots else [];
+        self.suffix_start = suffix_start + [0];
+
+        self.by_due = sorted(range(self.n_events), key=lambda index: self.event_due[index]);
+
+        self.best_order: Optional[List[int]] = None;
+        self.best = (float('inf'), float('inf'));
+        self.nodes = 0;
+
+    def bound(self, cursor: int, remaining: List[int], late: float, priority: float, sooness: float) -> tuple[float, float]:
+        if cursor >= self.n_slots:
+            return (score(late + len(remaining), priority + OUT_OF_SPACE_PRIORITY * len(remaining)), sooness);
+
+        earliest = self.suffix_start[cursor];
+        optimistic = sum(min(0.0, sooness_term(self.event_due[index], earliest)) for index in remaining);
+
+        return (score(late, priority + self.suffix_priority[cursor] * len(remaining)), sooness + optimistic);
+
+    def place(self, index: int, cursor: int, used: int) -> tuple[int, int, int]:
+        """Same move as one decoder step; returns (cursor, used, start) with cursor == n_slots when out of space"""
+        duration = self.durations[index];
+        availability = self.event_class[index];
+
+        if cursor < self.n_slots and self.slot_len[cursor] - used >= duration and self.allowed[availability, cursor]:
+            target = cursor;
+        else:
+            target = int(self.next_fit[availability, duration // GRID, min(cursor + 1, self.n_slots)]);
+            used = 0;
+
+        if target >= self.n_slots: return (self.n_slots, 0, 0);
+
+        start = self.slot_start[target] + used;
+        return (target, used + duration, start);
+
+    def search(self, order: List[int], remaining: List[int], cursor: int, used: int, late: float, priority: float, sooness: float) -> None:
+        self.nodes += 1;
+
+        if not remaining or cursor >= self.n_slots:
+            final = (score(late + len(remaining), priority + OUT_OF_SPACE_PRIORITY * len(remaining)), sooness);
+            if final < self.best:
+                self.best = final;
+                self.best_order = order + remaining;
+            return;
+
+        if self.bound(cursor, remaining, late, priority, sooness) >= self.best: return;
+        if self.nodes >= self.node_limit: return;
+        if self.cancelled is not None and self.nodes % CANCEL_CHECK == 0 and self.cancelled.is_set():
+            self.node_limit = self.nodes;
+            return;
+
+        for index in remaining:
+            next_cursor, next_used, start = self.place(index, cursor, used);
+            rest = [other for other in remaining if other != index];
+
+            if next_cursor >= self.n_slots:
+                self.search(order + [index], rest, next_cursor, 0, late + 1, priority + OUT_OF_SPACE_PRIORITY, sooness);
+                continue;
+
+            end = start + self.durations[index];
+            is_late = end + self.event_min[index] > self.event_due[index];
+
+            self.search(
+                order + [index], rest, next_cursor, next_used,
+                late + (10 if is_late else 0),
+                priority + self.slot_priority[next_cursor],
+                sooness + sooness_term(self.event_due[index], start),
+            );
+
+    def solve(self) -> ExactResult:
+        root_bound, _ = self.bound(0, self.by_due, 0, 0, 0);
+
+        self.search([], list(self.by_due), 0, 0, 0, 0, 0);
+        optimal = self.nodes < self.node_limit;
+
+        return ExactResult(
+            order=self.best_order or list(self.by_due),
+            score=self.best[0],
+            sooness=self.best[1],
+            bound=self.best[0] if optimal else root_bound,
+            optimal=optimal,
+            nodes=self.nodes,
+        );
+
+def lower_bound(slots: List[Slot], events: List[Event]) -> float:
+    """Score no schedule of these slots and events can beat, used to report heuristic gaps
+
+    A relaxation: an event costs the priority of its slot if some slot of that
+    priority could hold it on time, and at least an unplaced event otherwise,
+    since a late one costs more than that. How many events can cost p or less
+    is capped twice: by the events that have such a slot, and by how many of
+    the shortest of them fit into the total length of those slots.
+    """
+    unplaced = score(1, OUT_OF_SPACE_PRIORITY);
+    n_events = len(events);
+    if not slots or not n_events: return unplaced * n_events;
+
+    table = SlotTable.from_models(slots);
+    start, length, priority = table.adj_start, table.length - table.time_used, table.priority.astype(np.float64);
+    feasibility = feasibility_of(slots, events);
+
+    minimum = np.array([span_minutes(event.min_time) for event in events]);
+    due = EventTable.from_models(events).due;
+    # the shortest any engine places an event: the decoder rounds to the grid, local search stops at min_time
+    shortest = np.minimum(np.round(minimum / GRID) * GRID, minimum);
+
+    best = np.full(n_events, np.inf);           # per event, the best priority it could get on time
+    useful = np.zeros(len(slots), dtype=bool);  # slots some event could use on time
+    for first in range(0, n_events, BOUND_CHUNK):
+        part = slice(first, first + BOUND_CHUNK);
+        usable = (feasibility.allowed[feasibility.event_class[part], :-1]
+                  & (length >= shortest[part, None])
+                  & (start + shortest[part, None] + minimum[part, None] <= due[part, None]));
+        best[part] = np.where(usable, priority, np.inf).min(axis=1);
+        useful |= usable.any(axis=0);
+
+    # every event costs at least the lowest level; each step up is paid by the events that can not stay below it
+    bound, previous, below = 0.0, 0.0, 0;
+    for level in np.unique(priority[useful]).tolist() + [unplaced]:
+        bound += (level - previous) * (n_events - below);
+        previous = level;
+
+        eligible = np.sort(shortest[best <= level]);
+        capacity = length[useful & (priority <= level)].sum();
+        below = min(len(eligible), int(np.searchsorted(np.cumsum(eligible), capacity, side='right')));
+
+    return float(bound);
+
+def order_to_x(order: List[int]) -> np.ndarray:
+    """Decision vector decoding in the given order at shortest durations"""
+    n_events = len(order);
+    keys = np.zeros(n_events);
+    for rank, index in enumerate(order):
+        keys[index] = (rank + 0.5) / n_events;
+
+    return np.concatenate([np.zeros(n_events), keys]);
@@ -0,0 +1,211 @@
+from concurrent.futures import ThreadPoolExecutor
+from cProfile import Profile
+from dataclasses import asdict, dataclass, field
+from threading import Condition, Event as Flag, Lock
+from time import monotonic
+from typing import Dict, Literal, Optional
+from uuid import uuid4
+
+from database import SchedulerStorage
+from optimize import NSGA2_GENERATIONS, AnytimeCallback, Encoding, Preview, Scheduler
+from team import TeamScheduler
+from parallel import PoolKind
+from metrics import METRICS, profile_report
+from view_cache import invalidate_starts
+
+JobState = Literal['queued', 'running', 'done', 'failed', 'cancelled'];
+MAX_FINISHED_JOBS = 50;
+
+# ==== #
+# JOBS #                                MARK: Jobs
+# ==== #
+
+@dataclass
+class OptimizeJob:
+    """One optimize request running in the background"""
+    id: str;
+    method: str;
+    workers: int;
+    pool_kind: PoolKind;
+    incremental: bool;
+    time_budget: Optional[float] = None;
+    team: bool = False;
+    window_days: int = 0;
+    encoding: Encoding = 'random_key';
+    profile: bool = False;
+    state: JobState = 'queued';
+
+    # progress, filled in by JobCallback for engines that run in generations
+    generation: int = 0;
+    max_generations: int = NSGA2_GENERATIONS;
+    best: Optional[dict] = None;
+
+    # best schedule so far, version goes up with every preview and state change
+    preview: Optional[dict] = None;
+    version: int = 0;
+
+    submitted: float = field(default_factory=monotonic);
+    started: Optional[float] = None;
+    finished: Optional[float] = None;
+    report: Optional[dict] = None;
+    error: Optional[str] = None;
+    # cProfile output of the run, when profile is set
+    profile_text: Optional[str] = field(default=None, repr=False);
+
+    cancel_requested: Flag = field(default_factory=Flag, repr=False);
+    updated: Condition = field(default_factory=Condition, repr=False);
+
+    @property
+    def key(self) -> tuple:
+        """Jobs with the same key would compute the same thing"""
+        return (self.method, self.workers, self.pool_kind, self.incremental, self.time_budget, self.team, self.window_days, self.encoding);
+
+    @property
+    def active(self) -> bool:
+        return self.state in ('queued', 'running');
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left if every remaining generation runs; convergence usually stops sooner"""
+        if self.state != 'running' or not self.generation: return None;
+
+        per_generation = (monotonic() - self.started) / self.generation;
+        return per_generation * max(0, self.max_generations - self.generation);
+
+    def to_dict(self) -> dict:
+        status = {name: getattr(self, name) for name in STATUS_FIELDS};
+        status['eta'] = self.eta;
+        status['elapsed'] = ((self.finished or monotonic()) - self.started) if self.started else 0.0;
+        return status;
+
+    def publish(self, **changes) -> None:
+        """Apply changes and wake everyone waiting on this job"""
+        with self.updated:
+            for name, value in changes.items(): setattr(self, name, value);
+            self.version += 1;
+            self.updated.notify_all();
+
+    def wait(self, version: int, timeout: float) -> int:
+        """Block until the job moves past version (or timeout); returns the current version"""
+        with self.updated:
+            self.updated.wait_for(lambda: self.version != version, timeout);
+            return self.version;
+
+STATUS_FIELDS = ('id', 'method', 'workers', 'pool_kind', 'incremental', 'time_budget', 'team', 'window_days', 'encoding', 'profile', 'state', 'generation', 'max_generations', 'best', 'version', 'report', 'error');
+
+class JobCallback(AnytimeCallback):
+    """Mirrors NSGA2 progress and previews onto a job and stops the run once the job is cancelled"""
+    def __init__(self, job: OptimizeJob):
+        super().__init__();
+        self.job = job;
+
+    def notify(self, algorithm) -> None:
+        super().notify(algorithm);
+        self.job.generation = algorithm.n_gen;
+
+        F = algorithm.opt.get("F");
+        CV = algorithm.opt.get("CV");
+        self.job.best = {
+            'slot_priority': float(F[:, 0].min()),
+            'sooness': float(F[:, 1].min()),
+            'num_late': float(CV[:, 0].min()),
+        };
+
+        if self.job.cancel_requested.is_set():
+            algorithm.termination.terminate();
+
+    def improved(self, preview: Preview) -> None:
+        self.job.publish(preview={
+            'generation': preview.generation,
+            'seconds': preview.seconds,
+            'num_late': preview.num_late,
+            'slot_priority': preview.slot_priority,
+            'sooness': preview.sooness,
+            'events': [
+                {'id': event_id, 'start': start.isoformat(), 'end': end.isoformat()}
+                for event_id, (start, end) in preview.placements.items()
+            ],
+        });
+
+# ======= #
+# MANAGER #                             MARK: Manager
+# ======= #
+
+class JobManager:
+    """Runs optimize jobs one at a time on a background thread
+
+    A submission identical to a job that is still queued or running gets that
+    job back instead of starting a competing solve.
+    """
+    def __init__(self, storage: SchedulerStorage):
+        self.storage = storage;
+        self.jobs: Dict[str, OptimizeJob] = {};
+        self.lock = Lock();
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='optimize');
+
+    def submit(self, method: str, workers: int = 0, pool_kind: PoolKind = 'process', incremental: bool = False, time_budget: Optional[float] = None, team: bool = False, window_days: int = 0, encoding: Encoding = 'random_key', profile: bool = False) -> OptimizeJob:
+        job = OptimizeJob(uuid4().hex, method, workers, pool_kind, incremental, time_budget, team, window_days, encoding, profile);
+
+        with self.lock:
+            for existing in self.jobs.values():
+                if existing.active and existing.key == job.key and not existing.cancel_requested.is_set():
+                    return existing;
+
+            self._prune();
+            self.jobs[job.id] = job;
+
+        self.executor.submit(self._run, job);
+        return job;
+
+    def get(self, job_id: str) -> Optional[OptimizeJob]:
+        return self.jobs.get(job_id);
+
+    def cancel(self, job_id: str) -> Optional[OptimizeJob]:
+        job = self.jobs.get(job_id);
+        if job and job.active: job.cancel_requested.set();
+        return job;
+
+    def _run(self, job: OptimizeJob) -> None:
+        profiler = Profile() if job.profile else None;
+        if profiler: profiler.enable();
+
+        try:
+            self._solve(job);
+        finally:
+            if profiler:
+                profiler.disable();
+                job.profile_text = profile_report(profiler);
+            METRICS.inc('scheduler_runs_total', method=job.method, state=job.state);
+
+    def _solve(self, job: OptimizeJob) -> None:
+        if job.cancel_requested.is_set():
+            job.publish(state='cancelled');
+            return;
+
+        job.started = monotonic();
+        job.publish(state='running');
+
+        try:
+            if job.team: scheduler = TeamScheduler(self.storage, job.workers, job.pool_kind);
+            else: scheduler = Scheduler(self.storage, job.workers, job.pool_kind, job.incremental);
+            scheduler.schedule(job.method, callback=JobCallback(job), time_budget=job.time_budget, window_days=job.window_days, encoding=job.encoding, cancelled=job.cancel_requested);
+
+            # a cancelled run stops early; its half-finished schedule is not saved
+            if job.cancel_requested.is_set():
+                job.finished = monotonic();
+                job.publish(state='cancelled');
+                return;
+
+            invalidate_starts(scheduler.save_scheduled_events());
+            job.finished = monotonic();
+            job.publish(state='done', report=asdict(scheduler.report) if scheduler.report else None);
+
+        except Exception as e:
+            job.finished = monotonic();
+            job.publish(state='failed', error=str(e));
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS"""
+        finished = [job for job in self.jobs.values() if not job.active];
+        for job in sorted(finished, key=lambda job: job.submitted)[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id];
@@ -0,0 +1,292 @@
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from model import Slot, Event
+from decoder import GRID, OUT_OF_SPACE_PRIORITY, from_minutes, to_minutes
+from exact import score, sooness_term
+
+import numpy as np
+
+LOCAL_SEARCH_PASSES = 3;        # sweeps over the events at most, so the same schedule always gets the same moves
+
+# ========== #
+# SLOT STATE #                          MARK: State
+# ========== #
+# every slot holds its events back to back from base, the way the engines fill
+# them, so a move only needs the one or two slots it touches scored again
+
+Cost = tuple[float, float, float];     # (num late, slot priority, sooness), added up like score_schedule
+
+UNPLACED: Cost = (1, OUT_OF_SPACE_PRIORITY, 0);
+
+def add(*costs: Cost) -> Cost:
+    return tuple(sum(values) for values in zip(*costs));
+
+def better(new: Cost, old: Cost) -> bool:
+    """Lower score, or the same score with lower sooness"""
+    new_score, old_score = score(new[0], new[1]), score(old[0], old[1]);
+    return new_score < old_score - 1e-9 or (abs(new_score - old_score) <= 1e-9 and new[2] < old[2] - 1e-9);
+
+@dataclass
+class SearchState:
+    """Slots and events as minutes, with each slot's event sequence and cost"""
+    slots: List[Slot];
+    events: List[Event];
+    base: List[int] = field(default_factory=list);          # per slot, where its first event starts
+    end: List[int] = field(default_factory=list);           # per slot
+    priority: List[int] = field(default_factory=list);      # per slot
+    sequence: List[List[int]] = field(default_factory=list); # per slot, event indices in start order
+    cost: List[Cost] = field(default_factory=list);         # per slot
+    slot_of: List[int] = field(default_factory=list);       # per event, -1 when unplaced
+    duration: List[int] = field(default_factory=list);      # per event, minutes
+    due: List[int] = field(default_factory=list);
+    min_time: List[int] = field(default_factory=list);
+    max_time: List[int] = field(default_factory=list);
+    windows: List[List[tuple[int, int]]] = field(default_factory=list);
+    tails: np.ndarray = None;                                # per slot, first free minute
+    changed: set = field(default_factory=set);              # slots to write back
+    frozen: set = field(default_factory=set);               # slots whose events are not back to back, left alone
+
+    @classmethod
+    def build(cls, slots: List[Slot], events: List[Event]) -> 'SearchState':
+        state = cls(slots, events);
+        state.end = [to_minutes(slot.end) for slot in slots];
+        state.priority = [slot.priority for slot in slots];
+        state.sequence = [[] for _ in slots];
+        state.due = [to_minutes(event.due_date) for event in events];
+        state.min_time = [int(event.min_time.total_seconds()) // 60 for event in events];
+        state.max_time = [int(event.max_time.total_seconds()) // 60 for event in events];
+        state.windows = [[(to_minutes(window.start), to_minutes(window.end)) for window in event.availability] for event in events];
+
+        by_start = sorted(range(len(slots)), key=lambda index: slots[index].start);
+        starts = [slots[index].start for index in by_start];
+
+        for index, event in enumerate(events):
+            state.slot_of.append(-1);
+            state.duration.append(0);
+            if not event.is_scheduled: continue;
+
+            position = bisect_right(starts, event.start) - 1;
+            if position < 0 or event.end > slots[by_start[position]].end: continue;
+            state.slot_of[index] = by_start[position];
+            state.duration[index] = to_minutes(event.end) - to_minutes(event.start);
+            state.sequence[by_start[position]].append(index);
+
+        for index, slot in enumerate(slots):
+            sequence = sorted(state.sequence[index], key=lambda event: events[event].start);
+            state.sequence[index] = sequence;
+            # time used before this run's events (pinned ones) stays where it is
+            used = slot.time_used - sum(state.duration[event] for event in sequence);
+            base = to_minutes(slot.start) + used;
+            if sequence: base = min(base, to_minutes(events[sequence[0]].start));
+            state.base.append(base);
+
+        for index in range(len(slots)):
+            cost = state.slot_cost(index, state.sequence[index]);
+            if cost is None: state.frozen.add(index);
+            state.cost.append(cost or (0, 0, 0));
+        state.tails = np.array([state.tail(index) for index in range(len(slots))], dtype=np.int64);
+
+        return state;
+
+    def allows(self, event: int, start: int, end: int) -> bool:
+        windows = self.windows[event];
+        return not windows or any(window_start <= start and end <= window_end for window_start, window_end in windows);
+
+    def event_cost(self, event: int, slot: int, start: int, duration: int) -> Cost:
+        end = start + duration;
+        late = 10 if end + self.min_time[event] > self.due[event] else 0;
+        return (late, self.priority[slot], sooness_term(self.due[event], start));
+
+    def slot_cost(self, slot: int, sequence: List[int], durations: Optional[dict] = None) -> Optional[Cost]:
+        """Cost of the slot holding sequence back to back, None if it overflows or breaks availability"""
+        durations = durations or {};
+        cursor = self.base[slot];
+        total: Cost = (0, 0, 0);
+
+        for event in sequence:
+            duration = durations.get(event, self.duration[event]);
+            if cursor + duration > self.end[slot] or not self.allows(event, cursor, cursor + duration): return None;
+            total = add(total, self.event_cost(event, slot, cursor, duration));
+            cursor += duration;
+
+        return total;
+
+    def tail(self, slot: int) -> int:
+        """First free minute of the slot"""
+        return self.base[slot] + sum(self.duration[event] for event in self.sequence[slot]);
+
+    def start_of(self, event: int) -> int:
+        slot = self.slot_of[event];
+        sequence = self.sequence[slot];
+        return self.base[slot] + sum(self.duration[item] for item in sequence[:sequence.index(event)]);
+
+    def fitted(self, event: int, room: int) -> int:
+        """Longest duration on the grid between min and max time that fits in room, 0 when none does"""
+        duration = min(self.max_time[event], room // GRID * GRID);
+        return duration if duration >= self.min_time[event] else 0;
+
+    def apply(self, event: int, slot: int, sequence: List[int], cost: Cost, durations: Optional[dict] = None) -> None:
+        self.sequence[slot] = sequence;
+        self.cost[slot] = cost;
+        for changed, duration in (durations or {}).items():
+            self.duration[changed] = duration;
+        if event >= 0: self.slot_of[event] = slot;
+        self.tails[slot] = self.tail(slot);
+        self.changed.add(slot);
+
+    def write_back(self) -> None:
+        """Placements and time_used of the changed slots onto the models"""
+        for index in self.changed:
+            cursor = self.base[index];
+            for event in self.sequence[index]:
+                start, end = from_minutes(cursor), from_minutes(cursor + self.duration[event]);
+                # moved events are already scheduled, rescued ones go through the usual checks
+                if self.events[event].is_scheduled: self.events[event].start, self.events[event].end = start, end;
+                else: self.events[event].schedule_event(start, end);
+                self.events[event].is_failed = False;
+                cursor += self.duration[event];
+            self.slots[index].time_used = max(0, cursor - to_minutes(self.slots[index].start));
+
+# ===== #
+# MOVES #                               MARK: Moves
+# ===== #
+
+def rescue(state: SearchState, event: int, candidates: np.ndarray) -> bool:
+    """Put an unplaced event at the end of a slot, shrinking lower-priority events there to make room"""
+    events = state.events;
+    for slot in candidates.tolist():
+        sequence = state.sequence[slot];
+        room = state.end[slot] - int(state.tails[slot]);
+        durations = {};
+
+        if room < state.min_time[event]:
+            # the least important events give back time first, down to their min_time
+            for other in sorted(sequence, key=lambda other: events[other].priority):
+                if events[other].priority >= events[event].priority or room >= state.min_time[event]: break;
+                give = min(state.duration[other] - state.min_time[other], (state.min_time[event] - room + GRID - 1) // GRID * GRID);
+                if give <= 0: continue;
+                durations[other] = state.duration[other] - give;
+                room += give;
+
+        duration = state.fitted(event, room);
+        if not duration: continue;
+
+        durations[event] = duration;
+        cost = state.slot_cost(slot, sequence + [event], durations);
+        if cost is None or not better(cost, add(state.cost[slot], UNPLACED)): continue;
+
+        state.apply(event, slot, sequence + [event], cost, durations);
+        return True;
+
+    return False;
+
+def relocate(state: SearchState, event: int, candidates: np.ndarray) -> bool:
+    """Move a placed event to the end of a better slot, at the longest duration that fits"""
+    source = state.slot_of[event];
+    remaining = [other for other in state.sequence[source] if other != event];
+    source_cost = state.slot_cost(source, remaining);
+    if source_cost is None: return False;
+
+    for slot in candidates.tolist():
+        if slot == source: continue;
+        start = int(state.tails[slot]);
+        duration = state.fitted(event, state.end[slot] - start);
+        if not duration or not state.allows(event, start, start + duration): continue;
+
+        # appending never moves the events already in the slot
+        cost = add(state.cost[slot], state.event_cost(event, slot, start, duration));
+        if not better(add(source_cost, cost), add(state.cost[source], state.cost[slot])): continue;
+
+        state.apply(-1, source, remaining, source_cost);
+        state.apply(event, slot, state.sequence[slot] + [event], cost, {event: duration});
+        return True;
+
+    return False;
+
+def swap(state: SearchState, event: int, candidates: np.ndarray) -> bool:
+    """Trade places with an event in an earlier slot"""
+    source = state.slot_of[event];
+    for slot in candidates.tolist():
+        if slot == source: continue;
+        for other in state.sequence[slot]:
+            first = [other if item == event else item for item in state.sequence[source]];
+            second = [event if item == other else item for item in state.sequence[slot]];
+
+            first_cost = state.slot_cost(source, first);
+            second_cost = first_cost and state.slot_cost(slot, second);
+            if second_cost is None: continue;
+            if not better(add(first_cost, second_cost), add(state.cost[source], state.cost[slot])): continue;
+
+            state.apply(other, source, first, first_cost);
+            state.apply(event, slot, second, second_cost);
+            return True;
+
+    return False;
+
+def reorder(state: SearchState, slot: int) -> bool:
+    """Earliest due date first inside a slot"""
+    sequence = sorted(state.sequence[slot], key=lambda event: state.due[event]);
+    if sequence == state.sequence[slot]: return False;
+
+    cost = state.slot_cost(slot, sequence);
+    if cost is None or not better(cost, state.cost[slot]): return False;
+
+    state.apply(-1, slot, sequence, cost);
+    return True;
+
+# ============ #
+# LOCAL SEARCH #                        MARK: Local Search
+# ============ #
+
+def local_search(slots: List[Slot], events: List[Event], passes: int = LOCAL_SEARCH_PASSES) -> int:
+    """Improve a finished schedule in place with first-improvement moves; returns how many were made
+
+    Unplaced events are rescued into slots with room (or room made by shrinking
+    less important events), late events swap with events in earlier slots, and
+    every event tries slots with a better priority. Each move is scored on the
+    one or two slots it changes only. Sweeps stop once one makes no move, or
+    after passes of them.
+    """
+    if not slots or not events: return 0;
+
+    state = SearchState.build(slots, events);
+
+    # candidate slots in the order the engines prefer them
+    preferred = np.lexsort((np.array(state.base), np.array(state.priority)));
+    preferred = preferred[~np.isin(preferred, list(state.frozen))];
+    slot_start = np.array(state.base)[preferred];
+    slot_priority = np.array(state.priority)[preferred];
+    slot_end = np.array(state.end)[preferred];
+
+    moves = 0;
+    improved = True;
+    for _ in range(passes):
+        if not improved: break;
+        improved = False;
+
+        for event in range(len(events)):
+            slot = state.slot_of[event];
+            # events placed outside every slot are left alone
+            if (slot < 0 and events[event].is_scheduled) or slot in state.frozen: continue;
+
+            # only slots where the event still finishes on time at min_time are worth trying
+            tails = state.tails[preferred];
+            on_time = (slot_end - tails >= state.min_time[event]) & (tails + 2 * state.min_time[event] <= state.due[event]);
+
+            if slot < 0:
+                moved = rescue(state, event, preferred[slot_start <= state.due[event]]);
+            else:
+                moved = relocate(state, event, preferred[on_time & (slot_priority < state.priority[slot])]);
+
+                late = state.start_of(event) + state.duration[event] + state.min_time[event] > state.due[event];
+                if not moved and late:
+                    moved = reorder(state, slot) or swap(state, event, preferred[slot_start < state.base[slot]]);
+
+            if moved:
+                moves += 1;
+                improved = True;
+
+    state.write_back();
+    return moves;
@@ -0,0 +1,141 @@
+from contextlib import ContextDecorator
+from cProfile import Profile
+from io import StringIO
+from pstats import Stats
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, List
+
+# ======= #
+# METRICS #                             MARK: Metrics
+# ======= #
+# process-wide counters, gauges and phase timings, scraped from /metrics
+
+HELP: Dict[str, tuple[str, str]] = {
+    'scheduler_phase_seconds': ('summary', 'Wall time spent in each optimize phase'),
+    'scheduler_runs_total': ('counter', 'Optimize jobs finished, by method and final state'),
+    'scheduler_evaluations_total': ('counter', 'Schedules decoded or search nodes visited, by engine'),
+    'scheduler_decode_cache_hits_total': ('counter', 'NSGA2 evaluations answered by the decode cache'),
+    'scheduler_decode_cache_misses_total': ('counter', 'NSGA2 evaluations that had to be decoded'),
+    'scheduler_local_moves_total': ('counter', 'Moves made by the local search pass'),
+    'scheduler_events_failed_total': ('counter', 'Events left unscheduled by a solve'),
+    'scheduler_events_late_total': ('counter', 'Events scheduled too close to their due date by a solve'),
+    'scheduler_generation': ('gauge', 'Generation the running NSGA2 search is on'),
+    'scheduler_jobs': ('gauge', 'Optimize jobs the server knows about, by state'),
+    'scheduler_view_cache_hits_total': ('counter', 'Calendar responses served from the view cache, by view'),
+    'scheduler_view_cache_misses_total': ('counter', 'Calendar responses that had to be built, by view'),
+};
+
+def label_text(labels: tuple) -> str:
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}' if labels else '';
+
+class Metrics:
+    """Thread-safe counters, gauges and phase timings, rendered in the Prometheus text format"""
+    def __init__(self):
+        self.lock = Lock();
+        self.values: Dict[str, Dict[tuple, float]] = {};
+        self.timings: Dict[str, List[float]] = {};    # phase -> [seconds, count]
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()));
+        with self.lock:
+            series = self.values.setdefault(name, {});
+            series[key] = series.get(key, 0) + value;
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self.lock:
+            self.values.setdefault(name, {})[tuple(sorted(labels.items()))] = value;
+
+    def observe(self, phase: str, seconds: float) -> None:
+        with self.lock:
+            total = self.timings.setdefault(phase, [0.0, 0]);
+            total[0] += seconds;
+            total[1] += 1;
+
+    def snapshot(self) -> tuple[Dict[str, Dict[tuple, float]], Dict[str, List[float]]]:
+        """Copy of every series and phase timing, e.g. to hand back from a pool process"""
+        with self.lock:
+            return ({name: dict(series) for name, series in self.values.items()}, {phase: list(total) for phase, total in self.timings.items()});
+
+    def merge(self, snapshot: tuple[Dict[str, Dict[tuple, float]], Dict[str, List[float]]]) -> None:
+        """Fold in a snapshot taken somewhere else: counters and timings add up, gauges take its value"""
+        values, timings = snapshot;
+        with self.lock:
+            for name, series in values.items():
+                mine = self.values.setdefault(name, {});
+                gauge = HELP.get(name, ('untyped', name))[0] == 'gauge';
+                for key, value in series.items():
+                    mine[key] = value if gauge else mine.get(key, 0) + value;
+
+            for phase, (seconds, count) in timings.items():
+                total = self.timings.setdefault(phase, [0.0, 0]);
+                total[0] += seconds;
+                total[1] += count;
+
+    def render(self) -> str:
+        lines = [];
+        with self.lock:
+            kind, text = HELP['scheduler_phase_seconds'];
+            lines += [f'# HELP scheduler_phase_seconds {text}', f'# TYPE scheduler_phase_seconds {kind}'];
+            for phase, (seconds, count) in sorted(self.timings.items()):
+                lines.append(f'scheduler_phase_seconds_sum{{phase="{phase}"}} {seconds:.6f}');
+                lines.append(f'scheduler_phase_seconds_count{{phase="{phase}"}} {count}');
+
+            for name, series in sorted(self.values.items()):
+                kind, text = HELP.get(name, ('untyped', name));
+                lines += [f'# HELP {name} {text}', f'# TYPE {name} {kind}'];
+                lines += [f'{name}{label_text(labels)} {value:g}' for labels, value in sorted(series.items())];
+
+        return '\n'.join(lines) + '\n';
+
+    def reset(self) -> None:
+        with self.lock:
+            self.values.clear();
+            self.timings.clear();
+
+METRICS = Metrics();
+
+class timed(ContextDecorator):
+    """Adds the wall time of a block or function call to a phase, e.g. @timed('load_data')"""
+    def __init__(self, phase: str):
+        self.phase = phase;
+        self.began = 0.0;
+
+    def _recreate_cm(self) -> 'timed':
+        # a fresh timer per call, so decorated functions can recurse or run on several threads
+        return timed(self.phase);
+
+    def __enter__(self) -> 'timed':
+        self.began = perf_counter();
+        return self;
+
+    def __exit__(self, *exc) -> bool:
+        METRICS.observe(self.phase, perf_counter() - self.began);
+        return False;
+
+# ===== #
+# HOOKS #                               MARK: Hooks
+# ===== #
+# call sites check the list before building anything, so nothing runs while it is empty:
+#     if DEBUG_HOOKS: emit('decode', x=x)
+
+DEBUG_HOOKS: List[Callable[[str, dict], None]] = [];
+
+def emit(name: str, **values) -> None:
+    for hook in DEBUG_HOOKS: hook(name, values);
+
+def print_hook(name: str, values: dict) -> None:
+    """The old debug prints, for DEBUG_HOOKS.append(print_hook)"""
+    for key, value in values.items(): print(f'{name} {key}: {value}');
+
+# ========= #
+# PROFILING #                           MARK: Profiling
+# ========= #
+
+PROFILE_LINES = 40;
+
+def profile_report(profiler: Profile, lines: int = PROFILE_LINES) -> str:
+    """The most expensive calls of a finished cProfile run by cumulative time, as text"""
+    out = StringIO();
+    Stats(profiler, stream=out).sort_stats('cumulative').print_stats(lines);
+    return out.getvalue();
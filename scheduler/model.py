@@ -1,8 +1,8 @@
-from dataclasses import dataclass
-from typing import Literal
+from dataclasses import dataclass, field
+from typing import List, Literal, Optional
 from datetime import datetime, timedelta
 
-@dataclass
+@dataclass(slots=True)
 class TimeWindow:
     """Abstract class that defines a window of time"""
     start: datetime;
@@ -13,11 +13,12 @@ class TimeWindow:
     def duration(self) -> timedelta:
         return self.end - self.start;
 
-@dataclass
+@dataclass(slots=True)
 class Slot(TimeWindow):
     """A window of available time that can be filled with events"""
     id: int;
     time_used: int = 0;
+    person_id: Optional[int] = None;    # whose calendar, None for the owner's
     
     @property
     def capacity(self) -> timedelta:
@@ -25,15 +26,15 @@ class Slot(TimeWindow):
     
     @property
     def adj_start(self) -> datetime:
-        return self.start + (self.duration - self.capacity);
+        # same as start + (duration - capacity), without the two intermediate timedeltas
+        return self.start + timedelta(minutes=self.time_used);
         
-@dataclass
+@dataclass(slots=True)
 class Event(TimeWindow):
     """A Event that has a range of length that needs to be scheduled"""
     min_time: timedelta;
     max_time: timedelta;
     
-    # availibility: List[TimeWindow];
     due_date: datetime;
     id: int;
     
@@ -41,6 +42,12 @@ class Event(TimeWindow):
     is_scheduled: bool = False;
     is_failed: bool = False;
     
+    # windows the event has to fall inside, empty means anywhere
+    availability: List[TimeWindow] = field(default_factory=list);
+    
+    # people who all have to be free for it, None being the owner; empty means the owner alone
+    attendees: List[Optional[int]] = field(default_factory=list);
+    
     def calc_duration(self, percent: float) -> timedelta:
         return self.min_time + percent * (self.max_time - self.min_time);
     
@@ -1,99 +1,84 @@
-from typing import List
+from bisect import bisect_right
+from copy import deepcopy
+from dataclasses import dataclass, field, replace
+from functools import partial
+from threading import Event as Flag
+from time import perf_counter
+from typing import Callable, Dict, List, Literal, Optional
 from datetime import datetime, timedelta
 
 from model import Slot, Event
 from database import SchedulerStorage
+from decoder import GRID, CacheStats, DecodeCache, Placement, build_arrays, decode_population, decode_permutations, decode_schedule, encode_schedule, gene_signatures, to_minutes
+from parallel import PoolKind, PopulationPool
+from permutation import PermutationCrossover, PermutationDuplicates, PermutationMutation, PermutationSampling, from_random_keys, permutation_bounds
+from slot_index import SlotIndex
+from availability import feasibility_of
+from tables import SlotTable, EventTable, split_windows, to_datetimes
+from recurrence import with_templates
+from local_search import LOCAL_SEARCH_PASSES, local_search
+from metrics import DEBUG_HOOKS, METRICS, emit, timed
+from exact import EXACT_LIMIT, BranchAndBound, lower_bound, order_to_x, relative_gap, score, score_schedule
 
 import numpy as np
-from pymoo.core.problem import ElementwiseProblem
+from pymoo.core.problem import ElementwiseProblem, Problem
 from pymoo.optimize import minimize
 from pymoo.algorithms.moo.nsga2 import NSGA2
-from pymoo.termination import get_termination
 from pymoo.operators.crossover.sbx import SBX
 from pymoo.operators.mutation.pm import PM
 from pymoo.operators.sampling.rnd import FloatRandomSampling
+from pymoo.core.sampling import Sampling
+from pymoo.core.callback import Callback
+from pymoo.core.termination import TerminateIfAny
+from pymoo.termination.default import DefaultMultiObjectiveTermination
+from pymoo.termination.max_time import TimeBasedTermination
 
 
 # opt logic
-def optimize_schedule( x:np.ndarray, slots:List[Slot], events:List[Event], debug:bool) -> tuple[float, int, float, List[Event], List[Slot]]:
+def apply_placement(placement: Placement, slots: List[Slot], events: List[Event]) -> tuple[List[Event], List[Slot]]:
+    """Write a decoded placement onto the model objects, the only step that mutates them"""
+    placed = np.flatnonzero(placement.placed);
+    starts = to_datetimes(placement.start[placed]);
+    ends = to_datetimes(placement.end[placed]);
     
-    if debug: print(f'x: {x}');
-    # extract x
-    duration_scalars = x[:len(events)];
-    ordering_values  = x[len(events):];
-    
-    # sort events by second half of x
-    events_zip = list(zip(events, duration_scalars, ordering_values));
-    events_zip.sort(key=lambda tuple: tuple[2]);
+    for index, start, end in zip(placed.tolist(), starts, ends):
+        events[index].schedule_event(start=start, end=end);
+        slots[int(placement.slot[index])].time_used += int(placement.end[index] - placement.start[index]);
+        
+    return (events, slots);
+
+def placement_of(slots: List[Slot], events: List[Event]) -> Placement:
+    """The inverse of apply_placement: a finished schedule as a Placement over the same slot and event lists"""
+    by_start = sorted(range(len(slots)), key=lambda index: slots[index].start);
+    starts = [slots[index].start for index in by_start];
+    placement = Placement(np.full(len(events), -1, dtype=np.int64), np.zeros(len(events), dtype=np.int64), np.zeros(len(events), dtype=np.int64));
+
+    for index, event in enumerate(events):
+        if not event.is_scheduled: continue;
+        position = bisect_right(starts, event.start) - 1;
+        if position < 0 or event.end > slots[by_start[position]].end: continue;
+        placement.slot[index] = by_start[position];
+        placement.start[index], placement.end[index] = to_minutes(event.start), to_minutes(event.end);
+
+    return placement;
+
+def optimize_schedule( x:np.ndarray, slots:List[Slot], events:List[Event]) -> tuple[float, int, float, List[Event], List[Slot]]:
     
-    events_sorted = [event for event, _, _ in events_zip];
-    duration_scalars = [duration for _, duration, _ in events_zip];
+    if DEBUG_HOOKS: emit('optimize_schedule', x=x);
     
-    total_slot_priority: float = 0;
-    num_late: int = 0;
-    event_sooness_penalty: float = 0;
+    total_slot_priority, num_late, event_sooness_penalty, placement = decode_schedule(x, build_arrays(slots, events));
     
-    slot_index: int = 0;
-    out_of_space: bool = False;
+    if DEBUG_HOOKS: emit('optimize_schedule', slots=placement.slot);
     
-    # walk through each event, with each x
-    for x_index, event in enumerate(events_sorted):
-        if debug: print(f'current event: {event.id}');
-                    
-        total_minutes = event.calc_duration(duration_scalars[x_index]).total_seconds() / 60;
-        duration: timedelta = timedelta(minutes=round(total_minutes / 15) * 15);
-        
-        if debug: print(f'duration: {duration}');
-        
-        # loop to find a slot
-        while(True):
-            
-            # first check to see if out of bounds
-            if slot_index >= len(slots) or out_of_space: 
-                if debug: print(f'checking slot: OUT_OF_SPACE');
-                out_of_space = True;
-                num_late += 1;
-                total_slot_priority += 5.01;
-                break;
-                
-            if debug: print(f'checking slot: {slots[slot_index].id}');
-            # next check to see if current slot has room for event
-            if slots[slot_index].capacity < duration:
-                # move to next slot if previous too small
-                slot_index += 1;
-            
-            # there is room, move on to schedule   
-            else: break;
-            
-        # assign event to slot
-        if not out_of_space:
-            start: datetime = slots[slot_index].adj_start;
-            
-            end: datetime = start + duration;
-            
-            if debug: print(f'scheduling event: {event.id}');
-            event.schedule_event(start=start, end=end);
-            slots[slot_index].time_used += int(duration.total_seconds() // 60);
-
-            # Calculate objectives
-            total_slot_priority += slots[slot_index].priority;
-            
-            if slots[slot_index].adj_start + event.min_time > event.due_date:
-                num_late += 10;
-                
-            days_till_due = (event.due_date - event.start).days;
-            if debug: print(f'days: {days_till_due}');
-                
-            event_sooness_penalty += 1 - pow( np.e, 0.2 * (days_till_due));
-            # if days_till_due <= 0: event_sooness_penalty += 10;
+    apply_placement(placement, slots, events);
                     
     return (total_slot_priority, num_late, event_sooness_penalty, events, slots);
 
 class SchedulerProblem(ElementwiseProblem):
-    def __init__(self, slots: List[Slot], events: List[Event], debug: bool = False):
+    def __init__(self, slots: List[Slot], events: List[Event]):
         self.slots = slots;
         self.events = events;
-        self.debug = debug;
+        self.arrays = build_arrays(slots, events);
         
         # Two variables per event -> the 0 to 1 scale of event.min to event.max time
         #                         -> the order to schedule events, 0 to 1
@@ -113,81 +98,520 @@ class SchedulerProblem(ElementwiseProblem):
     
     def _evaluate(self, x, out, *args, **kwargs):
         
-        total_slot_priority, num_late, sooness, _, _ = optimize_schedule(x, self.slots, self.events, self.debug);
+        if DEBUG_HOOKS: emit('evaluate', x=x);
+        
+        total_slot_priority, num_late, sooness, _ = decode_schedule(x, self.arrays);
 
         out["F"] = [total_slot_priority, sooness];
         out["G"] = [num_late];
+
+# random_key: SchedulerProblem's floats; permutation: integer order and duration buckets, see permutation.py
+Encoding = Literal['random_key', 'permutation'];
+
+class VectorizedSchedulerProblem(Problem):
+    """Same objectives as SchedulerProblem, but decodes the whole population per call
+
+    first_fit places events the way greedy_scheduler does rather than with
+    optimize_schedule's slot cursor, see decoder.decode_ordered.
+    """
+    def __init__(self, slots: List[Slot], events: List[Event], workers: int = 0, pool_kind: PoolKind = 'process', encoding: Encoding = 'random_key', first_fit: bool = False):
+        self.slots = slots;
+        self.events = events;
+        self.arrays = build_arrays(slots, events);
+        self.encoding = encoding;
+        
+        n_var = len(events) * 2;
+        
+        if encoding == 'permutation':
+            self.decode = partial(decode_permutations, first_fit=first_fit);
+            self.cache = DecodeCache(self.arrays, signatures=gene_signatures);
+            xl, xu = permutation_bounds(self.arrays);
+        elif encoding == 'random_key':
+            self.decode = partial(decode_population, first_fit=first_fit);
+            self.cache = DecodeCache(self.arrays);
+            xl, xu = np.zeros(n_var), np.ones(n_var);
+        else:
+            raise ValueError(f"Unknown encoding: {encoding}");
+        
+        # opt-in: spread each population over a worker pool
+        self.pool = PopulationPool(self.arrays, workers, pool_kind, self.decode) if workers > 1 else None;
         
-        # reset objects
-        for slot in self.slots:
-            slot.time_used = 0;
+        super().__init__(n_var=n_var, n_obj=2, n_constr=1, xl=xl, xu=xu);
+        
+    def _evaluate(self, X, out, *args, **kwargs):
+        # only rows that decode to a schedule not seen yet go to the pool / decoder
+        out["F"], out["G"] = self.cache.evaluate(X, self.decode_rows);
+        
+    @timed('decode')
+    def decode_rows(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if DEBUG_HOOKS: emit('decode', rows=len(X));
+        
+        return self.pool.evaluate(X) if self.pool else self.decode(X, self.arrays);
             
-        for event in self.events:
-            event.is_scheduled = False;
-            event.start = None;
-            event.end = None;
+    def close(self) -> None:
+        if self.pool: self.pool.close();
        
 # MARK: NSGA2  
-def schedule_with_nsga2(slots: List[Slot], events: List[Event]) -> tuple[List[Event], List[Slot]]:
-    problem = SchedulerProblem(slots, events);
+NSGA2_GENERATIONS = 100;
+
+class WarmStartSampling(Sampling):
+    """Known decision vectors first, the rest of the population random"""
+    def __init__(self, seeds: np.ndarray):
+        super().__init__();
+        self.seeds = seeds;
+        
+    def _do(self, problem, n_samples, *args, **kwargs):
+        seeds = self.seeds[:n_samples];
+        rest = FloatRandomSampling()._do(problem, n_samples - len(seeds), *args, **kwargs);
+        
+        return np.vstack([seeds, rest]) if len(seeds) else rest;
+
+def warm_start_seeds(slots: List[Slot], events: List[Event], saved: Dict[int, tuple[datetime, datetime]], greedy_events: List[Event]) -> np.ndarray:
+    """Encodings of the saved schedule (if any) and of the greedy schedule"""
+    seeds = [encode_schedule(slots, events, saved)] if saved else [];
+    seeds.append(encode_schedule(slots, events, {event.id: (event.start, event.end) for event in greedy_events if event.is_scheduled}));
+    
+    return np.array(seeds);
 
-    algorithm = NSGA2(pop_size=100,
-                sampling=FloatRandomSampling(),
-                crossover=SBX(prob=1.0, eta=3.0),
-                mutation=PM(prob=1.0, eta=3.0),
-                eliminate_duplicates=False,
-                );
+def schedule_with_nsga2(slots: List[Slot], events: List[Event], workers: int = 0, pool_kind: PoolKind = 'process', saved: Dict[int, tuple[datetime, datetime]] = None, time_budget: Optional[float] = None) -> tuple[List[Event], List[Slot]]:
+    placement, _, _ = solve_nsga2(slots, events, workers, pool_kind, saved, time_budget=time_budget);
 
-    termination = get_termination("n_gen", 100);
+    return apply_placement(placement, slots, events);
 
-    result = minimize(
-        problem,
-        algorithm,
-        termination,
-        verbose=False
-    );
+def solve_nsga2(slots: List[Slot], events: List[Event], workers: int = 0, pool_kind: PoolKind = 'process', saved: Dict[int, tuple[datetime, datetime]] = None, callback: Optional[Callback] = None, time_budget: Optional[float] = None, encoding: Encoding = 'random_key') -> tuple[Placement, int, CacheStats]:
+    """Run NSGA2 without touching the models; returns the winning placement, the number of evaluations and decode cache counters
     
-    _, _, _, opt_events, opt_slots = optimize_schedule(result.X[0], slots, events, False);
+    callback is called by pymoo after every generation, e.g. to report progress or stop early.
+    time_budget (seconds) stops the run at the first generation past it, whatever the front looks like.
+    """
+    # placed like greedy places them, so the greedy seed decodes to greedy's own schedule
+    problem = VectorizedSchedulerProblem(slots, events, workers, pool_kind, encoding, first_fit=True);
 
-    return (opt_events, opt_slots);
+    # durations off the GRID (and the saved seed) only decode to roughly the schedule they came from, so greedy stays the one to beat
+    greedy_slots, greedy_events = deepcopy(slots), deepcopy(events);
+    greedy_scheduler(greedy_slots, greedy_events);
+    seeds = warm_start_seeds(slots, events, saved, greedy_events);
+    incumbent, incumbent_cost = placement_of(greedy_slots, greedy_events), score_schedule(greedy_slots, greedy_events);
+
+    if encoding == 'permutation':
+        # moves always change the order, and each schedule has one encoding so duplicates are cheap to drop
+        algorithm = NSGA2(pop_size=100,
+                    sampling=PermutationSampling(from_random_keys(seeds, problem.arrays)),
+                    crossover=PermutationCrossover(),
+                    mutation=PermutationMutation(),
+                    eliminate_duplicates=PermutationDuplicates(),
+                    );
+    else:
+        algorithm = NSGA2(pop_size=100,
+                    sampling=WarmStartSampling(seeds),
+                    crossover=SBX(prob=1.0, eta=3.0),
+                    mutation=PM(prob=1.0, eta=3.0),
+                    eliminate_duplicates=False,
+                    );
+
+    # stop once the front stops moving, still capped at 100 generations
+    termination = DefaultMultiObjectiveTermination(ftol=0.0025, period=10, n_max_gen=NSGA2_GENERATIONS);
+    if time_budget is not None:
+        # a spent budget still gets the first generation
+        termination = TerminateIfAny(termination, TimeBasedTermination(max(float(time_budget), 1e-3)));
+
+    # previews start from the schedule the run is sure to match
+    if isinstance(callback, AnytimeCallback): callback.incumbent(incumbent, problem.events, incumbent_cost);
+
+    try:
+        # decode time inside the loop is counted on its own as well
+        with timed('nsga2'):
+            result = minimize(
+                problem,
+                algorithm,
+                termination,
+                callback=callback or Callback(),
+                verbose=False
+            );
+    finally:
+        problem.close();
+    
+    total_slot_priority, num_late, sooness, placement = decode_schedule(best_solution(result), problem.arrays, problem.decode);
+    if not better_than(num_late, total_slot_priority, sooness, incumbent_cost): placement = incumbent;
+
+    return (placement, result.algorithm.evaluator.n_eval, problem.cache.stats);
+
+def best_solution(result) -> np.ndarray:
+    """Best scoring point of the final front, or the least infeasible individual when nothing is feasible"""
+    if result.X is not None:
+        return np.atleast_2d(result.X)[best_index(np.atleast_2d(result.F), np.atleast_2d(result.CV))];
+    
+    return result.pop[np.argmin(result.pop.get("CV")[:, 0])].X;
+
+def better_than(num_late: float, total_slot_priority: float, sooness: float, other: tuple[float, float, float]) -> bool:
+    """Lower score than other (num late, slot priority, sooness), or the same score and lower sooness"""
+    return (score(num_late, total_slot_priority), sooness) < (score(other[0], other[1]), other[2]);
+
+def best_index(F: np.ndarray, CV: np.ndarray) -> int:
+    """Row with the lowest score (late events, then slot priority), sooness breaking ties"""
+    return int(np.lexsort((F[:, 1], score(CV[:, 0], F[:, 0])))[0]);
+
+# MARK: Anytime
+@dataclass
+class Preview:
+    """Best schedule NSGA2 has found so far, while it keeps running"""
+    generation: int
+    seconds: float
+    num_late: float
+    slot_priority: float
+    sooness: float
+    placements: Dict[int, tuple[datetime, datetime]]     # event id -> (start, end), placed events only
+
+class AnytimeCallback(Callback):
+    """Hands every improvement on the best schedule so far to on_improve
+    
+    The first preview is the incumbent solve_nsga2 falls back on, and a
+    generation is only shown when it beats every preview before it. The
+    current front is ranked the way best_solution ranks the final one, so
+    the last preview is the schedule the run ends up returning.
+    """
+    def __init__(self, on_improve: Optional[Callable[[Preview], None]] = None):
+        super().__init__();
+        self.on_improve = on_improve;
+        self.best: Optional[tuple[float, float]] = None;
+        self.started = perf_counter();
+        
+    def notify(self, algorithm) -> None:
+        F = algorithm.opt.get("F");
+        CV = algorithm.opt.get("CV");
+        index = best_index(F, CV);
+        
+        key = (score(CV[index, 0], F[index, 0]), F[index, 1]);
+        METRICS.set('scheduler_generation', algorithm.n_gen);
+        if self.best is not None and key >= self.best: return;
+        self.best = key;
+        
+        problem = algorithm.problem;
+        _, _, _, placement = decode_schedule(algorithm.opt[index].X, problem.arrays, problem.decode);
+        self.publish(algorithm.n_gen, placement, problem.events, (CV[index, 0], F[index, 0], F[index, 1]));
+
+    def incumbent(self, placement: Placement, events: List[Event], cost: tuple[float, float, float]) -> None:
+        """Start a run from the schedule it has to beat, shown as generation 0
+
+        A rolling horizon starts a fresh run for every window, which resets the best so far.
+        """
+        self.best = (score(cost[0], cost[1]), cost[2]);
+        self.publish(0, placement, events, cost);
+
+    def publish(self, generation: int, placement: Placement, events: List[Event], cost: tuple[float, float, float]) -> None:
+        """Preview of placement, cost being (num late, slot priority, sooness)"""
+        placed = np.flatnonzero(placement.placed);
+        
+        preview = Preview(
+            generation=generation,
+            seconds=perf_counter() - self.started,
+            num_late=float(cost[0]),
+            slot_priority=float(cost[1]),
+            sooness=float(cost[2]),
+            placements=dict(zip(
+                [events[i].id for i in placed],
+                zip(to_datetimes(placement.start[placed]), to_datetimes(placement.end[placed])),
+            )),
+        );
+        self.improved(preview);
+        
+    def improved(self, preview: Preview) -> None:
+        if self.on_improve: self.on_improve(preview);
+
+class CancelCallback(Callback):
+    """Stops the run at the end of the generation in which cancelled gets set"""
+    def __init__(self, cancelled: Flag):
+        super().__init__();
+        self.cancelled = cancelled;
+
+    def notify(self, algorithm) -> None:
+        if self.cancelled.is_set(): algorithm.termination.terminate();
 
 
 # MARK: Greedy
 def greedy_scheduler(slots: List[Slot], events: List[Event]) -> tuple[List[Event], List[Slot]]:
-        # pass through events in priority order
-    for event in events:
+    index = SlotIndex(slots, feasibility_of(slots, events));
+    
+    # pass through events in priority order
+    for position, event in enumerate(events):
         # try different times for event, from max to min incrementing by 15
-
-        for duration in [timedelta(minutes=x)
-                            for x in range(
-                            int(event.max_time.total_seconds() / 60),
-                            int(event.min_time.total_seconds() / 60) - 1,
-                            -15
-                        )]:
-            selected_slot = None;
-            for slot in slots:
-                if duration <= slot.capacity and (slot.start + duration <= event.due_date):
-                    selected_slot = slot;
-                    break;
-            if selected_slot:
-                event.schedule_event(slot.adj_start, slot.adj_start + duration);
-                slot.time_used += int(duration.total_seconds() // 60);
-                break
+        for minutes in range(
+                int(event.max_time.total_seconds() / 60),
+                int(event.min_time.total_seconds() / 60) - 1,
+                -15
+            ):
+            duration = timedelta(minutes=minutes);
+            slot_index = index.first_fit(minutes, event.due_date - duration, position);
+            
+            if slot_index >= 0:
+                slot = slots[slot_index];
+                start = slot.adj_start;
+                event.schedule_event(start, start + duration);
+                slot.time_used += minutes;
+                index.consume(slot_index, minutes);
+                break;
 
         if not event.is_scheduled: event.is_failed = True;
 
-        # could later add logic to try to recover time from previously scheduled events
+        # run_engine follows up with local_search, which can shrink earlier events to make room
         
-        return (events, slots);
+    return (events, slots);
    
+# MARK: Incremental
+def pin_placements(slots: List[Slot], rows: list) -> set[int]:
+    """Keep the saved placements that still fit inside a slot; returns the ids kept
+    
+    Pinned events use up their slot up to where they end, so new events are
+    only ever added after them, the same way the engines fill slots.
+    """
+    by_start = sorted(slots, key=lambda slot: slot.start);
+    starts = [slot.start for slot in by_start];
+    pinned: set[int] = set();
+    
+    for row in sorted(rows, key=lambda row: row['start']):
+        start = datetime.fromisoformat(row['start']);
+        end = datetime.fromisoformat(row['end']);
+        
+        position = bisect_right(starts, start) - 1;
+        if position < 0: continue;
+        
+        slot = by_start[position];
+        if end > slot.end or start < slot.adj_start: continue;
+        
+        slot.time_used = int((end - slot.start).total_seconds() // 60);
+        pinned.add(row['id']);
+        
+    return pinned;
+
+# MARK: Engines
+ROLLING_OVERLAP_DAYS = 2;
+
+@dataclass
+class EngineOptions:
+    """Knobs shared by every engine; each one reads what it needs"""
+    workers: int = 0
+    pool_kind: PoolKind = 'process'
+    saved: Dict[int, tuple[datetime, datetime]] = field(default_factory=dict)
+    exact_limit: int = EXACT_LIMIT
+    callback: Optional[Callback] = None   # per-generation hook for engines that have generations
+    time_budget: Optional[float] = None   # seconds, for engines that can stop with a good-enough answer
+    window_days: int = 0                  # rolling horizon window, 0 solves everything at once
+    overlap_days: int = ROLLING_OVERLAP_DAYS
+    encoding: Encoding = 'random_key'     # NSGA2 decision vector, see VectorizedSchedulerProblem
+    local_search: int = LOCAL_SEARCH_PASSES     # sweeps of repair moves after the engine, 0 turns it off
+    cancelled: Optional[Flag] = None      # once set, engines stop at their next check and return what they have
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancelled is not None and self.cancelled.is_set();
+
+@dataclass
+class EngineResult:
+    events: List[Event]
+    slots: List[Slot]
+    engine: str                     # engine that actually ran, after any fallback
+    bound: Optional[float] = None   # proven lower bound on score, if the engine has one
+    evaluations: int = 0            # schedules decoded or search nodes visited
+    cache: CacheStats = field(default_factory=CacheStats)   # decode cache, for engines that decode populations
+
+@dataclass
+class SolveReport:
+    """What a Scheduler.schedule run cost and how good the result is"""
+    method: str
+    engine: str
+    seconds: float
+    evaluations: int
+    num_late: float
+    slot_priority: float
+    sooness: float
+    score: float
+    bound: float
+    gap: float
+    cache_hits: int = 0
+    cache_misses: int = 0
+    local_moves: int = 0
+    
+    @property
+    def cache_hit_rate(self) -> float:
+        return CacheStats(self.cache_hits, self.cache_misses).hit_rate;
+
+Engine = Callable[[List[Slot], List[Event], EngineOptions], EngineResult]
+
+def greedy_engine(slots: List[Slot], events: List[Event], options: EngineOptions) -> EngineResult:
+    return EngineResult(*greedy_scheduler(slots, events), 'greedy', evaluations=1);
+
+def genetic_engine(slots: List[Slot], events: List[Event], options: EngineOptions) -> EngineResult:
+    # a job's callback stops the run itself; without one the flag gets its own
+    callback = options.callback or (CancelCallback(options.cancelled) if options.cancelled else None);
+    placement, evaluations, cache = solve_nsga2(slots, events, options.workers, options.pool_kind, options.saved, callback, options.time_budget, options.encoding);
+    
+    return EngineResult(*apply_placement(placement, slots, events), 'genetic', evaluations=evaluations, cache=cache);
+
+def exact_engine(slots: List[Slot], events: List[Event], options: EngineOptions) -> EngineResult:
+    """Branch and bound for small instances, NSGA2 above options.exact_limit events"""
+    if len(events) > options.exact_limit:
+        return genetic_engine(slots, events, options);
+    
+    arrays = build_arrays(slots, events);
+    result = BranchAndBound(arrays, cancelled=options.cancelled).solve();
+    _, _, _, placement = decode_schedule(order_to_x(result.order), arrays);
+    
+    return EngineResult(*apply_placement(placement, slots, events), 'exact', result.bound, result.nodes);
+
+ENGINES: Dict[str, Engine] = {
+    'greedy': greedy_engine,
+    'genetic': genetic_engine,
+    'exact': exact_engine,
+}
+
+def run_engine(method: str, slots: List[Slot], events: List[Event], options: EngineOptions) -> tuple[EngineResult, SolveReport]:
+    """Run a registered engine and measure it"""
+    bound = lower_bound(slots, events);
+    
+    began = perf_counter();
+    with timed('engine'):
+        result = rolling_horizon(method, slots, events, options) if options.window_days else ENGINES[method](slots, events, options);
+    with timed('local_search'):
+        moves = local_search(result.slots, result.events, options.local_search) if options.local_search and not options.is_cancelled else 0;
+    seconds = perf_counter() - began;
+    
+    num_late, slot_priority, sooness = score_schedule(result.slots, result.events);
+    value = score(num_late, slot_priority);
+    # the exact bound holds for the decoder's moves, local search can shrink durations past it
+    bound = min(result.bound, value) if result.bound is not None else bound;
+    count_run(result, moves);
+    
+    return (result, SolveReport(method, result.engine, seconds, result.evaluations, num_late, slot_priority, sooness, value, bound, relative_gap(value, bound), result.cache.hits, result.cache.misses, moves));
+
+def count_run(result: EngineResult, moves: int) -> None:
+    """Add a finished solve to the process metrics"""
+    METRICS.inc('scheduler_evaluations_total', result.evaluations, engine=result.engine);
+    METRICS.inc('scheduler_local_moves_total', moves);
+    METRICS.inc('scheduler_decode_cache_hits_total', result.cache.hits);
+    METRICS.inc('scheduler_decode_cache_misses_total', result.cache.misses);
+    METRICS.inc('scheduler_events_failed_total', sum(not event.is_scheduled for event in result.events));
+    METRICS.inc('scheduler_events_late_total', sum(event.is_scheduled and event.end + event.min_time > event.due_date for event in result.events));
+
+# MARK: Rolling Horizon
+def rolling_horizon(method: str, slots: List[Slot], events: List[Event], options: EngineOptions) -> EngineResult:
+    """Run an engine over windows of options.window_days instead of the whole horizon
+    
+    Each window gets the slots it overlaps and the open events due before it
+    ends. Placements starting in the first window_days - overlap_days are
+    fixed; the rest are solved again with the next window, along with events
+    that did not fit before their due date. Fixed events always come first in
+    their slot, so they use it up as a time_used prefix, the same way
+    pin_placements keeps a saved schedule.
+    """
+    window = timedelta(days=options.window_days);
+    step = window - timedelta(days=min(options.overlap_days, options.window_days - 1));
+    
+    pending = list(events);
+    open_slots = list(slots);
+    engines: set[str] = set();
+    evaluations = 0;
+    cache = CacheStats();
+    
+    window_start = min([slot.start for slot in slots] + [event.due_date for event in events]);
+    last_due = max(event.due_date for event in events);
+    began = perf_counter();
+    
+    while pending and not options.is_cancelled:
+        window_end = window_start + window;
+        fixed_before = window_start + step;
+        last = all(event.due_date < window_end for event in pending);
+        
+        # the last window takes every slot left
+        open_slots = [slot for slot in open_slots if slot.capacity >= timedelta(minutes=GRID)];
+        batch = [event for event in pending if event.due_date < window_end];
+        originals = [slot for slot in open_slots if last or slot.start < window_end];
+        window_slots = [replace(slot) for slot in originals];
+        
+        if not batch:
+            window_start = fixed_before;
+            continue;
+        
+        # a time budget is shared out over the windows still to go
+        window_options = options;
+        if options.time_budget is not None:
+            windows_left = max(1, -(-(last_due - window_start) // step));
+            window_options = replace(options, time_budget=max(0.0, options.time_budget - (perf_counter() - began)) / windows_left);
+        
+        result = ENGINES[method](window_slots, [replace(event) for event in batch], window_options);
+        slot_of = solved_slots(originals, result.slots, result.events);
+        engines.add(result.engine);
+        evaluations += result.evaluations;
+        cache.hits += result.cache.hits;
+        cache.misses += result.cache.misses;
+        
+        fixed = set();
+        for original, solved in zip(batch, result.events):
+            if solved.is_scheduled and (last or solved.start < fixed_before):
+                original.schedule_event(solved.start, solved.end);
+                slot = originals[slot_of[id(solved)]];
+                slot.time_used = max(slot.time_used, int((solved.end - slot.start) // timedelta(minutes=1)));
+            elif last:
+                original.is_failed = True;
+            else:
+                continue;
+            fixed.add(id(original));
+        
+        pending = [event for event in pending if id(event) not in fixed];
+        window_start = fixed_before;
+    
+    return EngineResult(events, slots, f"rolling {'+'.join(sorted(engines))}", evaluations=evaluations, cache=cache);
+
+def solved_slots(before: List[Slot], after: List[Slot], events: List[Event]) -> Dict[int, int]:
+    """Index of the slot each scheduled event went into, by id(event)
+
+    Engines only hand back times, but every slot they fill grows its used
+    prefix from before's adj_start to after's. Events claim that stretch in
+    start order, so slots that overlap or share a start are told apart.
+    """
+    claimed = [slot.adj_start for slot in before];
+    slot_of: Dict[int, int] = {};
+
+    for event in sorted((event for event in events if event.is_scheduled), key=lambda event: event.start):
+        for index, slot in enumerate(after):
+            if claimed[index] <= event.start and event.end <= slot.adj_start:
+                claimed[index] = event.end;
+                slot_of[id(event)] = index;
+                break;
+
+    return slot_of;
+
 # MARK: Scheduler
+# an event row joined with one of its availability windows (NULL when it has none)
+EVENT_COLUMNS = """
+    e.id, e.start, e.end, e.due_date, e.min_time, e.max_time, e.priority,
+    a.start AS window_start, a.end AS window_end, a.priority AS window_priority
+""";
+
+# the owner's own events; ones with attendees are left to the team scheduler
+OWNER_EVENTS = "NOT EXISTS (SELECT 1 FROM event_attendees t WHERE t.event_id = e.id)";
+
 class Scheduler:
-    def __init__(self, storage: SchedulerStorage):
+    def __init__(self, storage: SchedulerStorage, workers: int = 0, pool_kind: PoolKind = 'process', incremental: bool = False):
         self.storage = storage
+        self.workers = workers
+        self.pool_kind = pool_kind
+        self.incremental = incremental
         self.slots: List[Slot] = []
         self.events: List[Event] = []
-        self.load_data()
+        
+        # event id -> (start, end) as last saved, used to warm start the solver
+        self.saved: Dict[int, tuple[datetime, datetime]] = {}
+        
+        # filled in by schedule()
+        self.report: Optional[SolveReport] = None
+        
+        # dirty marks consumed by this run, cleared once its result is saved
+        self.last_mark: int = 0
+        
+        if incremental: self.load_dirty()
+        else: self.load_data()
     
+    @timed('load_data')
     def load_data(self):
         current_date = datetime.now()
         conn = self.storage.get_db_connection()
@@ -197,58 +621,126 @@ class Scheduler:
         cursor.execute("""
             SELECT start, end, priority, id FROM slots
             WHERE start >= ?
+            AND person_id IS NULL
             ORDER BY priority ASC, start ASC
         """, (current_date,))
-        self.slots = [Slot(datetime.fromisoformat(row['start']), datetime.fromisoformat(row['end']), row['priority'], row['id'], 0) for row in cursor.fetchall()]
+        self.slots = SlotTable.from_rows(cursor.fetchall()).to_models()
 
-        # Load all uncompleted events from today onwards, even previously scheduled
-        cursor.execute("""
-            SELECT id, name, start, end, due_date, min_time, max_time, priority FROM events
-            WHERE due_date >= ?
-            AND completed == 0
-            ORDER BY priority DESC, due_date ASC
+        # Load all uncompleted events from today onwards, even previously scheduled, with their availability
+        cursor.execute(f"""
+            SELECT {EVENT_COLUMNS} FROM events e
+            LEFT JOIN event_availability a ON a.event_id = e.id
+            WHERE e.due_date >= ?
+            AND e.completed == 0
+            AND {OWNER_EVENTS}
+            ORDER BY e.priority DESC, e.due_date ASC, e.id ASC, a.start ASC
         """, (current_date,))
-        self.events = [
-            Event(
-                None,
-                None,
-                row['priority'],
-                timedelta(minutes=row['min_time']),
-                timedelta(minutes=row['max_time']),
-                datetime.fromisoformat(row['due_date']),
-                row['id'],
-            ) for row in cursor.fetchall()
-        ]
+        rows, windows = split_windows(cursor.fetchall())
+        table = EventTable.from_rows(rows)
+        self.events = table.to_models(windows)
+        self.saved = table.placements()
 
-        conn.close()
+        # template slots up to the last due date; a slot after it could only make an event late
+        if self.events: self.slots = with_templates(cursor, self.slots, current_date, max(event.due_date for event in self.events))
 
-    def schedule(self, greedy:bool = False) -> None:
-        if greedy:
-            self.events, self.slots = greedy_scheduler(self.slots, self.events);
-            
-        else: 
-            self.events, self.slots = schedule_with_nsga2(self.slots, self.events);
+        # a full solve covers every outstanding change
+        self.last_mark, _, _ = self.storage.get_dirty_marks(cursor)
 
+        conn.close()
+        
+    @timed('load_dirty')
+    def load_dirty(self):
+        """Load only what changed since the last optimize, on top of the schedule that is kept
+        
+        Edited events, events sitting in a rewritten slot window and unscheduled
+        events due inside the affected horizon are rescheduled. Every other
+        placement in the horizon stays pinned and only uses up its slot.
+        """
+        current_date = datetime.now()
+        conn = self.storage.get_db_connection()
+        cursor = conn.cursor()
+        
+        self.last_mark, dirty_ids, windows = self.storage.get_dirty_marks(cursor)
+        
+        # events affected directly by the change
+        conditions = ['id = ?'] * len(dirty_ids) + ['(start >= ? AND start < ?)'] * len(windows)
+        touched = []
+        if conditions:
+            cursor.execute(f"""
+                SELECT id, due_date FROM events e
+                WHERE completed == 0
+                AND due_date >= ?
+                AND {OWNER_EVENTS}
+                AND ({' OR '.join(conditions)})
+            """, (current_date.isoformat(), *dirty_ids, *[bound.isoformat() for window in windows for bound in window]))
+            touched = cursor.fetchall()
+        
+        # nothing left to place, e.g. only deletions or completions
+        if not touched and not windows:
+            conn.close()
+            return
         
+        horizon_end = max([datetime.fromisoformat(row['due_date']) for row in touched] + [end for _, end in windows])
+        touched_ids = [row['id'] for row in touched]
+        
+        cursor.execute("""
+            SELECT start, end, priority, id FROM slots
+            WHERE start >= ? AND start < ?
+            AND person_id IS NULL
+            ORDER BY priority ASC, start ASC
+        """, (current_date, horizon_end))
+        self.slots = with_templates(cursor, SlotTable.from_rows(cursor.fetchall()).to_models(), current_date, horizon_end)
+        
+        # everything placed in the horizon, unscheduled events that could now fit, and the touched events
+        cursor.execute(f"""
+            SELECT {EVENT_COLUMNS} FROM events e
+            LEFT JOIN event_availability a ON a.event_id = e.id
+            WHERE e.completed == 0
+            AND e.due_date >= ?
+            AND {OWNER_EVENTS}
+            AND ((e.start >= ? AND e.start < ?)
+                 OR (e.start IS NULL AND e.due_date <= ?)
+                 OR e.id IN ({','.join('?' * len(touched_ids))}))
+            ORDER BY e.priority DESC, e.due_date ASC, e.id ASC, a.start ASC
+        """, (current_date.isoformat(), current_date.isoformat(), horizon_end.isoformat(), horizon_end.isoformat(), *touched_ids))
+        rows, windows = split_windows(cursor.fetchall())
+        
+        conn.close()
+        
+        edited = set(dirty_ids)
+        pinned_ids = pin_placements(self.slots, [row for row in rows if row['start'] is not None and row['id'] not in edited])
+        
+        self.events = EventTable.from_rows([row for row in rows if row['id'] not in pinned_ids]).to_models(windows)
 
-    def save_scheduled_events(self) -> None:
+    def schedule(self, method: str = 'genetic', callback: Optional[Callback] = None, time_budget: Optional[float] = None, window_days: int = 0, encoding: Encoding = 'random_key', cancelled: Optional[Flag] = None) -> None:
+        if method not in ENGINES:
+            raise ValueError(f"Unknown scheduling method: {method}");
+        
+        if not self.events: return;
+        
+        options = EngineOptions(self.workers, self.pool_kind, self.saved, callback=callback, time_budget=time_budget, window_days=window_days, encoding=encoding, cancelled=cancelled);
+        result, self.report = run_engine(method, self.slots, self.events, options);
+        
+        self.events, self.slots = result.events, result.slots;
+
+    @timed('save')
+    def save_scheduled_events(self) -> List[str]:
+        """Save the schedule; returns the old and new starts of the events that moved"""
         conn = self.storage.get_db_connection();
         cursor = conn.cursor();
-        for event in self.events:
-            if event.is_scheduled:
-                cursor.execute("""
-                    UPDATE events
-                    SET start = ?, end = ?
-                    WHERE id = ?
-                """, (event.start.isoformat(), event.end.isoformat(), event.id));
-                
-        for slot in self.slots:
-            if slot.time_used != 0:
-                cursor.execute("""
-                    UPDATE slots
-                    set time_used = ?
-                    WHERE id = ?
-                """, (slot.time_used, slot.id));
+        
+        placements = [(event.id, event.start.isoformat(), event.end.isoformat()) for event in self.events if event.is_scheduled];
+        
+        # a repair owns its events' placements, drop the ones that no longer fit
+        if self.incremental:
+            placements += [(event.id, None, None) for event in self.events if not event.is_scheduled];
+            
+        # every loaded slot, so ones this run left empty drop their old time_used; template slots have no row
+        time_used = [(slot.id, slot.time_used) for slot in self.slots if slot.id > 0];
+        
+        moved = self.storage.save_schedule(cursor, placements, time_used);
+        self.storage.clear_dirty_marks(cursor, self.last_mark);
             
         conn.commit();
-        conn.close();
\ No newline at end of file
+        conn.close();
+        return moved;
@@ -0,0 +1,60 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Literal, Optional
+
+from decoder import ScheduleArrays, decode_population
+
+import numpy as np
+
+PoolKind = Literal['process', 'thread'];
+
+# arrays and decoder for the current process; set once per worker by the pool initializer
+_worker_arrays: Optional[ScheduleArrays] = None;
+_worker_decode: Callable = decode_population;
+
+def _init_worker(arrays: ScheduleArrays, decode: Callable) -> None:
+    global _worker_arrays, _worker_decode;
+    _worker_arrays = arrays;
+    _worker_decode = decode;
+
+def _decode_chunk(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return _worker_decode(X, _worker_arrays);
+
+# MARK: Pool
+class PopulationPool:
+    """Splits each population over a pool of workers that already hold the schedule arrays
+
+    Process workers receive the arrays once through the pool initializer, so
+    only the decision matrix X and the resulting F/G travel per generation.
+    Thread workers share the parent's arrays directly.
+    """
+    def __init__(self, arrays: ScheduleArrays, workers: int, kind: PoolKind = 'process', decode: Callable = decode_population):
+        self.arrays = arrays;
+        self.workers = workers;
+        self.kind = kind;
+        self.decode = decode;
+
+        if kind == 'process':
+            self.executor: Executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(arrays, decode));
+        elif kind == 'thread':
+            self.executor: Executor = ThreadPoolExecutor(max_workers=workers);
+        else:
+            raise ValueError(f"Unknown pool kind: {kind}");
+
+    def evaluate(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        chunks = [chunk for chunk in np.array_split(X, self.workers) if len(chunk)];
+
+        if self.kind == 'process':
+            results = list(self.executor.map(_decode_chunk, chunks));
+        else:
+            results = list(self.executor.map(self.decode, chunks, [self.arrays] * len(chunks)));
+
+        return (np.vstack([F for F, _ in results]), np.vstack([G for _, G in results]));
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True);
+
+    def __enter__(self) -> 'PopulationPool':
+        return self;
+
+    def __exit__(self, *args) -> None:
+        self.close();
@@ -0,0 +1,109 @@
+from decoder import GRID, ScheduleArrays, duration_buckets
+
+import numpy as np
+from pymoo.core.crossover import Crossover
+from pymoo.core.duplicate import DuplicateElimination
+from pymoo.core.mutation import Mutation
+from pymoo.core.sampling import Sampling
+
+# ==================== #
+# PERMUTATION ENCODING #                MARK: Encoding
+# ==================== #
+# x = [duration bucket above the lowest, per event | event order], all integers,
+# decoded by decoder.decode_permutations
+
+def permutation_bounds(arrays: ScheduleArrays) -> tuple[np.ndarray, np.ndarray]:
+    """xl and xu of the encoding, both inclusive"""
+    n_events = arrays.n_events;
+    _, spread = duration_buckets(arrays);
+
+    return (np.zeros(2 * n_events, dtype=np.int64), np.concatenate([spread, np.full(n_events, n_events - 1)]));
+
+def from_random_keys(X: np.ndarray, arrays: ScheduleArrays) -> np.ndarray:
+    """Random-key rows as the permutation rows that decode to the same schedules"""
+    n_events = arrays.n_events;
+    X = np.atleast_2d(X);
+
+    order = np.argsort(X[:, n_events:], axis=1, kind='stable');
+    lowest, _ = duration_buckets(arrays);
+    buckets = np.round((arrays.event_min + X[:, :n_events] * (arrays.event_max - arrays.event_min)) / GRID).astype(np.int64) - lowest;
+
+    return np.hstack([buckets, order]);
+
+# ========= #
+# OPERATORS #                           MARK: Operators
+# ========= #
+
+class PermutationSampling(Sampling):
+    """Known rows first, the rest random orders at random durations"""
+    def __init__(self, seeds: np.ndarray):
+        super().__init__();
+        self.seeds = seeds;
+
+    def _do(self, problem, n_samples, *args, random_state=None, **kwargs):
+        seeds = self.seeds[:n_samples];
+        n_events = problem.n_var // 2;
+        rest = n_samples - len(seeds);
+
+        buckets = random_state.integers(0, problem.xu[:n_events] + 1, size=(rest, n_events));
+        orders = np.array([random_state.permutation(n_events) for _ in range(rest)]).reshape(rest, n_events);
+
+        return np.vstack([seeds, np.hstack([buckets, orders])]) if len(seeds) else np.hstack([buckets, orders]);
+
+def order_crossover(receiver: np.ndarray, donor: np.ndarray, start: int, end: int) -> np.ndarray:
+    """OX: donor[start:end] kept in place, the rest filled in the receiver's relative order"""
+    donation = donor[start:end];
+    rest = receiver[~np.isin(receiver, donation, assume_unique=True)];
+
+    return np.concatenate([rest[:start], donation, rest[start:]]);
+
+class PermutationCrossover(Crossover):
+    """Order crossover on the event order, uniform crossover on the duration buckets"""
+    def __init__(self, **kwargs):
+        super().__init__(2, 2, **kwargs);
+
+    def _do(self, problem, X, *args, random_state=None, **kwargs):
+        _, n_matings, n_var = X.shape;
+        n_events = n_var // 2;
+        Y = np.empty_like(X);
+
+        swap = random_state.random((n_matings, n_events)) < 0.5;
+        Y[0, :, :n_events] = np.where(swap, X[1, :, :n_events], X[0, :, :n_events]);
+        Y[1, :, :n_events] = np.where(swap, X[0, :, :n_events], X[1, :, :n_events]);
+
+        for mating in range(n_matings):
+            first, second = X[0, mating, n_events:], X[1, mating, n_events:];
+            start, end = np.sort(random_state.choice(n_events + 1, 2, replace=False));
+            Y[0, mating, n_events:] = order_crossover(first, second, start, end);
+            Y[1, mating, n_events:] = order_crossover(second, first, start, end);
+
+        return Y;
+
+class PermutationMutation(Mutation):
+    """Moves one event to another place in the order and re-rolls about one duration bucket"""
+    def _do(self, problem, X, *args, random_state=None, **kwargs):
+        n_events = problem.n_var // 2;
+        Y = X.copy();
+
+        for row in Y:
+            order = row[n_events:];
+            source, target = random_state.integers(0, n_events, size=2);
+            row[n_events:] = np.insert(np.delete(order, source), target, order[source]);
+
+        reroll = random_state.random(Y[:, :n_events].shape) < 1 / max(n_events, 1);
+        fresh = random_state.integers(0, problem.xu[:n_events] + 1, size=Y[:, :n_events].shape);
+        Y[:, :n_events] = np.where(reroll, fresh, Y[:, :n_events]);
+
+        return Y;
+
+class PermutationDuplicates(DuplicateElimination):
+    """Drops offspring with genes equal to another individual's"""
+    def _do(self, pop, other, is_duplicate):
+        seen = set() if other is None else {row.tobytes() for row in other.get("X").astype(np.int64)};
+
+        for index, row in enumerate(pop.get("X").astype(np.int64)):
+            key = row.tobytes();
+            if key in seen: is_duplicate[index] = True;
+            else: seen.add(key);
+
+        return is_duplicate;
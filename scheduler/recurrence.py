@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Iterator, List, Optional
+
+from model import Slot
+
+# =================== #
+# WEEKLY AVAILABILITY #                 MARK: Templates
+# =================== #
+# a saved week of slots repeats every week from valid_from on, without slot rows;
+# days that have their own slot rows or an exception keep what was saved for them
+
+TEMPLATE_IDS = 100_000;     # expanded slots get id -(template id * TEMPLATE_IDS + day number), never a row id
+
+TEMPLATES_QUERY = """
+    SELECT * FROM slot_templates
+    WHERE valid_from < ? AND (valid_until IS NULL OR valid_until > ?)
+""";
+
+EXCEPTIONS_QUERY = """
+    SELECT person_id, day FROM slot_exceptions
+    WHERE day >= ? AND day < ?
+""";
+
+@dataclass(slots=True)
+class SlotTemplate:
+    """A slot that repeats every week on one weekday"""
+    id: int;
+    weekday: int;                       # 0 is Monday, as datetime.weekday()
+    start: int;                         # minutes after midnight
+    duration: int;                      # minutes
+    priority: int;
+    valid_from: date;
+    valid_until: Optional[date] = None; # exclusive, None for no end
+    person_id: Optional[int] = None;
+
+    @classmethod
+    def from_row(cls, row) -> 'SlotTemplate':
+        until = row['valid_until'];
+        return cls(row['id'], row['weekday'], row['start'], row['duration'], row['priority'],
+                   date.fromisoformat(row['valid_from']), date.fromisoformat(until) if until else None, row['person_id']);
+
+    def applies_on(self, day: date) -> bool:
+        return day.weekday() == self.weekday and self.valid_from <= day and (self.valid_until is None or day < self.valid_until);
+
+def expand_templates(templates: List[SlotTemplate], start: datetime, end: datetime, skipped: set) -> Iterator[Slot]:
+    """Slots the templates put in [start, end), generated a day at a time
+
+    skipped holds (person_id, day) pairs the templates leave alone.
+    """
+    by_weekday = [sorted((template for template in templates if template.weekday == weekday), key=lambda template: template.start) for weekday in range(7)];
+    day = start.date();
+
+    while datetime.combine(day, time()) < end:
+        for template in by_weekday[day.weekday()]:
+            if not template.applies_on(day) or (template.person_id, day) in skipped: continue;
+
+            slot_start = datetime.combine(day, time()) + timedelta(minutes=template.start);
+            if slot_start < start or slot_start >= end: continue;
+
+            slot_id = -(template.id * TEMPLATE_IDS + (day - date(1970, 1, 1)).days);
+            yield Slot(slot_start, slot_start + timedelta(minutes=template.duration), template.priority, slot_id, 0, template.person_id);
+
+        day += timedelta(days=1);
+
+def template_slots(cursor, start: datetime, end: datetime, taken: Iterable[Slot] = (), person_id: Optional[int] = None, everyone: bool = False) -> Iterator[Slot]:
+    """person_id's (or with everyone, all people's) template slots in [start, end)
+
+    Days holding one of the taken slots, usually the slot rows loaded for the
+    same range, are left to those rows.
+    """
+    last_day = end.date() + timedelta(days=1);
+    bounds = (last_day.isoformat(), start.date().isoformat());
+    if everyone: cursor.execute(TEMPLATES_QUERY, bounds);
+    else: cursor.execute(TEMPLATES_QUERY + " AND person_id IS ?", (*bounds, person_id));
+    templates = [SlotTemplate.from_row(row) for row in cursor.fetchall()];
+    if not templates: return iter(());
+
+    cursor.execute(EXCEPTIONS_QUERY, (start.date().isoformat(), last_day.isoformat()));
+    skipped = {(row['person_id'], date.fromisoformat(row['day'])) for row in cursor.fetchall()};
+    skipped |= {(slot.person_id, slot.start.date()) for slot in taken};
+
+    return expand_templates(templates, start, end, skipped);
+
+def with_templates(cursor, slots: List[Slot], start: datetime, end: datetime, person_id: Optional[int] = None, everyone: bool = False) -> List[Slot]:
+    """slots plus the template slots around them, in the priority then start order the loaders use"""
+    expanded = list(template_slots(cursor, start, end, slots, person_id, everyone));
+    if not expanded: return slots;
+
+    return sorted(slots + expanded, key=lambda slot: (slot.priority, slot.start));
@@ -1,12 +1,34 @@
 from flask import render_template, request, jsonify, Response
 
-from database import SchedulerStorage
+from database import PRIORITIES, SchedulerStorage
+from model import Slot
+from recurrence import template_slots
+from view_cache import VIEW_CACHE, cached_response, invalidate_week
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from calendar import monthrange, month_abbr
 
 def_start_hour = 8;
 
+# half-open [start, end) ranges on events.start so idx_events_start serves them
+DAY_EVENTS_QUERY = """
+    SELECT * FROM events
+    WHERE start >= ? AND start < ?
+    ORDER BY start ASC, priority DESC
+""";
+
+WEEK_SLOTS_QUERY = """
+    SELECT start, end, priority FROM slots
+    WHERE person_id IS ? AND start >= ? AND start < ?
+""";
+
+# one row per day with anything on it, kept current by the storage triggers
+DAILY_SUMMARY_QUERY = """
+    SELECT * FROM daily_summary
+    WHERE day >= ? AND day < ? AND person_id IS ?
+    ORDER BY day ASC
+""";
+
 # ======== #
 # CALENDAR #                             
 # ======== #
@@ -49,6 +71,8 @@ def week_view() -> str:
 def save_slots(storage: SchedulerStorage) -> Response:
     data = request.json.get('slots', []);
     date = request.json.get('date', []);
+    # whose calendar, the owner's when missing
+    person_id = request.json.get('person');
     
     try:
         conn = storage.get_db_connection();
@@ -59,23 +83,20 @@ def save_slots(storage: SchedulerStorage) -> Response:
         week_start = get_week_start(date);
         week_end = week_start + timedelta(days=7);
 
-        # Delete existing slots for the week
-        cursor.execute("""
-            DELETE FROM slots
-            WHERE start >= ? AND start < ?
-        """, (week_start, week_end));
-
-        # Insert new slots
-        if data:
-            for slot in data:
-                start = datetime(slot['slot_year'], slot['slot_month'], slot['slot_day'], int(slot['start'] / 60), int(slot['start']) % 60);
-                end = start + timedelta(minutes=slot['duration']);
-                cursor.execute("""
-                    INSERT INTO slots (start, end, time_used, priority)
-                    VALUES (?, ?, 0, ?)
-                """, (start, end, slot['priority']));
+        # Replace the week's slots, only touching the ones that changed
+        slots = [];
+        for slot in data:
+            start = datetime(slot['slot_year'], slot['slot_month'], slot['slot_day'], int(slot['start'] / 60), int(slot['start']) % 60);
+            end = start + timedelta(minutes=slot['duration']);
+            slots.append((start, end, slot['priority']));
+
+        changed = storage.replace_slots(cursor, week_start, week_end, slots, person_id);
+        # the week is kept as saved, even days left empty, whatever the templates say
+        changed = storage.skip_templates(cursor, week_start, week_end, person_id) or changed;
+        if changed: storage.mark_window_dirty(cursor, week_start, week_end);
 
         conn.commit();
+        if changed: invalidate_week(person_id, week_start);
         return jsonify({'message': 'Slots saved successfully'});
 
     except Exception as e:
@@ -88,31 +109,29 @@ def get_slots(storage: SchedulerStorage) -> Response:
     year = int(request.args.get('year'));
     month = int(request.args.get('month'));
     day = int(request.args.get('day'));
+    person_id = request.args.get('person', type=int);
+
+    week_start = get_week_start(datetime(year, month, day));
 
-    date = datetime(year, month, day);
-    week_start = get_week_start(date);
+    return cached_response(('slots', person_id, week_start.date()), lambda: week_slots(storage, person_id, week_start));
+
+def week_slots(storage: SchedulerStorage, person_id: int, week_start: datetime) -> Response:
     week_end = week_start + timedelta(days=7);
 
     try:
         conn = storage.get_db_connection();
         cursor = conn.cursor();
-        cursor.execute("""
-            SELECT start, end, priority FROM slots
-            WHERE start >= ? AND start < ?
-        """, (week_start, week_end));
 
         slots = [];
         
-        for row in cursor.fetchall():
-            start_time = datetime.fromisoformat(row['start']);
-            end_time = datetime.fromisoformat(row['end']);
-            start = start_time.hour * 60 + start_time.minute - def_start_hour * 60;
-            end = end_time.hour * 60 + end_time.minute - def_start_hour * 60;
+        for slot in week_slot_models(cursor, person_id, week_start, week_end):
+            start = slot.start.hour * 60 + slot.start.minute - def_start_hour * 60;
+            end = slot.end.hour * 60 + slot.end.minute - def_start_hour * 60;
             slots.append({
                 'start': start,
                 'duration': end - start,
-                'day': start_time.day,
-                'priority': row['priority']
+                'day': slot.start.day,
+                'priority': slot.priority
             });
 
 
@@ -124,36 +143,66 @@ def get_slots(storage: SchedulerStorage) -> Response:
     finally:
         conn.close();
 
+def week_slot_models(cursor, person_id: int, week_start: datetime, week_end: datetime) -> list[Slot]:
+    """The week's slot rows, and template slots on the days without any"""
+    cursor.execute(WEEK_SLOTS_QUERY, (person_id, week_start, week_end));
+    slots = [Slot(datetime.fromisoformat(row['start']), datetime.fromisoformat(row['end']), row['priority'], 0, person_id=person_id) for row in cursor.fetchall()];
+
+    return slots + list(template_slots(cursor, week_start, week_end, slots, person_id));
+
+def save_template(storage: SchedulerStorage) -> Response:
+    """Repeat the week's slots, as get_slots shows them, every week from this one on"""
+    date = request.json.get('date', []);
+    person_id = request.json.get('person');
+
+    try:
+        conn = storage.get_db_connection();
+        cursor = conn.cursor();
+
+        week_start = get_week_start(datetime(date[0], date[1], date[2]));
+        week_end = week_start + timedelta(days=7);
+
+        templates = [
+            (slot.start.weekday(), slot.start.hour * 60 + slot.start.minute, int((slot.end - slot.start).total_seconds()) // 60, slot.priority)
+            for slot in week_slot_models(cursor, person_id, week_start, week_end)
+        ];
+        storage.replace_templates(cursor, week_start, templates, person_id);
+
+        # every week up to the last due date may have gained or lost slots
+        cursor.execute("SELECT max(due_date) FROM events WHERE completed = 0");
+        due = cursor.fetchone()[0];
+        if due: storage.mark_window_dirty(cursor, week_start, max(week_end, datetime.fromisoformat(due)));
+
+        conn.commit();
+        VIEW_CACHE.invalidate('slots', person_id);
+        return jsonify({'message': 'Week saved as a template', 'slots': len(templates)});
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500;
+
+    finally:
+        conn.close();
+
 # == MONTH == #                         MARK: Month
-def month_view(storage: SchedulerStorage) -> str:
+def month_view(storage: SchedulerStorage) -> Response:
     year = int(request.args.get('year', datetime.now().year));
     month = int(request.args.get('month', datetime.now().month));
 
+    # today is highlighted, so a cached month is only good for the day it was rendered
+    return cached_response(('month', year, month, date.today()), lambda: render_month(storage, year, month));
+
+def render_month(storage: SchedulerStorage, year: int, month: int) -> str:
     try:
         conn = storage.get_db_connection();
         cursor = conn.cursor();
 
-        # Fetch events that are scheduled in the selected month and are scheduled
-        cursor.execute("""
-            SELECT start, priority, completed
-            FROM events 
-            WHERE strftime('%Y', start) = ? 
-            AND strftime('%m', start) = ? 
-            AND start is not NULL
-        """, (str(year), str(month).zfill(2)));
+        # Open events per priority, then completed ones, for each day of the month
+        cursor.execute(DAILY_SUMMARY_QUERY, (*month_days(year, month), None));
 
-        events = cursor.fetchall();
-        num_per_priority = {};
-
-        for event in events:
-            day = datetime.fromisoformat(event['start']).day;
-            if day not in num_per_priority:
-                num_per_priority[day] = [0,0,0,0,0,0];
-            
-            if event['completed'] == 0:
-                num_per_priority[day][event['priority']-1] += 1;
-            else:
-                num_per_priority[day][5] += 1;
+        num_per_priority = {
+            int(row['day'][8:]): [row[f'priority_{p}'] for p in PRIORITIES] + [row['completed']]
+            for row in cursor.fetchall()
+        };
                 
         start_weekday = datetime(year, month, 1).weekday()+1;
 
@@ -181,19 +230,15 @@ def events_on_day(storage: SchedulerStorage) -> Response:
     year = int(request.args.get('year', datetime.now().year));
     month = int(request.args.get('month', datetime.now().month));
     day = int(request.args.get('day', datetime.now().day));
-    
+
+    return cached_response(('day', year, month, day), lambda: day_events(storage, year, month, day));
+
+def day_events(storage: SchedulerStorage, year: int, month: int, day: int) -> Response:
     try:
         conn = storage.get_db_connection();
         cursor = conn.cursor();
         
-        cursor.execute("""
-            SELECT * FROM events
-            WHERE strftime('%Y', start) = ? 
-            AND strftime('%m', start) = ? 
-            AND strftime('%d', start) = ? 
-            AND start is not NULL
-            ORDER BY start ASC, priority DESC
-        """, (str(year), str(month).zfill(2), str(day).zfill(2))),
+        cursor.execute(DAY_EVENTS_QUERY, day_bounds(year, month, day));
         
         events = [dict(row) for row in cursor.fetchall()];
         
@@ -222,9 +267,63 @@ def year_view() -> str:
         'calendar/year_view.html',
         year=year,
         month_names=[month_abbr[m] for m in range(1, 13)],
+        # (first weekday with Sunday as 0, number of days) per month, to lay out the heatmap
+        month_layouts=[((datetime(year, m, 1).weekday() + 1) % 7, monthrange(year, m)[1]) for m in range(1, 13)],
         today = datetime.today()
     );
 
+def daily_summary(storage: SchedulerStorage) -> Response:
+    """Day buckets for [start, end), a whole year by default, of the owner or ?person="""
+    year = int(request.args.get('year', datetime.now().year));
+    person_id = request.args.get('person', type=int);
+    start = request.args.get('start', date(year, 1, 1).isoformat());
+    end = request.args.get('end', date(year + 1, 1, 1).isoformat());
+
+    try:
+        conn = storage.get_db_connection();
+        cursor = conn.cursor();
+        first, last = (datetime.combine(date.fromisoformat(bound), datetime.min.time()) for bound in (start, end));
+        cursor.execute(DAILY_SUMMARY_QUERY, (first.date().isoformat(), last.date().isoformat(), person_id));
+
+        days = {};
+        for row in cursor.fetchall():
+            days[row['day']] = {
+                'priorities': [row[f'priority_{p}'] for p in PRIORITIES],
+                'completed': row['completed'],
+                'scheduled_minutes': row['scheduled_minutes'],
+                'slot_minutes': row['slot_minutes'],
+                'used_minutes': row['used_minutes'],
+                'free_minutes': row['slot_minutes'] - row['used_minutes']
+            };
+
+        add_template_minutes(days, [slot for slot in week_slot_models(cursor, person_id, first, last) if slot.id < 0], person_id);
+
+        return jsonify(days);
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400;
+
+    finally:
+        conn.close();
+
+def add_template_minutes(days: dict, expanded: list[Slot], person_id: int) -> None:
+    """Count template slots, which have no rows for the triggers to see, into the daily_summary buckets
+
+    A templated day has no slot rows, so the owner's events that day can
+    only sit in its template slots and count as their used time.
+    """
+    for slot in expanded:
+        day = days.setdefault(slot.start.date().isoformat(), {
+            'priorities': [0 for _ in PRIORITIES], 'completed': 0, 'scheduled_minutes': 0,
+            'slot_minutes': 0, 'used_minutes': 0, 'free_minutes': 0,
+        });
+        day['slot_minutes'] += (slot.end - slot.start) // timedelta(minutes=1);
+
+    for day in {slot.start.date().isoformat() for slot in expanded}:
+        bucket = days[day];
+        if person_id is None: bucket['used_minutes'] = min(bucket['slot_minutes'], bucket['scheduled_minutes']);
+        bucket['free_minutes'] = bucket['slot_minutes'] - bucket['used_minutes'];
+
 # == YEARS == #                         MARK: Years
 def years_view() -> str:
     current_year = int(request.args.get('year', datetime.now().year));
@@ -244,4 +343,22 @@ def get_week_start(date: datetime) -> datetime:
     weekday = date.weekday();
     weekday = 0 if weekday == 6 else weekday + 1;
     
-    return date - timedelta(days=weekday);
\ No newline at end of file
+    return date - timedelta(days=weekday);
+
+# events.start is saved with datetime.isoformat(), so bounds are compared in that format
+def month_bounds(year: int, month: int) -> tuple[str, str]:
+    start = datetime(year, month, 1);
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1);
+    
+    return (start.isoformat(), end.isoformat());
+
+# daily_summary.day is a plain date
+def month_days(year: int, month: int) -> tuple[str, str]:
+    start, end = month_bounds(year, month);
+
+    return (start[:10], end[:10]);
+
+def day_bounds(year: int, month: int, day: int) -> tuple[str, str]:
+    start = datetime(year, month, day);
+    
+    return (start.isoformat(), (start + timedelta(days=1)).isoformat());
\ No newline at end of file
@@ -1,64 +1,105 @@
 from flask import Flask, render_template, request, jsonify, Response
 
 from database import SchedulerStorage
+from view_cache import invalidate_starts
 
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime
+import json
+
+# SQL versions of the labels the editor shows, e.g. "03/7 @ 9:05" and "3/7, 9:05 - 10:00"
+def hour_minute(column: str) -> str:
+    return f"CAST(strftime('%H', {column}) AS INTEGER) || ':' || strftime('%M', {column})";
+
+DUE_LABEL = f"strftime('%m', due_date) || '/' || CAST(strftime('%d', due_date) AS INTEGER) || ' @ ' || {hour_minute('due_date')}";
+SPAN_LABEL = f"CAST(strftime('%m', start) AS INTEGER) || '/' || CAST(strftime('%d', start) AS INTEGER) || ', ' || {hour_minute('start')} || ' - ' || {hour_minute('end')}";
+
+PAGE_SIZE = 50;
+MAX_PAGE_SIZE = 200;
+
+# list -> (which events, sorts it allows, the first being the default)
+EVENT_LISTS = {
+    'scheduled': ("completed = 0 AND due_date >= :today AND start >= :today", ('start', 'due', 'priority')),
+    'unscheduled': ("completed = 0 AND due_date >= :today AND start IS NULL", ('priority', 'due')),
+    'completed': ("completed = 1", ('priority', 'due')),
+};
+
+# sort -> key, ascending; id last so every row has its own place to continue after
+EVENT_SORTS = {
+    'start': ('start', 'due_date', 'id'),
+    'due': ('due_date', 'id'),
+    'priority': ('-priority', 'due_date', 'id'),
+};
 
 # ============ #
 # EVENT EDITOR #
 # ============ #
 
-def event_editor(storage: SchedulerStorage) -> str:
-    
+def event_editor() -> str:
+    # the lists fill themselves from list_events a page at a time
+    return render_template('event_editor.html', today = datetime.today());
+
+def list_events(kind: str, storage: SchedulerStorage) -> Response:
+    """A page of one editor list, continuing after the `after` cursor of the previous page
+
+    Filters by name (q) and priority, sorts by one of the list's EVENT_SORTS.
+    """
+    if kind not in EVENT_LISTS:
+        return jsonify({'error': f'Unknown event list: {kind}'}), 404;
+
+    condition, sorts = EVENT_LISTS[kind];
+    sort = request.args.get('sort', sorts[0]);
+    if sort not in sorts:
+        return jsonify({'error': f'{kind} events can not be sorted by {sort}'}), 400;
+
+    key = EVENT_SORTS[sort];
+    limit = max(1, min(request.args.get('limit', PAGE_SIZE, type=int), MAX_PAGE_SIZE));
+    conditions = [condition];
+    params = {'today': datetime.now().strftime('%Y-%m-%d'), 'limit': limit + 1};
+
+    if request.args.get('q'):
+        conditions.append("name LIKE :name ESCAPE '\\'");
+        params['name'] = '%' + request.args['q'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%';
+
+    if request.args.get('priority', type=int):
+        conditions.append('priority = :priority');
+        params['priority'] = request.args.get('priority', type=int);
+
+    if request.args.get('after'):
+        try:
+            after = json.loads(urlsafe_b64decode(request.args['after']));
+            if len(after) != len(key): raise ValueError('wrong length');
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Bad page cursor'}), 400;
+
+        conditions.append(f"({', '.join(key)}) > ({', '.join(f':after_{index}' for index in range(len(key)))})");
+        params.update({f'after_{index}': value for index, value in enumerate(after)});
+
     try:
         conn = storage.get_db_connection();
         cursor = conn.cursor();
 
-        today = datetime.now().strftime('%Y-%m-%d');
-        cursor.execute("""SELECT * FROM events 
-                          WHERE completed = 0 
-                          AND due_date >= ? 
-                          AND start >= ? 
-                          ORDER BY start ASC, due_date ASC""", (today, today));
-        scheduled = [dict(row) for row in cursor.fetchall()];
-        
-        cursor.execute("""SELECT * FROM events 
-                          WHERE completed = 0 
-                          AND due_date >= ? 
-                          AND start is NULL 
-                          ORDER BY priority DESC, due_date ASC""", (today,));
-        unscheduled = [dict(row) for row in cursor.fetchall()];
-        
-        cursor.execute("""SELECT * FROM events 
-                          WHERE completed = 1 
-                          ORDER BY priority DESC, due_date ASC""");
-        completed = [dict(row) for row in cursor.fetchall()];
-        
-        for row in scheduled:
-            due_date = datetime.fromisoformat(row['due_date']);
-            row['due_date'] = f'{str(due_date.month).zfill(2)}/{due_date.day} @ {due_date.hour}:{str(due_date.minute).zfill(2)}';
-            
-            start = datetime.fromisoformat(row['start']);
-            end = datetime.fromisoformat(row['end']);
-            
-            time = f'{start.month}/{start.day}, {start.hour}:{str(start.minute).zfill(2)} - {end.hour}:{str(end.minute).zfill(2)}';
-            row['start'] = time;
-                
-        for row in unscheduled:
-            due_date = datetime.fromisoformat(row['due_date']);
-            row['due_date'] = f'{str(due_date.month).zfill(2)}/{due_date.day} @ {due_date.hour}:{str(due_date.minute).zfill(2)}';
-
-        for row in completed:
-            due_date = datetime.fromisoformat(row['due_date']);
-            row['due_date'] = f'{str(due_date.month).zfill(2)}/{due_date.day} @ {due_date.hour}:{str(due_date.minute).zfill(2)}';
-                
-        return render_template(
-            'event_editor.html', 
-            scheduled=scheduled,
-            unscheduled=unscheduled,
-            completed=completed,
-            today = datetime.today()
-            );
+        cursor.execute(f"""
+            SELECT id, name, priority, due_date, start, end,
+                {DUE_LABEL} AS due_label, {SPAN_LABEL} AS start_label,
+                {', '.join(f'{column} AS key_{index}' for index, column in enumerate(key))}
+            FROM events
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {', '.join(key)}
+            LIMIT :limit
+        """, params);
+        rows = cursor.fetchall();
+
+        events = [{name: row[name] for name in ('id', 'name', 'priority', 'due_date', 'start', 'end', 'due_label', 'start_label')} for row in rows[:limit]];
+
+        # one extra row was asked for, to know whether there is a next page
+        after = None;
+        if len(rows) > limit:
+            last = rows[limit - 1];
+            after = urlsafe_b64encode(json.dumps([last[f'key_{index}'] for index in range(len(key))]).encode()).decode();
+
+        return jsonify({'events': events, 'after': after});
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500;
     finally:
@@ -73,7 +114,7 @@ def get_event(event_id: int, storage: SchedulerStorage) -> Response:
         event = cursor.fetchone();
 
         if event:
-            return jsonify(dict(event));
+            return jsonify({**dict(event), 'attendees': storage.attendees(cursor, event_id)});
         else:
             return jsonify({'error': 'Event not found'}), 404;
     except Exception as e:
@@ -91,7 +132,12 @@ def add_event(storage: SchedulerStorage) -> Response:
             INSERT INTO events (name, due_date, min_time, max_time, priority)
             VALUES (?, ?, ?, ?, ?)
         """, (data['name'], data['due_date'], data['min_time'], data['max_time'], data['priority']));
+        event_id = cursor.lastrowid;
+        # people who all have to be there, e.g. "attendees": [1, 4], with null for the owner
+        if data.get('attendees'): storage.set_attendees(cursor, event_id, data['attendees']);
+        storage.mark_event_dirty(cursor, event_id);
 
+        # new events are unscheduled, so no calendar view shows them until an optimize
         conn.commit();
         return jsonify({'message': 'Event added successfully'});
     except Exception as e:
@@ -110,8 +156,12 @@ def update_event(event_id: int, storage: SchedulerStorage) -> Response:
             SET name = ?, due_date = ?, min_time = ?, max_time = ?, priority = ?
             WHERE id = ?
         """, (data['name'], data['due_date'], data['min_time'], data['max_time'], data['priority'], event_id));
+        if 'attendees' in data: storage.set_attendees(cursor, event_id, data['attendees']);
+        storage.mark_event_dirty(cursor, event_id);
+        start = storage.event_start(cursor, event_id);
 
         conn.commit();
+        invalidate_starts([start]);
         return jsonify({'message': 'Event updated successfully'});
     except Exception as e:
         return jsonify({'error': str(e)}), 500;
@@ -123,8 +173,12 @@ def delete_event(event_id: int, storage: SchedulerStorage) -> Response:
         conn = storage.get_db_connection();
         cursor = conn.cursor();
 
+        start = storage.event_start(cursor, event_id);
         cursor.execute("DELETE FROM events WHERE id = ?", (event_id,));
+        storage.set_attendees(cursor, event_id, []);
+        storage.mark_event_dirty(cursor, event_id);
         conn.commit();
+        invalidate_starts([start]);
 
         return jsonify({'message': 'Event deleted successfully'});
     except Exception as e:
@@ -142,7 +196,10 @@ def set_done(event_id: int, done: int, storage: SchedulerStorage) -> Response:
             SET completed = ?
             WHERE id = ?
         """, (done, event_id,));
+        storage.mark_event_dirty(cursor, event_id);
+        start = storage.event_start(cursor, event_id);
         conn.commit();
+        invalidate_starts([start]);
 
         return jsonify({'success': True});
     except Exception as e:
@@ -0,0 +1,35 @@
+from flask import request, jsonify, Response
+
+from database import SchedulerStorage
+
+# ====== #
+# PEOPLE #
+# ====== #
+
+def get_people(storage: SchedulerStorage) -> Response:
+    try:
+        conn = storage.get_db_connection();
+        cursor = conn.cursor();
+
+        cursor.execute("SELECT id, name FROM people ORDER BY name ASC");
+
+        return jsonify([dict(row) for row in cursor.fetchall()]);
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500;
+    finally:
+        conn.close();
+
+def add_person(storage: SchedulerStorage) -> Response:
+    data = request.json;
+    try:
+        conn = storage.get_db_connection();
+        cursor = conn.cursor();
+
+        cursor.execute("INSERT INTO people (name) VALUES (?)", (data['name'],));
+
+        conn.commit();
+        return jsonify({'message': 'Person added successfully', 'id': cursor.lastrowid});
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500;
+    finally:
+        conn.close();
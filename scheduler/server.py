@@ -2,16 +2,22 @@ from flask import Flask, render_template, request, jsonify, Response
 from flaskwebgui import FlaskUI
 
 from database import SchedulerStorage
-from optimize import Scheduler
+from optimize import ENGINES, Encoding
+from jobs import JobManager
+from metrics import METRICS
 import routes.cal_routes as cal
 import routes.editor_routes as edit
+import routes.people_routes as people
 
 from datetime import datetime
+from typing import get_args
+import json
 
 app = Flask(__name__);
 ui = FlaskUI(server="flask", app=app, width=1000, height=800);
 
 storage = SchedulerStorage(db_path='./scheduler/database.db');
+jobs = JobManager(storage);
 
 # ======== #
 # CALENDAR #
@@ -27,6 +33,9 @@ def save_slots(): return cal.save_slots(storage);
 @app.route('/get_slots', methods=['GET'])
 def get_slots(): return cal.get_slots(storage);
 
+@app.route('/save_template', methods=['POST'])
+def save_template(): return cal.save_template(storage);
+
 # == MONTH == #
 @app.route('/')
 def month_view(): return cal.month_view(storage);
@@ -38,6 +47,9 @@ def events_on_day(): return cal.events_on_day(storage);
 @app.route('/year_view')
 def year_view(): return cal.year_view();
 
+@app.route('/daily_summary')
+def daily_summary(): return cal.daily_summary(storage);
+
 # == YEARS == #
 @app.route('/years_view')
 def years_view(): return cal.years_view();
@@ -58,7 +70,10 @@ def settings() -> str:
 # ============ #
 
 @app.route('/event_editor')
-def event_editor(): return edit.event_editor(storage);
+def event_editor(): return edit.event_editor();
+
+@app.route('/events/<kind>')
+def list_events(kind): return edit.list_events(kind, storage);
 
 @app.route('/get_event/<int:event_id>')
 def get_event(event_id): return edit.get_event(event_id, storage);
@@ -75,21 +90,114 @@ def delete_event(event_id): return edit.delete_event(event_id, storage);
 @app.route('/set_done/<int:event_id>/<int:done>', methods=['POST'])
 def set_done(event_id, done): return edit.set_done(event_id, done, storage);
 
+# ====== #
+# PEOPLE #
+# ====== #
+
+@app.route('/people')
+def get_people(): return people.get_people(storage);
+
+@app.route('/add_person', methods=['POST'])
+def add_person(): return people.add_person(storage);
+
 
 
 
 
 @app.route('/optimize/<method>')
 def optimize(method: str):
+    if method not in ENGINES:
+        return jsonify({'error': f'Unknown method: {method}'}), 400;
     
-    scheduler = Scheduler(storage);
+    # opt-in parallel evaluation, e.g. /optimize/genetic?workers=4&pool=process
+    workers = int(request.args.get('workers', 0));
+    pool_kind = request.args.get('pool', 'process');
+    # only repair what changed since the last optimize, e.g. /optimize/greedy?incremental=1
+    incremental = request.args.get('incremental', '0') == '1';
+    # anytime mode, best answer within a budget, e.g. /optimize/genetic?budget=500 (ms)
+    budget = request.args.get('budget');
+    time_budget = int(budget) / 1000 if budget else None;
+    # everyone's calendars and shared events at once, e.g. /optimize/greedy?team=1
+    team = request.args.get('team', '0') == '1';
+    # solve a long horizon a few weeks at a time, e.g. /optimize/genetic?window=14 (days)
+    window_days = int(request.args.get('window', 0));
+    if window_days < 0:
+        return jsonify({'error': f'Window must be 0 or more days: {window_days}'}), 400;
+    # NSGA2 over integer permutations instead of random keys, e.g. /optimize/genetic?encoding=permutation
+    encoding = request.args.get('encoding', 'random_key');
+    if encoding not in get_args(Encoding):
+        return jsonify({'error': f'Unknown encoding: {encoding}'}), 400;
+    # cProfile the run, read it back from /optimize_profile/<job_id>
+    profile = request.args.get('profile', '0') == '1';
     
-    scheduler.schedule(method);
-    scheduler.save_scheduled_events();
+    # runs in the background, poll /optimize_status/<job_id> or follow /optimize_stream/<job_id>
+    job = jobs.submit(method, workers, pool_kind, incremental, time_budget, team, window_days, encoding, profile);
+    
+    return jsonify({'success': True, 'job': job.to_dict()}), 202;
+
+@app.route('/optimize_status/<job_id>')
+def optimize_status(job_id: str):
+    job = jobs.get(job_id);
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404;
+    
+    return jsonify(job.to_dict());
+
+@app.route('/optimize_stream/<job_id>')
+def optimize_stream(job_id: str):
+    job = jobs.get(job_id);
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404;
+    
+    # server-sent events: a 'schedule' for every improved preview, then one final 'status'
+    def stream():
+        version, sent = -1, None;
+        while True:
+            latest = job.wait(version, timeout=15);
+            if latest == version:
+                yield ": keep-alive\n\n";
+                continue;
+            version = latest;
+            
+            if job.preview is not None and job.preview is not sent:
+                sent = job.preview;
+                yield f"event: schedule\ndata: {json.dumps(sent)}\n\n";
+            
+            if not job.active:
+                yield f"event: status\ndata: {json.dumps(job.to_dict())}\n\n";
+                return;
+    
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'});
+
+@app.route('/optimize_cancel/<job_id>', methods=['POST'])
+def optimize_cancel(job_id: str):
+    job = jobs.cancel(job_id);
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404;
+    
+    return jsonify(job.to_dict());
+
+@app.route('/optimize_profile/<job_id>')
+def optimize_profile(job_id: str):
+    job = jobs.get(job_id);
+    if not job or job.profile_text is None:
+        return jsonify({'error': 'No profile for this job'}), 404;
     
-    print(method)
+    return Response(job.profile_text, mimetype='text/plain');
+
+# ======= #
+# METRICS #
+# ======= #
+
+@app.route('/metrics')
+def metrics():
+    states = {};
+    for job in list(jobs.jobs.values()):
+        states[job.state] = states.get(job.state, 0) + 1;
+    for state in ('queued', 'running', 'done', 'failed', 'cancelled'):
+        METRICS.set('scheduler_jobs', states.get(state, 0), state=state);
     
-    return jsonify({'success': True});
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4');
 
 # =========== #
 # DRIVER CODE #
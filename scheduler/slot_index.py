@@ -0,0 +1,95 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+
+from model import Slot
+from availability import Feasibility
+
+class SlotIndex:
+    """Answers "first slot with capacity >= d starting no later than t" in logarithmic time
+
+    Remaining capacity (whole minutes) lives in a max segment tree over the
+    slot list, so "first" keeps meaning first in list order. Slots are cut into
+    runs of ascending start time (one run per priority when ordered like
+    Scheduler.load_data), which turns the start-time bound into a prefix of
+    each run found by bisection.
+
+    With a Feasibility every availability class gets its own tree, built the
+    first time the class is asked about, where slots it may not use count as full.
+    """
+    def __init__(self, slots: List[Slot], feasibility: Optional[Feasibility] = None):
+        self.slots = slots;
+        self.feasibility = feasibility;
+
+        self.size = 1 << max(0, len(slots) - 1).bit_length();
+        self.tree: List[int] = [-1] * (2 * self.size);
+        for index, slot in enumerate(slots):
+            self.tree[self.size + index] = slot.capacity // timedelta(minutes=1);
+        self._rebuild(self.tree);
+
+        # availability class -> its tree
+        self.class_trees: Dict[int, List[int]] = {};
+
+        # (first index, start times) for each run of non-decreasing start
+        self.runs: List[tuple[int, List[datetime]]] = [];
+        for index, slot in enumerate(slots):
+            if not self.runs or slot.start < self.runs[-1][1][-1]:
+                self.runs.append((index, []));
+            self.runs[-1][1].append(slot.start);
+
+    def capacity(self, index: int) -> int:
+        return self.tree[self.size + index];
+
+    def first_fit(self, minutes: int, latest_start: datetime, event: Optional[int] = None) -> int:
+        """Index of the first slot with room for minutes and start <= latest_start, or -1
+
+        Pass the event's index to only consider slots its availability allows.
+        """
+        tree = self._tree_for(event);
+        if tree[1] < minutes: return -1;
+
+        for run_start, starts in self.runs:
+            run_end = run_start + bisect_right(starts, latest_start);
+            found = self._descend(tree, 1, 0, self.size, run_start, run_end, minutes);
+            if found >= 0: return found;
+
+        return -1;
+
+    def consume(self, index: int, minutes: int) -> None:
+        self._update(self.tree, index, minutes);
+        for availability, tree in self.class_trees.items():
+            if self.feasibility.allowed[availability, index]: self._update(tree, index, minutes);
+
+    def _tree_for(self, event: Optional[int]) -> List[int]:
+        if self.feasibility is None or event is None: return self.tree;
+
+        availability = int(self.feasibility.event_class[event]);
+        if availability not in self.class_trees:
+            allowed = self.feasibility.allowed[availability].tolist();
+            tree = [-1] * (2 * self.size);
+            for index in range(len(self.slots)):
+                if allowed[index]: tree[self.size + index] = self.tree[self.size + index];
+            self._rebuild(tree);
+            self.class_trees[availability] = tree;
+
+        return self.class_trees[availability];
+
+    def _rebuild(self, tree: List[int]) -> None:
+        for node in range(self.size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1]);
+
+    def _update(self, tree: List[int], index: int, minutes: int) -> None:
+        node = self.size + index;
+        tree[node] -= minutes;
+        node //= 2;
+        while node:
+            tree[node] = max(tree[2 * node], tree[2 * node + 1]);
+            node //= 2;
+
+    def _descend(self, tree: List[int], node: int, node_lo: int, node_hi: int, lo: int, hi: int, minutes: int) -> int:
+        if node_hi <= lo or hi <= node_lo or tree[node] < minutes: return -1;
+        if node_hi - node_lo == 1: return node_lo;
+
+        mid = (node_lo + node_hi) // 2;
+        found = self._descend(tree, 2 * node, node_lo, mid, lo, hi, minutes);
+        return found if found >= 0 else self._descend(tree, 2 * node + 1, mid, node_hi, lo, hi, minutes);
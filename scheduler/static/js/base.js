@@ -1,16 +1,20 @@
 
 document.addEventListener("DOMContentLoaded", () => {
     taskView(tyear,tmonth,tday);
+    loadAttendees();
 
     document.getElementById('event-form').addEventListener('submit', (e) => {
         e.preventDefault();
         const formData = new FormData(e.target);
         const eventId = e.target.dataset.eventId;
         const url = eventId ? `/update_event/${eventId}` : '/add_event';
+
+        const data = Object.fromEntries(formData);
+        data.attendees = selectedAttendees();
     
         fetch(url, {
             method: 'POST',
-            body: JSON.stringify(Object.fromEntries(formData)),
+            body: JSON.stringify(data),
             headers: { 'Content-Type': 'application/json' }
         })
         .then(response => response.json())
@@ -22,15 +26,62 @@ document.addEventListener("DOMContentLoaded", () => {
     });
 });
 
-function optimize(method) {
-    fetch(`/optimize/${method}`)
+function optimize(method, budget) {
+    fetch(budget ? `/optimize/${method}?budget=${budget}` : `/optimize/${method}`)
         .then(response => response.json())
         .then(data => {
-            console.log(data.message || 'Schedule optimized successfully');
+            if (data.error) return console.error(data.error);
+            followOptimize(data.job.id);
+        })
+}
+
+// the solve runs in the background, show each better schedule as it is found
+function followOptimize(jobId) {
+    const stream = new EventSource(`/optimize_stream/${jobId}`);
+
+    stream.addEventListener('schedule', (e) => {
+        const preview = JSON.parse(e.data);
+        console.log(`optimizing: generation ${preview.generation}, ${preview.num_late} late`);
+        previewTasks(preview.events);
+    });
+
+    stream.addEventListener('status', (e) => {
+        stream.close();
+        const job = JSON.parse(e.data);
+        if (job.state === 'done') {
+            console.log('Schedule optimized successfully');
             location.reload();
+        } else {
+            console.error(job.error || `Optimization ${job.state}`);
+        }
+    });
+
+    // no streaming, fall back to polling
+    stream.onerror = () => {
+        if (stream.readyState !== EventSource.CLOSED) return;
+        pollOptimize(jobId);
+    };
+}
+
+function pollOptimize(jobId) {
+    fetch(`/optimize_status/${jobId}`)
+        .then(response => response.json())
+        .then(job => {
+            if (job.state === 'queued' || job.state === 'running') {
+                console.log(`optimizing: generation ${job.generation}/${job.max_generations}`);
+                setTimeout(() => pollOptimize(jobId), 500);
+            } else if (job.state === 'done') {
+                console.log('Schedule optimized successfully');
+                location.reload();
+            } else {
+                console.error(job.error || `Optimization ${job.state}`);
+            }
         })
 }
 
+const DAY_START_HOUR = 8; // def_start_hour in cal_routes.py
+const shownTasks = {};
+
 function taskView(y, m, day) {
     fetch(`/events_on_day?year=${y}&month=${m}&day=${day}`)
         .then(response => response.json())
@@ -39,50 +90,107 @@ function taskView(y, m, day) {
             document.getElementById('tasks-heading').innerText = `${m}/${day}, ${y}`;
             if (list) {
                 list.innerHTML = "";
-                events.forEach( event  => {
-
-                    const task = document.createElement('div');
-                    task.id = event.id;
-
-                    task.style.top = (event.start) + "px";
-                    task.style.height = (event.duration) + "px";
-
-                    if (event.completed){
-                        task.classList.add(`priority-6a`);
-                    } else {
-                        task.classList.add(`priority-${event.priority}a`);
-                    }
-                    task.classList.add("task");
-                    task.addEventListener("click", () => {
-                        if (event.completed) {
-                            event.completed = 0;
-                            task.classList.remove(`priority-6a`);
-                            task.classList.add(`priority-${event.priority}a`);
-                            toggleTask(event.id, 0)
-                        }
-                        else {
-                            event.completed = 1;
-                            task.classList.remove(`priority-${event.priority}a`);
-                            task.classList.add(`priority-6a`);
-                            toggleTask(event.id, 1)
-                        }
-                    })
-
-                    task.innerHTML = `
-                        <span class="task-name">${event.name}</span>
-                    `
-
-                    list.appendChild(task);
-                });
+                events.forEach( event  => list.appendChild(renderTask(event)));
             };               
         });
 };
 
+function renderTask(event) {
+    shownTasks[event.id] = event;
+
+    const task = document.createElement('div');
+    task.id = event.id;
+
+    task.style.top = (event.start) + "px";
+    task.style.height = (event.duration) + "px";
+
+    if (event.completed){
+        task.classList.add(`priority-6a`);
+    } else {
+        task.classList.add(`priority-${event.priority}a`);
+    }
+    task.classList.add("task");
+    task.addEventListener("click", () => {
+        if (event.completed) {
+            event.completed = 0;
+            task.classList.remove(`priority-6a`);
+            task.classList.add(`priority-${event.priority}a`);
+            toggleTask(event.id, 0)
+        }
+        else {
+            event.completed = 1;
+            task.classList.remove(`priority-${event.priority}a`);
+            task.classList.add(`priority-6a`);
+            toggleTask(event.id, 1)
+        }
+    })
+
+    task.innerHTML = `
+        <span class="task-name">${event.name}</span>
+    `
+
+    return task;
+}
+
+// redraw today's tasks from an unsaved preview, names come from what is shown or /get_event
+function previewTasks(placements) {
+    const list = document.getElementById('todo-column');
+    if (!list) return;
+
+    const today = placements.filter(p => {
+        const start = new Date(p.start);
+        return start.getFullYear() === tyear && start.getMonth() + 1 === tmonth && start.getDate() === tday;
+    });
+
+    Promise.all(today.map(p => shownTasks[p.id]
+        ? Promise.resolve(shownTasks[p.id])
+        : fetch(`/get_event/${p.id}`).then(response => response.json())
+    )).then(events => {
+        list.innerHTML = "";
+        events.forEach((event, i) => {
+            const start = new Date(today[i].start);
+            const end = new Date(today[i].end);
+            event.start = start.getHours() * 60 + start.getMinutes() - DAY_START_HOUR * 60;
+            event.duration = (end - start) / 60000;
+            list.appendChild(renderTask(event));
+        });
+    });
+}
+
 function toggleTask(eventId, done) {
     fetch(`/set_done/${eventId}/${done}`, { method: 'POST' })
         .then(response => response.json())
 }
 
+/* =========  *
+|  ATTENDEES  |
+*  ========= */
+// the owner is the option with an empty value, sent as null
+
+function loadAttendees() {
+    const select = document.getElementById('event-attendees');
+    const owner = new Option('Me', '', true, true);
+    select.replaceChildren(owner);
+
+    fetch('/people')
+        .then(response => response.json())
+        .then(people => people.forEach(person => select.add(new Option(person.name, person.id))))
+        .catch(err => console.error('Error fetching people:', err));
+}
+
+function selectedAttendees() {
+    const options = document.getElementById('event-attendees').selectedOptions;
+    return Array.from(options, option => option.value === '' ? null : Number(option.value));
+}
+
+function showAttendees(attendees) {
+    // nobody stored means the owner alone
+    const values = attendees.length ? attendees.map(person => person === null ? '' : String(person)) : [''];
+    Array.from(document.getElementById('event-attendees').options).forEach(option => {
+        option.selected = values.includes(option.value);
+    });
+}
+
 function openEventPopup(eventId) {
     const popup = document.getElementById('event-popup');
     const form = document.getElementById('event-form');
@@ -97,6 +205,7 @@ function openEventPopup(eventId) {
                 document.getElementById('event-min-time').value = event.min_time;
                 document.getElementById('event-max-time').value = event.max_time;
                 document.getElementById('event-priority').value = event.priority;
+                showAttendees(event.attendees);
                 deleteButton.style.display = 'inline';
             })
             .catch(err => console.error('Error fetching event:', err));
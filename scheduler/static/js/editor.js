@@ -20,3 +20,110 @@ function toggleListVisibility(listId, type) {
     }
 
 }
+
+/* ============  *
+|  PAGED LISTS  |
+*  ============ */
+// each list asks /events/<kind> for its next page when its end scrolls into view
+
+const PAGE_SIZE = 50;
+let nameFilter = '';
+
+function renderEventItem(kind, event) {
+    const item = document.createElement('div');
+    item.classList.add('event-item');
+
+    // unscheduled events open on the whole row, the others next to their done button
+    const row = kind === 'unscheduled' ? item : document.createElement('div');
+    if (row !== item) {
+        row.classList.add('event');
+        item.appendChild(row);
+    }
+    row.title = 'click to edit';
+    row.onclick = () => openEventPopup(event.id);
+
+    const priority = document.createElement('span');
+    priority.classList.add('priority', kind === 'scheduled' ? `priority-${event.priority}a` : `priority-${event.priority}`);
+    priority.innerText = event.priority;
+
+    const name = document.createElement('strong');
+    name.innerText = event.name;
+
+    row.append(priority, ' ', name, ` (Due: ${event.due_label})`);
+
+    if (kind === 'scheduled') {
+        const start = document.createElement('span');
+        start.classList.add('right');
+        start.innerText = `Scheduled: ${event.start_label}`;
+        row.appendChild(start);
+    }
+
+    if (kind !== 'unscheduled') {
+        const done = kind === 'scheduled' ? 1 : 0;
+        const button = document.createElement('button');
+        button.type = 'toggle';
+        button.innerText = done ? 'Mark Done' : 'Unmark Done';
+        button.onclick = () => toggleDone(event.id, done);
+        item.appendChild(button);
+    }
+
+    return item;
+}
+
+function loadPage(list) {
+    if (list.loading || list.after === null) return;
+    list.loading = true;
+
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (list.after) params.set('after', list.after);
+    if (nameFilter) params.set('q', nameFilter);
+
+    const kind = list.dataset.kind;
+    const request = list.request = fetch(`/events/${kind}?${params}`).then(response => response.json());
+
+    request.then(page => {
+        // a newer filter replaced this list while the page was on its way
+        if (list.request !== request) return;
+
+        page.events.forEach(event => list.insertBefore(renderEventItem(kind, event), list.sentinel));
+        list.after = page.after;
+        list.loading = false;
+
+        // observing again reports the sentinel at once if the page did not fill the list
+        if (list.after !== null) {
+            list.observer.unobserve(list.sentinel);
+            list.observer.observe(list.sentinel);
+        }
+    });
+}
+
+function resetList(list) {
+    list.innerHTML = '';
+    list.after = undefined;
+    list.loading = false;
+
+    list.sentinel = document.createElement('div');
+    list.sentinel.classList.add('sentinel');
+    list.appendChild(list.sentinel);
+    list.observer.observe(list.sentinel);
+}
+
+document.querySelectorAll('.list[data-kind]').forEach(list => {
+    list.observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) loadPage(list);
+    }, { root: list.parentElement, rootMargin: '200px' });
+
+    resetList(list);
+});
+
+let filterTimer;
+document.getElementById('event-search').addEventListener('input', e => {
+    clearTimeout(filterTimer);
+    filterTimer = setTimeout(() => {
+        nameFilter = e.target.value.trim();
+        document.querySelectorAll('.list[data-kind]').forEach(list => {
+            list.observer.disconnect();
+            resetList(list);
+        });
+    }, 200);
+});
@@ -247,6 +247,23 @@ document.addEventListener("DOMContentLoaded", () => {
     *  ==================== */
 
     document.getElementById("save").addEventListener("click", () => {
+        saveSlots().then(data => {
+            console.log(data);
+        });
+    });
+
+    // saves the week, then repeats it every week from this one on
+    document.getElementById("save-template").addEventListener("click", () => {
+        saveSlots().then(() => fetch("/save_template", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ date: [year, month, day] }),
+        })).then(response => response.json()).then(data => {
+            console.log(data);
+        });
+    });
+
+    function saveSlots() {
         const slots = [];
         document.querySelectorAll(".slot").forEach(slot => {
             const parentColumn = slot.parentElement;
@@ -262,14 +279,12 @@ document.addEventListener("DOMContentLoaded", () => {
 
         date = [year, month, day];
 
-        fetch("/save_slots", {
+        return fetch("/save_slots", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({ slots, date }),
-        }).then(response => response.json()).then(data => {
-            console.log(data);
-        });
-    });
+        }).then(response => response.json());
+    }
 
     loadSlots(year, month, day);
 
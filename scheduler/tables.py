@@ -0,0 +1,210 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence
+
+from model import Slot, Event, TimeWindow
+
+import numpy as np
+
+NO_TIME = np.iinfo(np.int64).min;      # start / end of an event that is not scheduled
+OWNER = -1;                             # person of a slot on the owner's calendar
+
+# ================ #
+# TIME CONVERSIONS #                    MARK: Time
+# ================ #
+# datetime64[m] counts whole minutes since 1970-01-01, the same scale as decoder.to_minutes
+
+EPOCH = datetime(1970, 1, 1);
+MINUTE = timedelta(minutes=1);
+
+def minutes_array(values: Sequence) -> np.ndarray:
+    """Datetimes or ISO strings to int64 minutes since the epoch, floored"""
+    # NumPy parses ISO strings in bulk, but converts datetime objects one slow step at a time
+    if values and isinstance(values[0], str):
+        return np.array(values, dtype='datetime64[m]').astype(np.int64);
+
+    return np.array([(value - EPOCH) // MINUTE for value in values], dtype=np.int64);
+
+def optional_minutes_array(values: Sequence) -> np.ndarray:
+    """Like minutes_array, with NO_TIME for None"""
+    minutes = np.full(len(values), NO_TIME, dtype=np.int64);
+    present = [index for index, value in enumerate(values) if value is not None];
+    if present: minutes[present] = minutes_array([values[index] for index in present]);
+    return minutes;
+
+def to_datetimes(minutes: np.ndarray) -> List[datetime]:
+    return minutes.astype('datetime64[m]').tolist();
+
+# ====== #
+# TABLES #                              MARK: Tables
+# ====== #
+# struct-of-arrays versions of List[Slot] / List[Event]: one small NumPy array per
+# field instead of one object (plus datetime and timedelta objects) per row
+
+@dataclass
+class SlotTable:
+    id: np.ndarray;             # int64
+    start: np.ndarray;          # int64, minutes since epoch
+    end: np.ndarray;            # int64, minutes since epoch
+    priority: np.ndarray;       # int8
+    time_used: np.ndarray;      # int32, minutes
+    person: np.ndarray;         # int64, person id or OWNER
+
+    def __len__(self) -> int:
+        return len(self.id);
+
+    @property
+    def length(self) -> np.ndarray:
+        return self.end - self.start;
+
+    @property
+    def capacity(self) -> np.ndarray:
+        return self.length - self.time_used;
+
+    @property
+    def adj_start(self) -> np.ndarray:
+        return self.start + self.time_used;
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in (self.id, self.start, self.end, self.priority, self.time_used, self.person));
+
+    @classmethod
+    def from_models(cls, slots: List[Slot]) -> 'SlotTable':
+        return cls(
+            np.array([slot.id for slot in slots], dtype=np.int64),
+            minutes_array([slot.start for slot in slots]),
+            minutes_array([slot.end for slot in slots]),
+            np.array([slot.priority for slot in slots], dtype=np.int8),
+            np.array([slot.time_used for slot in slots], dtype=np.int32),
+            np.array([OWNER if slot.person_id is None else slot.person_id for slot in slots], dtype=np.int64),
+        );
+
+    @classmethod
+    def from_rows(cls, rows: list) -> 'SlotTable':
+        """Straight from slots rows (id, start, end, priority[, time_used, person_id]), no models in between"""
+        columns = rows[0].keys() if rows else [];
+        return cls(
+            np.array([row['id'] for row in rows], dtype=np.int64),
+            minutes_array([row['start'] for row in rows]),
+            minutes_array([row['end'] for row in rows]),
+            np.array([row['priority'] for row in rows], dtype=np.int8),
+            np.array([row['time_used'] if 'time_used' in columns else 0 for row in rows], dtype=np.int32),
+            np.array([row['person_id'] if 'person_id' in columns and row['person_id'] is not None else OWNER for row in rows], dtype=np.int64),
+        );
+
+    def to_models(self) -> List[Slot]:
+        return [
+            Slot(start, end, priority, slot_id, time_used, None if person == OWNER else person)
+            for start, end, priority, slot_id, time_used, person in zip(
+                to_datetimes(self.start), to_datetimes(self.end),
+                self.priority.tolist(), self.id.tolist(), self.time_used.tolist(), self.person.tolist(),
+            )
+        ];
+
+@dataclass
+class EventTable:
+    id: np.ndarray;             # int64
+    priority: np.ndarray;       # int8
+    min_time: np.ndarray;       # int32, minutes
+    max_time: np.ndarray;       # int32, minutes
+    due: np.ndarray;            # int64, minutes since epoch
+    start: np.ndarray;          # int64, minutes since epoch or NO_TIME
+    end: np.ndarray;            # int64, minutes since epoch or NO_TIME
+
+    def __len__(self) -> int:
+        return len(self.id);
+
+    @property
+    def scheduled(self) -> np.ndarray:
+        return self.start != NO_TIME;
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in (self.id, self.priority, self.min_time, self.max_time, self.due, self.start, self.end));
+
+    @classmethod
+    def from_models(cls, events: List[Event]) -> 'EventTable':
+        return cls(
+            np.array([event.id for event in events], dtype=np.int64),
+            np.array([event.priority for event in events], dtype=np.int8),
+            np.array([event.min_time // MINUTE for event in events], dtype=np.int32),
+            np.array([event.max_time // MINUTE for event in events], dtype=np.int32),
+            minutes_array([event.due_date for event in events]),
+            optional_minutes_array([event.start if event.is_scheduled else None for event in events]),
+            optional_minutes_array([event.end if event.is_scheduled else None for event in events]),
+        );
+
+    @classmethod
+    def from_rows(cls, rows: list) -> 'EventTable':
+        """Straight from events rows (id, start, end, due_date, min_time, max_time, priority)"""
+        return cls(
+            np.array([row['id'] for row in rows], dtype=np.int64),
+            np.array([row['priority'] for row in rows], dtype=np.int8),
+            np.array([row['min_time'] for row in rows], dtype=np.int32),
+            np.array([row['max_time'] for row in rows], dtype=np.int32),
+            minutes_array([row['due_date'] for row in rows]),
+            optional_minutes_array([row['start'] for row in rows]),
+            optional_minutes_array([row['end'] for row in rows]),
+        );
+
+    def placements(self) -> Dict[int, tuple[datetime, datetime]]:
+        """event id -> (start, end) of the scheduled rows"""
+        scheduled = self.scheduled;
+        return dict(zip(self.id[scheduled].tolist(), zip(to_datetimes(self.start[scheduled]), to_datetimes(self.end[scheduled]))));
+
+    def to_models(self, windows: Dict[int, List[TimeWindow]] = None) -> List[Event]:
+        """Unscheduled Events, the way the optimizer wants them; placements live in start / end"""
+        windows = windows or {};
+        return [
+            Event(None, None, priority, timedelta(minutes=min_time), timedelta(minutes=max_time), due, event_id, availability=windows.get(event_id, []))
+            for event_id, priority, min_time, max_time, due in zip(
+                self.id.tolist(), self.priority.tolist(), self.min_time.tolist(),
+                self.max_time.tolist(), to_datetimes(self.due),
+            )
+        ];
+
+@dataclass
+class AvailabilityTable:
+    """Every availability window of a list of events, sorted by event then start"""
+    event: np.ndarray;          # int32, index into the event list
+    start: np.ndarray;          # int64, minutes since epoch
+    end: np.ndarray;            # int64, minutes since epoch
+
+    def __len__(self) -> int:
+        return len(self.event);
+
+    @classmethod
+    def from_models(cls, events: List[Event]) -> 'AvailabilityTable':
+        windows = [
+            (index, window.start, window.end)
+            for index, event in enumerate(events)
+            for window in sorted(event.availability, key=lambda window: window.start)
+        ];
+        return cls(
+            np.array([index for index, _, _ in windows], dtype=np.int32),
+            minutes_array([start for _, start, _ in windows]),
+            minutes_array([end for _, _, end in windows]),
+        );
+
+def split_windows(rows: list) -> tuple[list, Dict[int, List[TimeWindow]]]:
+    """Undo an events LEFT JOIN event_availability: one row per event, plus the windows per event id
+
+    The join has to be ordered so each event's rows are next to each other and
+    carry the window as window_start, window_end, window_priority.
+    """
+    events = [];
+    windows: Dict[int, List[TimeWindow]] = {};
+
+    for row in rows:
+        if not events or events[-1]['id'] != row['id']:
+            events.append(row);
+
+        if row['window_start'] is not None:
+            windows.setdefault(row['id'], []).append(TimeWindow(
+                datetime.fromisoformat(row['window_start']),
+                datetime.fromisoformat(row['window_end']),
+                row['window_priority'],
+            ));
+
+    return (events, windows);
@@ -0,0 +1,318 @@
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from time import perf_counter
+from threading import Event as Flag
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+
+from model import Slot, Event
+from database import SchedulerStorage
+from decoder import GRID, OUT_OF_SPACE_PRIORITY, from_minutes, to_minutes
+from exact import lower_bound, relative_gap, score, sooness_term
+from optimize import EVENT_COLUMNS, ENGINES, Encoding, EngineOptions, Scheduler, SolveReport, run_engine
+from parallel import PoolKind
+from tables import SlotTable, EventTable, split_windows
+from recurrence import with_templates
+from metrics import METRICS, timed
+
+# ======== #
+# CLUSTERS #                            MARK: Clusters
+# ======== #
+# people are None for the owner, otherwise their id in the people table
+
+@dataclass
+class Cluster:
+    """People linked by shared events, with their slots and events; clusters never interact"""
+    people: List[Optional[int]] = field(default_factory=list);
+    slots: List[Slot] = field(default_factory=list);
+    events: List[Event] = field(default_factory=list);
+
+    @property
+    def joint(self) -> bool:
+        """Whether any event needs more than one person"""
+        return any(len(event.attendees) > 1 for event in self.events);
+
+def attendees_of(event: Event) -> List[Optional[int]]:
+    return event.attendees or [None];
+
+def partition(slots: List[Slot], events: List[Event]) -> List[Cluster]:
+    """Split into independent clusters, keeping the slot and event order within each"""
+    parent: Dict[Optional[int], Optional[int]] = {};
+
+    def find(person: Optional[int]) -> Optional[int]:
+        parent.setdefault(person, person);
+        while parent[person] != person:
+            parent[person] = parent[parent[person]];
+            person = parent[person];
+        return person;
+
+    for event in events:
+        first, *rest = attendees_of(event);
+        for person in rest: parent[find(person)] = find(first);
+
+    clusters: Dict[Optional[int], Cluster] = {};
+    for event in events:
+        clusters.setdefault(find(attendees_of(event)[0]), Cluster()).events.append(event);
+
+    # slots of people without events have nothing to do
+    for slot in slots:
+        root = find(slot.person_id);
+        if root in clusters: clusters[root].slots.append(slot);
+
+    for person in parent:
+        root = find(person);
+        if root in clusters: clusters[root].people.append(person);
+
+    return list(clusters.values());
+
+# ============= #
+# JOINT GREEDY  #                       MARK: Joint
+# ============= #
+# free time is kept per person as sorted [start, end, priority, slot index] minutes, one window per slot:
+# slots are used up as a prefix (time_used), so a window always runs from the slot's adj_start to its end
+
+def intersect(left: List[list], right: List[list]) -> List[list]:
+    """Overlaps of two sorted free lists; the worse (higher) priority wins, the left slot index is kept"""
+    overlaps = [];
+    i = j = 0;
+    while i < len(left) and j < len(right):
+        start = max(left[i][0], right[j][0]);
+        end = min(left[i][1], right[j][1]);
+        if start < end:
+            overlaps.append([start, end, max(left[i][2], right[j][2]), left[i][3]]);
+
+        if left[i][1] < right[j][1]: i += 1;
+        else: j += 1;
+
+    return overlaps;
+
+def book(free: List[list], taken: list, end: int) -> List[list]:
+    """free with the taken window used up to end, dropped once nothing is left of it"""
+    kept = [window for window in free if window is not taken];
+    if end < taken[1]: kept.append([end, taken[1], taken[2], taken[3]]);
+
+    return sorted(kept);
+
+def joint_greedy(slots: List[Slot], events: List[Event]) -> tuple[List[Event], List[Slot], Dict[int, float]]:
+    """greedy_scheduler for events shared between people
+
+    Each event goes to the best-priority, then earliest, window where all its
+    attendees (and its availability) are free, trying durations from max to min.
+    An attendee whose slot frees up earlier than the others gives up the time
+    in between, since time_used only counts from the start of a slot.
+    Returns the slot priority each placed event ended up with as well.
+    """
+    free: Dict[Optional[int], List[list]] = {};
+    for index, slot in enumerate(slots):
+        free.setdefault(slot.person_id, []).append([to_minutes(slot.adj_start), to_minutes(slot.end), slot.priority, index]);
+    for windows in free.values(): windows.sort();
+
+    priorities: Dict[int, float] = {};
+
+    for event in events:
+        people = attendees_of(event);
+        common = free.get(people[0], []);
+        for person in people[1:]:
+            common = intersect(common, free.get(person, []));
+        if event.availability:
+            common = intersect(common, sorted([to_minutes(window.start), to_minutes(window.end), 0, -1] for window in event.availability));
+
+        common.sort(key=lambda window: (window[2], window[0]));
+        due = to_minutes(event.due_date);
+
+        for minutes in range(event.max_time // timedelta(minutes=1), event.min_time // timedelta(minutes=1) - 1, -GRID):
+            window = next((window for window in common if window[1] - window[0] >= minutes and window[0] <= due - minutes), None);
+            if window is None: continue;
+
+            start = window[0];
+            for person in people:
+                # the slot this person gives up, to keep time_used right on every calendar
+                taken = next(slot for slot in free[person] if slot[0] <= start and start + minutes <= slot[1]);
+                slot = slots[taken[3]];
+                slot.time_used = start + minutes - to_minutes(slot.start);
+                free[person] = book(free[person], taken, start + minutes);
+
+            event.schedule_event(from_minutes(start), from_minutes(start + minutes));
+            priorities[event.id] = window[2];
+            break;
+
+        if not event.is_scheduled: event.is_failed = True;
+
+    return (events, slots, priorities);
+
+def score_joint(events: List[Event], priorities: Dict[int, float]) -> tuple[float, float, float]:
+    """(num late, total slot priority, sooness), counted like score_schedule"""
+    num_late: float = 0;
+    total_slot_priority: float = 0;
+    sooness: float = 0;
+
+    for event in events:
+        if not event.is_scheduled:
+            num_late += 1;
+            total_slot_priority += OUT_OF_SPACE_PRIORITY;
+            continue;
+
+        total_slot_priority += priorities[event.id];
+        if event.end + event.min_time > event.due_date: num_late += 10;
+        sooness += sooness_term(to_minutes(event.due_date), to_minutes(event.start));
+
+    return (num_late, total_slot_priority, sooness);
+
+# ======= #
+# SOLVING #                             MARK: Solving
+# ======= #
+
+CANCEL_POLL = 0.1;          # seconds between looks at the cancel flag while clusters run on a pool
+
+def solve_cluster(cluster: Cluster, method: str, options: EngineOptions) -> tuple[List[Event], List[Slot], SolveReport]:
+    """One cluster with the chosen engine; clusters with shared events always use joint_greedy"""
+    if not cluster.joint:
+        result, report = run_engine(method, cluster.slots, cluster.events, options);
+        return (result.events, result.slots, report);
+
+    bound = lower_bound(cluster.slots, cluster.events);
+
+    began = perf_counter();
+    events, slots, priorities = joint_greedy(cluster.slots, cluster.events);
+    seconds = perf_counter() - began;
+
+    num_late, slot_priority, sooness = score_joint(events, priorities);
+    value = score(num_late, slot_priority);
+
+    return (events, slots, SolveReport(method, 'joint', seconds, 1, num_late, slot_priority, sooness, value, bound, relative_gap(value, bound)));
+
+def combine_reports(method: str, reports: List[SolveReport], seconds: float) -> SolveReport:
+    """Clusters are independent, so their objectives add up"""
+    num_late = sum(report.num_late for report in reports);
+    slot_priority = sum(report.slot_priority for report in reports);
+    value = sum(report.score for report in reports);
+    bound = sum(report.bound for report in reports);
+    engines = sorted({report.engine for report in reports});
+
+    return SolveReport(
+        method, '+'.join(engines), seconds,
+        sum(report.evaluations for report in reports),
+        num_late, slot_priority, sum(report.sooness for report in reports),
+        value, bound, relative_gap(value, bound),
+        sum(report.cache_hits for report in reports), sum(report.cache_misses for report in reports),
+        sum(report.local_moves for report in reports),
+    );
+
+def solve_counted(cluster: Cluster, method: str, options: EngineOptions) -> tuple[tuple[List[Event], List[Slot], SolveReport], tuple]:
+    """solve_cluster in a pool process, along with the METRICS it counted there
+
+    A process's METRICS never reach the server's on their own, and forked
+    workers start with a copy of the parent's, so each cluster counts from zero.
+    """
+    METRICS.reset();
+    return (solve_cluster(cluster, method, options), METRICS.snapshot());
+
+def solve_on_pool(clusters: List[Cluster], method: str, options: EngineOptions, workers: int, pool_kind: PoolKind) -> list:
+    """solve_cluster for every cluster on a pool, in cluster order
+
+    Once options.cancelled is set, clusters that have not started are dropped.
+    Thread workers share the flag, so the ones running stop too; process
+    workers can not be handed it and finish the cluster they are on.
+    """
+    cancelled = options.cancelled;
+    # clusters run in parallel instead of each one spreading its population over workers
+    options = replace(options, workers=0, callback=None, cancelled=cancelled if pool_kind == 'thread' else None);
+    executor: Executor = ProcessPoolExecutor(max_workers=workers) if pool_kind == 'process' else ThreadPoolExecutor(max_workers=workers);
+
+    solve = solve_counted if pool_kind == 'process' else solve_cluster;
+
+    with executor:
+        futures = [executor.submit(solve, cluster, method, options) for cluster in clusters];
+        running = set(futures);
+        while running:
+            _, running = wait(running, CANCEL_POLL if cancelled else None, FIRST_COMPLETED);
+            if cancelled is not None and cancelled.is_set():
+                for future in running: future.cancel();
+                break;
+
+    results = [future.result() for future in futures if not future.cancelled()];
+    if solve is solve_cluster: return results;
+
+    for _, counted in results: METRICS.merge(counted);
+    return [result for result, _ in results];
+
+def solve_team(clusters: List[Cluster], method: str, options: EngineOptions, workers: int = 0, pool_kind: PoolKind = 'process') -> tuple[List[Event], List[Slot], SolveReport]:
+    """Solve every cluster, side by side on a pool when workers > 0
+
+    A cancelled run stops between clusters and returns the ones it finished.
+    """
+    began = perf_counter();
+
+    if workers > 0 and len(clusters) > 1:
+        results = solve_on_pool(clusters, method, options, workers, pool_kind);
+    else:
+        results = [];
+        for cluster in clusters:
+            if options.is_cancelled: break;
+            results.append(solve_cluster(cluster, method, options));
+
+    events = [event for cluster_events, _, _ in results for event in cluster_events];
+    slots = [slot for _, cluster_slots, _ in results for slot in cluster_slots];
+
+    return (events, slots, combine_reports(method, [report for _, _, report in results], perf_counter() - began));
+
+# ========= #
+# SCHEDULER #                           MARK: Scheduler
+# ========= #
+
+class TeamScheduler(Scheduler):
+    """Scheduler over everyone's calendars at once: the owner's, every person's, and shared events"""
+    def __init__(self, storage: SchedulerStorage, workers: int = 0, pool_kind: PoolKind = 'process'):
+        super().__init__(storage, workers, pool_kind, incremental=False)
+
+    @timed('load_data')
+    def load_data(self):
+        current_date = datetime.now()
+        conn = self.storage.get_db_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT start, end, priority, id, person_id FROM slots
+            WHERE start >= ?
+            ORDER BY priority ASC, start ASC
+        """, (current_date,))
+        self.slots = SlotTable.from_rows(cursor.fetchall()).to_models()
+
+        cursor.execute(f"""
+            SELECT {EVENT_COLUMNS},
+                (SELECT group_concat(ifnull(person_id, '')) FROM event_attendees t WHERE t.event_id = e.id) AS attendees
+            FROM events e
+            LEFT JOIN event_availability a ON a.event_id = e.id
+            WHERE e.due_date >= ?
+            AND e.completed == 0
+            ORDER BY e.priority DESC, e.due_date ASC, e.id ASC, a.start ASC
+        """, (current_date,))
+        rows, windows = split_windows(cursor.fetchall())
+        table = EventTable.from_rows(rows)
+        self.events = table.to_models(windows)
+        self.saved = table.placements()
+
+        if self.events: self.slots = with_templates(cursor, self.slots, current_date, max(event.due_date for event in self.events), everyone=True)
+
+        # an empty id is the owner attending along with the others
+        attendees = {row['id']: [int(person) if person else None for person in row['attendees'].split(',')] for row in rows if row['attendees'] is not None}
+        for event in self.events:
+            event.attendees = attendees.get(event.id, [])
+
+        self.last_mark, _, _ = self.storage.get_dirty_marks(cursor)
+
+        conn.close()
+
+    def schedule(self, method: str = 'genetic', callback=None, time_budget: Optional[float] = None, window_days: int = 0, encoding: Encoding = 'random_key', cancelled: Optional[Flag] = None) -> None:
+        if method not in ENGINES:
+            raise ValueError(f"Unknown scheduling method: {method}");
+
+        if not self.events: return;
+
+        options = EngineOptions(saved=self.saved, callback=callback, time_budget=time_budget, window_days=window_days, encoding=encoding, cancelled=cancelled);
+        events, slots, self.report = solve_team(partition(self.slots, self.events), method, options, self.workers, self.pool_kind);
+
+        # slots of people with nothing to do stay in, so saving resets their time_used
+        solved = {slot.id for slot in slots};
+        self.events = events;
+        self.slots = slots + [slot for slot in self.slots if slot.id not in solved];
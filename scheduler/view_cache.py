@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from hashlib import blake2b
+from threading import Lock
+from typing import Callable, Iterable, Optional, Union
+
+from flask import Response, request
+
+from metrics import METRICS
+
+VIEW_CACHE_SIZE = 256;    # rendered responses kept, least recently used dropped first
+
+# ========== #
+# VIEW CACHE #                          MARK: View Cache
+# ========== #
+# keys are tuples led by the view and the date they show:
+#     ('month', year, month, today)    ('day', year, month, day)    ('slots', person_id, week start)
+# writes drop only the keys showing what they changed, e.g. invalidate('day', 2024, 3, 14)
+
+@dataclass
+class CachedView:
+    body: bytes
+    mimetype: str
+    etag: str
+
+class ViewCache:
+    """Thread-safe bounded LRU of rendered calendar responses"""
+    def __init__(self, size: int = VIEW_CACHE_SIZE):
+        self.size = size;
+        self.lock = Lock();
+        self.views: OrderedDict[tuple, CachedView] = OrderedDict();
+        # bumped by every invalidation, so a response built from data read before one is not kept
+        self.epoch = 0;
+
+    def get(self, key: tuple) -> Optional[CachedView]:
+        with self.lock:
+            view = self.views.get(key);
+            if view is not None: self.views.move_to_end(key);
+
+        METRICS.inc('scheduler_view_cache_hits_total' if view else 'scheduler_view_cache_misses_total', view=key[0]);
+        return view;
+
+    def put(self, key: tuple, body: bytes, mimetype: str, epoch: int) -> CachedView:
+        view = CachedView(body, mimetype, blake2b(body, digest_size=8).hexdigest());
+
+        with self.lock:
+            if epoch != self.epoch: return view;
+            self.views[key] = view;
+            self.views.move_to_end(key);
+            while len(self.views) > self.size: self.views.popitem(last=False);
+
+        return view;
+
+    def invalidate(self, *prefix) -> None:
+        """Drop every key starting with prefix, e.g. ('month', 2024, 3) for all of March's month views"""
+        with self.lock:
+            self.epoch += 1;
+            for key in [key for key in self.views if key[:len(prefix)] == prefix]:
+                del self.views[key];
+
+    def clear(self) -> None:
+        with self.lock:
+            self.epoch += 1;
+            self.views.clear();
+
+VIEW_CACHE = ViewCache();
+
+def invalidate_starts(starts: Iterable[Optional[str]]) -> None:
+    """Drop the month and day views showing events that start (or started) at these times"""
+    for start in {start[:10] for start in starts if start}:
+        day = date.fromisoformat(start);
+        VIEW_CACHE.invalidate('month', day.year, day.month);
+        VIEW_CACHE.invalidate('day', day.year, day.month, day.day);
+
+def invalidate_week(person_id: Optional[int], week_start: datetime) -> None:
+    VIEW_CACHE.invalidate('slots', person_id, week_start.date());
+
+# MARK: Responses
+def cached_response(key: tuple, build: Callable[[], Union[str, Response, tuple]]) -> Response:
+    """The cached response for key, built on a miss; answers a matching If-None-Match with 304
+
+    Only plain 200 responses are kept. Browsers are told to revalidate every
+    time, so a write shows up on the next load while unchanged views cost one
+    lookup here and no body.
+    """
+    view = VIEW_CACHE.get(key);
+
+    if view is None:
+        epoch = VIEW_CACHE.epoch;
+        built = build();
+        if isinstance(built, tuple): return built;
+
+        response = built if isinstance(built, Response) else Response(built, mimetype='text/html');
+        if response.status_code != 200: return response;
+        view = VIEW_CACHE.put(key, response.get_data(), response.mimetype, epoch);
+
+    response = Response(view.body, mimetype=view.mimetype);
+    response.set_etag(view.etag);
+    response.headers['Cache-Control'] = 'no-cache';
+
+    return response.make_conditional(request);
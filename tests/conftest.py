@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# the app imports its modules flat, the way server.py runs them from scheduler/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scheduler'));
+
+from database import SchedulerStorage
+from jobs import JobManager
+from view_cache import VIEW_CACHE
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Flask test client of the app, on a database of its own"""
+    # server.py opens ./scheduler/database.db the first time it is imported
+    (tmp_path / 'scheduler').mkdir();
+    monkeypatch.chdir(tmp_path);
+    import server;
+
+    storage = SchedulerStorage(str(tmp_path / 'test.db'));
+    monkeypatch.setattr(server, 'storage', storage);
+    monkeypatch.setattr(server, 'jobs', JobManager(storage));
+    # views cached by another test show another database
+    VIEW_CACHE.clear();
+
+    return server.app.test_client();
@@ -0,0 +1,52 @@
+from copy import deepcopy
+from datetime import datetime, timedelta
+from random import Random
+
+import pytest
+
+from availability import feasibility_of
+from benchmark import synthetic_calendar
+from model import TimeWindow
+from optimize import EngineOptions, run_engine
+
+START = datetime(2030, 1, 7);
+
+def with_windows(n_events: int, n_slots: int, seed: int):
+    """A synthetic calendar where every other event may only use a few random days"""
+    rng = Random(seed);
+    slots, events = synthetic_calendar(n_events, n_slots, seed, START + timedelta(hours=8));
+    days = max(1, n_slots // 4);
+
+    for event in events[::2]:
+        chosen = sorted(rng.sample(range(days), min(days, 3)));
+        event.availability = [TimeWindow(START + timedelta(days=day), START + timedelta(days=day + 1), 1) for day in chosen];
+
+    return (slots, events);
+
+def inside(start: datetime, end: datetime, windows: list) -> bool:
+    return any(window.start <= start and end <= window.end for window in windows);
+
+def test_feasibility_matches_the_windows():
+    slots, events = with_windows(20, 40, 0);
+    for index, slot in enumerate(slots): slot.time_used = 15 * (index % 2);
+    # touching windows act as one
+    events[0].availability = [TimeWindow(START, START + timedelta(days=1, hours=12), 1), TimeWindow(START + timedelta(days=1, hours=12), START + timedelta(days=3), 1)];
+    feasibility = feasibility_of(slots, events);
+
+    for index, event in enumerate(events):
+        expected = [not event.availability or inside(slot.adj_start, slot.end, event.availability) for slot in slots];
+        assert feasibility.allowed[feasibility.event_class[index], :len(slots)].tolist() == expected;
+
+    assert not feasibility.allowed[:, len(slots)].any();
+    # events without windows share one class
+    assert len(set(feasibility.event_class[1::2].tolist())) == 1;
+
+@pytest.mark.parametrize('method, n_events, n_slots', [('greedy', 80, 60), ('genetic', 80, 60), ('exact', 8, 12)])
+def test_engines_keep_to_the_windows(method, n_events, n_slots):
+    slots, events = with_windows(n_events, n_slots, 1);
+    result, _ = run_engine(method, deepcopy(slots), deepcopy(events), EngineOptions());
+
+    scheduled = [event for event in result.events if event.is_scheduled];
+    assert any(event.availability for event in scheduled);
+    for event in scheduled:
+        assert not event.availability or inside(event.start, event.end, event.availability);
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import SchedulerStorage
+
+START = datetime(2030, 1, 7);
+END = START + timedelta(days=7);
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SchedulerStorage(str(tmp_path / 'scheduler.db'));
+    yield storage;
+    storage.close();
+
+def slot_rows(cursor) -> list:
+    cursor.execute("SELECT id, start, end, priority, time_used FROM slots ORDER BY id");
+    return [tuple(row) for row in cursor.fetchall()];
+
+def slot(day: int, hour: int, priority: int = 1) -> tuple[datetime, datetime, int]:
+    return (START + timedelta(days=day, hours=hour), START + timedelta(days=day, hours=hour + 2), priority);
+
+def test_unchanged_slots_keep_their_rows(storage):
+    cursor = storage.get_db_connection().cursor();
+    slots = [slot(day, 9) for day in range(5)];
+
+    assert storage.replace_slots(cursor, START, END, slots);
+    cursor.execute("UPDATE slots SET time_used = 30");
+    before = slot_rows(cursor);
+
+    assert not storage.replace_slots(cursor, START, END, list(reversed(slots)));
+    assert slot_rows(cursor) == before;
+
+def test_only_the_difference_is_written(storage):
+    cursor = storage.get_db_connection().cursor();
+    storage.replace_slots(cursor, START, END, [slot(0, 9), slot(1, 9), slot(2, 9)]);
+    kept = slot_rows(cursor)[:2];
+
+    assert storage.replace_slots(cursor, START, END, [slot(0, 9), slot(1, 9), slot(2, 9, priority=3)]);
+    rows = slot_rows(cursor);
+    assert rows[:2] == kept and len(rows) == 3 and rows[2][3] == 3;
+
+def test_duplicate_rows_are_removed(storage):
+    cursor = storage.get_db_connection().cursor();
+    start, end, priority = slot(0, 9);
+    for _ in range(3):
+        cursor.execute("INSERT INTO slots (start, end, time_used, priority, person_id) VALUES (?, ?, 0, ?, NULL)", (start, end, priority));
+    oldest = slot_rows(cursor)[0];
+
+    assert storage.replace_slots(cursor, START, END, [slot(0, 9)]);
+    assert slot_rows(cursor) == [oldest];
+
+    assert not storage.replace_slots(cursor, START, END, [slot(0, 9)]);
+
+def test_duplicates_asked_for_are_kept(storage):
+    cursor = storage.get_db_connection().cursor();
+
+    assert storage.replace_slots(cursor, START, END, [slot(0, 9), slot(0, 9)]);
+    assert len(slot_rows(cursor)) == 2;
+    assert not storage.replace_slots(cursor, START, END, [slot(0, 9), slot(0, 9)]);
+
+    assert storage.replace_slots(cursor, START, END, []);
+    assert slot_rows(cursor) == [];
@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from database import SchedulerStorage
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SchedulerStorage(str(tmp_path / 'scheduler.db'), pool_size=2);
+    yield storage;
+    storage.close();
+
+def test_connections_are_reused(storage):
+    conn = storage.get_db_connection();
+    first = conn._conn;
+    conn.close();
+    conn.close();
+
+    again = storage.get_db_connection();
+    assert again._conn is first;
+    again.close();
+
+def test_pool_keeps_at_most_pool_size(storage):
+    loans = [storage.get_db_connection() for _ in range(4)];
+    assert len({id(conn._conn) for conn in loans}) == 4;
+
+    for conn in loans: conn.close();
+    assert storage._pool.qsize() == 2;
+
+def test_wal_and_pragmas(storage):
+    conn = storage.get_db_connection();
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal';
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1;
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000;
+    finally:
+        conn.close();
+
+def test_returned_connections_drop_open_transactions(storage):
+    conn = storage.get_db_connection();
+    conn.execute("INSERT INTO people (name) VALUES ('ann')");
+    conn.close();
+
+    conn = storage.get_db_connection();
+    try:
+        assert not conn.in_transaction;
+        assert conn.execute("SELECT count(*) FROM people").fetchone()[0] == 0;
+    finally:
+        conn.close();
+
+def test_threads_share_the_pool(storage):
+    def add(index: int) -> None:
+        conn = storage.get_db_connection();
+        try:
+            conn.execute("INSERT INTO people (name) VALUES (?)", (f'person {index}',));
+            conn.commit();
+        finally:
+            conn.close();
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(add, range(60)));
+
+    conn = storage.get_db_connection();
+    try:
+        assert conn.execute("SELECT count(*) FROM people").fetchone()[0] == 60;
+    finally:
+        conn.close();
+    assert storage._pool.qsize() <= 2;
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+from random import Random
+
+import pytest
+
+from database import SchedulerStorage
+
+START = datetime(2030, 1, 7);
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SchedulerStorage(str(tmp_path / 'scheduler.db'));
+    yield storage;
+    storage.close();
+
+def summary(cursor) -> list:
+    """Rows with anything in them; the triggers leave emptied days behind where a rebuild drops them"""
+    cursor.execute("""
+        SELECT * FROM daily_summary
+        WHERE priority_1 + priority_2 + priority_3 + priority_4 + priority_5 + completed
+            + scheduled_minutes + slot_minutes + used_minutes != 0
+        ORDER BY day, person_id
+    """);
+    return [tuple(row) for row in cursor.fetchall()];
+
+def test_triggers_match_rebuild(storage):
+    rng = Random(0);
+    conn = storage.get_db_connection();
+    cursor = conn.cursor();
+
+    person_id = cursor.execute("INSERT INTO people (name) VALUES ('ann')").lastrowid;
+    for person in (None, person_id):
+        slots = [(START + timedelta(days=day, hours=hour), START + timedelta(days=day, hours=hour + 2), rng.randint(1, 5)) for day in range(14) for hour in (9, 14)];
+        storage.replace_slots(cursor, START, START + timedelta(days=14), slots, person);
+
+    for index in range(60):
+        start = START + timedelta(days=rng.randint(0, 13), hours=rng.choice([9, 10, 14, 15]));
+        placed = rng.random() < 0.7;
+        cursor.execute("""
+            INSERT INTO events (name, start, end, due_date, min_time, max_time, priority, completed)
+            VALUES (?, ?, ?, ?, 30, 60, ?, ?)
+        """, (f'event {index}', start.isoformat() if placed else None, (start + timedelta(minutes=60)).isoformat() if placed else None,
+              (start + timedelta(days=2)).isoformat(), rng.randint(1, 5), int(rng.random() < 0.2)));
+
+    # every kind of write the app makes: optimize saves, edits, completions, deletions and new slot weeks
+    ids = [row['id'] for row in cursor.execute("SELECT id FROM events ORDER BY id")];
+    slot_ids = [row['id'] for row in cursor.execute("SELECT id FROM slots ORDER BY id")];
+    storage.save_schedule(cursor,
+        [(event_id, (START + timedelta(days=index % 14, hours=9)).isoformat(), (START + timedelta(days=index % 14, hours=10)).isoformat()) for index, event_id in enumerate(ids[:20])],
+        [(slot_id, rng.choice([0, 30, 60, 120])) for slot_id in slot_ids]);
+    cursor.execute("UPDATE events SET priority = 5 WHERE id IN (?, ?, ?)", ids[20:23]);
+    cursor.execute("UPDATE events SET completed = 1 WHERE id IN (?, ?)", ids[23:25]);
+    cursor.execute("UPDATE events SET start = NULL, end = NULL WHERE id = ?", (ids[25],));
+    cursor.execute("DELETE FROM events WHERE id IN (?, ?, ?)", ids[26:29]);
+    storage.replace_slots(cursor, START + timedelta(days=7), START + timedelta(days=14), [(START + timedelta(days=8, hours=11), START + timedelta(days=8, hours=12), 1)]);
+    cursor.execute("UPDATE slots SET person_id = ? WHERE id = ?", (person_id, slot_ids[0]));
+
+    kept = summary(cursor);
+    storage.rebuild_daily_summary(cursor);
+
+    assert kept == summary(cursor);
+    conn.close();
+
+def test_people_are_summarized_apart(storage):
+    conn = storage.get_db_connection();
+    cursor = conn.cursor();
+
+    person_id = cursor.execute("INSERT INTO people (name) VALUES ('ann')").lastrowid;
+    storage.replace_slots(cursor, START, START + timedelta(days=1), [(START + timedelta(hours=9), START + timedelta(hours=11), 1)]);
+    storage.replace_slots(cursor, START, START + timedelta(days=1), [(START + timedelta(hours=9), START + timedelta(hours=12), 1)], person_id);
+
+    rows = {row['person_id']: row['slot_minutes'] for row in cursor.execute("SELECT person_id, slot_minutes FROM daily_summary WHERE day = ?", (START.date().isoformat(),))};
+    assert rows == {None: 120, person_id: 180};
+    conn.close();
@@ -0,0 +1,129 @@
+from copy import deepcopy
+from datetime import timedelta
+from functools import partial
+from typing import List
+
+import numpy as np
+import pytest
+
+from benchmark import synthetic_calendar
+from decoder import SIGNATURE_BYTES, DecodeCache, build_arrays, decode_population, decode_schedule
+from exact import score_schedule
+from model import Slot, Event
+from optimize import SchedulerProblem, VectorizedSchedulerProblem, apply_placement, placement_of
+
+# ========= #
+# REFERENCE #                           MARK: Reference
+# ========= #
+
+def reference_schedule(x: np.ndarray, slots: List[Slot], events: List[Event]) -> tuple[float, int, float]:
+    """The original optimize_schedule: walks the models, filling slots in order until one is too small"""
+    order = np.argsort(x[len(events):], kind='stable');
+
+    total_slot_priority, num_late, sooness = 0.0, 0, 0.0;
+    slot_index, out_of_space = 0, False;
+
+    for index in order:
+        event = events[index];
+        minutes = event.calc_duration(x[index]).total_seconds() / 60;
+        duration = timedelta(minutes=round(minutes / 15) * 15);
+
+        while True:
+            if slot_index >= len(slots) or out_of_space:
+                out_of_space = True;
+                num_late += 1;
+                total_slot_priority += 5.01;
+                break;
+            if slots[slot_index].capacity < duration: slot_index += 1;
+            else: break;
+
+        if out_of_space: continue;
+
+        slot = slots[slot_index];
+        event.schedule_event(slot.adj_start, slot.adj_start + duration);
+        slot.time_used += int(duration.total_seconds() // 60);
+
+        total_slot_priority += slot.priority;
+        if slot.adj_start + event.min_time > event.due_date: num_late += 10;
+        sooness += 1 - np.exp(0.2 * (event.due_date - event.start).days);
+
+    return (total_slot_priority, num_late, sooness);
+
+def reference_objectives(X: np.ndarray, slots: List[Slot], events: List[Event]) -> tuple[np.ndarray, np.ndarray]:
+    rows = [reference_schedule(x, deepcopy(slots), deepcopy(events)) for x in X];
+    return (np.array([[priority, sooness] for priority, _, sooness in rows]), np.array([[late] for _, late, _ in rows]));
+
+# ===== #
+# TESTS #                               MARK: Tests
+# ===== #
+
+@pytest.mark.parametrize('n_events, n_slots, seed', [(1, 1, 0), (8, 3, 1), (30, 40, 2), (60, 20, 3), (120, 200, 4)])
+def test_vectorized_matches_reference(n_events, n_slots, seed):
+    slots, events = synthetic_calendar(n_events, n_slots, seed);
+    X = np.random.default_rng(seed).random((40, 2 * n_events));
+
+    out = {};
+    VectorizedSchedulerProblem(slots, events)._evaluate(X, out);
+    F, G = reference_objectives(X, slots, events);
+
+    np.testing.assert_allclose(out['F'], F);
+    np.testing.assert_array_equal(out['G'], G);
+
+def test_elementwise_matches_reference():
+    slots, events = synthetic_calendar(25, 30, 5);
+    X = np.random.default_rng(5).random((10, 50));
+    F, G = reference_objectives(X, slots, events);
+
+    for x, f, g in zip(X, F, G):
+        out = {};
+        SchedulerProblem(slots, events)._evaluate(x, out);
+        np.testing.assert_allclose(out['F'], f);
+        np.testing.assert_array_equal(out['G'], g);
+
+def test_decoding_leaves_models_alone():
+    slots, events = synthetic_calendar(20, 10, 6);
+    before = (deepcopy(slots), deepcopy(events));
+
+    VectorizedSchedulerProblem(slots, events)._evaluate(np.random.default_rng(6).random((5, 40)), {});
+
+    assert (slots, events) == before;
+
+@pytest.mark.parametrize('first_fit', [False, True])
+def test_decode_schedule_is_repeatable(first_fit):
+    slots, events = synthetic_calendar(40, 30, 8);
+    arrays = build_arrays(slots, events);
+    before = deepcopy(arrays.__dict__);
+    x = np.random.default_rng(8).random(80);
+    decode = partial(decode_population, first_fit=first_fit);
+
+    first, second = decode_schedule(x, arrays, decode), decode_schedule(x, arrays, decode);
+
+    assert first[:3] == second[:3];
+    np.testing.assert_array_equal(first[3].slot, second[3].slot);
+    for name, value in before.items(): np.testing.assert_array_equal(getattr(arrays, name), value);
+
+@pytest.mark.parametrize('first_fit', [False, True])
+def test_applied_placement_scores_like_the_decoder(first_fit):
+    slots, events = synthetic_calendar(60, 40, 9);
+    x = np.random.default_rng(9).random(120);
+    decode = partial(decode_population, first_fit=first_fit);
+    total_slot_priority, num_late, sooness, placement = decode_schedule(x, build_arrays(slots, events), decode);
+
+    apply_placement(placement, slots, events);
+
+    assert score_schedule(slots, events) == pytest.approx((num_late, total_slot_priority, sooness));
+    np.testing.assert_array_equal(placement_of(slots, events).slot, placement.slot);
+
+def test_cache_keys_stay_small():
+    slots, events = synthetic_calendar(500, 200, 7);
+    arrays = build_arrays(slots, events);
+    X = np.random.default_rng(7).random((20, 1000));
+    cache = DecodeCache(arrays);
+
+    F, G = cache.evaluate(np.vstack([X, X]), lambda rows: decode_population(rows, arrays));
+    expected_F, expected_G = decode_population(X, arrays);
+
+    np.testing.assert_allclose(F, np.vstack([expected_F, expected_F]));
+    np.testing.assert_array_equal(G, np.vstack([expected_G, expected_G]));
+    assert (cache.stats.hits, cache.stats.misses) == (20, 20);
+    assert {len(key) for key in cache.entries} == {SIGNATURE_BYTES};
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+from random import Random
+
+import pytest
+
+START = datetime(2030, 3, 4, 9);
+
+SORT_KEYS = {
+    'start': lambda event: (event['start'], event['due_date'], event['id']),
+    'due': lambda event: (event['due_date'], event['id']),
+    'priority': lambda event: (-event['priority'], event['due_date'], event['id']),
+};
+
+def insert(rows: list) -> None:
+    import server;
+    conn = server.storage.get_db_connection();
+    try:
+        conn.executemany("""
+            INSERT INTO events (name, start, end, due_date, min_time, max_time, priority, completed)
+            VALUES (?, ?, ?, ?, 30, 30, ?, ?)
+        """, rows);
+        conn.commit();
+    finally:
+        conn.close();
+
+def fill(n_events: int, seed: int) -> None:
+    """A third each of scheduled, unscheduled and completed events, with plenty of ties to page across"""
+    rng = Random(seed);
+    rows = [];
+    for index in range(n_events):
+        start = START + timedelta(days=rng.randint(0, 3), hours=rng.choice([0, 2]));
+        due = START + timedelta(days=rng.randint(4, 6));
+        placed = index % 3 != 1;
+        rows.append((f'event {index}', start.isoformat() if placed else None, (start + timedelta(minutes=30)).isoformat() if placed else None, due.isoformat(), rng.randint(1, 3), int(index % 3 == 2)));
+    insert(rows);
+
+def every_page(client, kind: str, **args) -> tuple[list, int]:
+    """All of a list's events, following the cursors, and the number of pages it took"""
+    events, pages, after = [], 0, None;
+    while True:
+        query = {**args, **({'after': after} if after else {})};
+        page = client.get(f'/events/{kind}', query_string=query).get_json();
+        events += page['events'];
+        pages += 1;
+        after = page['after'];
+        if after is None: return (events, pages);
+
+@pytest.mark.parametrize('kind, sort', [('scheduled', 'start'), ('scheduled', 'priority'), ('unscheduled', 'priority'), ('unscheduled', 'due'), ('completed', 'due')])
+def test_pages_have_no_gaps_or_repeats(client, kind, sort):
+    fill(120, 0);
+    everything, _ = every_page(client, kind, sort=sort, limit=200);
+    paged, pages = every_page(client, kind, sort=sort, limit=7);
+
+    assert len(everything) == 40;
+    assert [event['id'] for event in paged] == [event['id'] for event in everything];
+    assert pages == 6;
+    assert paged == sorted(paged, key=SORT_KEYS[sort]);
+
+def test_lists_split_the_events(client):
+    fill(30, 1);
+    lists = {kind: {event['id'] for event in every_page(client, kind)[0]} for kind in ('scheduled', 'unscheduled', 'completed')};
+
+    assert sorted(id for ids in lists.values() for id in ids) == list(range(1, 31));
+    assert lists['unscheduled'] == set(range(2, 31, 3));
+
+def test_new_rows_do_not_shift_later_pages(client):
+    fill(30, 2);
+    first = client.get('/events/scheduled', query_string={'sort': 'start', 'limit': 5}).get_json();
+    # sorts before every event on the first page
+    insert([('early', (START - timedelta(hours=1)).isoformat(), START.isoformat(), (START + timedelta(days=5)).isoformat(), 2, 0)]);
+    rest, _ = every_page(client, 'scheduled', sort='start', limit=5, after=first['after']);
+    ids = [event['id'] for event in first['events'] + rest];
+
+    assert len(ids) == len(set(ids)) == 10;
+
+def test_filters_and_labels(client):
+    insert([
+        ('100% done', (START + timedelta(hours=1, minutes=5)).isoformat(), (START + timedelta(hours=2)).isoformat(), datetime(2030, 3, 7, 9, 5).isoformat(), 3, 0),
+        ('1000 done', START.isoformat(), (START + timedelta(hours=1)).isoformat(), datetime(2030, 3, 7).isoformat(), 1, 0),
+    ]);
+
+    named = client.get('/events/scheduled', query_string={'q': '0%'}).get_json()['events'];
+    assert [event['name'] for event in named] == ['100% done'];
+    assert named[0]['due_label'] == '03/7 @ 9:05' and named[0]['start_label'] == '3/4, 10:05 - 11:00';
+    assert [event['name'] for event in client.get('/events/scheduled', query_string={'priority': 1}).get_json()['events']] == ['1000 done'];
+
+def test_bad_requests(client):
+    assert client.get('/events/everything').status_code == 404;
+    assert client.get('/events/unscheduled', query_string={'sort': 'start'}).status_code == 400;
+    assert client.get('/events/scheduled', query_string={'after': 'not a cursor'}).status_code == 400;
@@ -0,0 +1,40 @@
+from itertools import permutations, product
+
+import numpy as np
+import pytest
+
+from benchmark import synthetic_calendar
+from decoder import GRID, build_arrays, decode_ordered, duration_buckets
+from exact import BranchAndBound, lower_bound, score
+
+def brute_force(arrays, bucket_choices) -> float:
+    """Lowest score over every decode order and every given duration bucket per event"""
+    n_events = arrays.n_events;
+    lowest, _ = duration_buckets(arrays);
+    orders = np.array(list(permutations(range(n_events))), dtype=np.int64);
+    best = float('inf');
+
+    for buckets in product(*bucket_choices):
+        durations = (lowest + np.array(buckets, dtype=np.int64))[orders] * GRID;
+        F, G = decode_ordered(orders, durations, arrays);
+        best = min(best, float(score(G[:, 0], F[:, 0]).min()));
+
+    return best;
+
+@pytest.mark.parametrize('n_events, n_slots, seed', [(1, 1, 0), (4, 2, 1), (6, 3, 2), (7, 8, 3), (8, 4, 4), (9, 5, 5)])
+def test_exact_matches_brute_force(n_events, n_slots, seed):
+    slots, events = synthetic_calendar(n_events, n_slots, seed);
+    arrays = build_arrays(slots, events);
+    result = BranchAndBound(arrays).solve();
+
+    assert result.optimal;
+    assert result.score == pytest.approx(brute_force(arrays, [[0]] * n_events));
+    assert lower_bound(slots, events) <= result.score + 1e-9;
+
+@pytest.mark.parametrize('seed', [6, 7, 8])
+def test_shortest_durations_lose_nothing(seed):
+    slots, events = synthetic_calendar(4, 2, seed);
+    arrays = build_arrays(slots, events);
+    _, spread = duration_buckets(arrays);
+
+    assert BranchAndBound(arrays).solve().score == pytest.approx(brute_force(arrays, [range(count + 1) for count in spread]));
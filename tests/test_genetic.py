@@ -0,0 +1,52 @@
+from copy import deepcopy
+
+import pytest
+
+from benchmark import ConvergenceCallback, synthetic_calendar
+from decoder import decode_schedule
+from exact import score, score_schedule
+from optimize import EngineOptions, VectorizedSchedulerProblem, greedy_scheduler, run_engine, warm_start_seeds
+from permutation import from_random_keys
+
+def greedy_score(slots, events) -> float:
+    slots, events = deepcopy(slots), deepcopy(events);
+    greedy_scheduler(slots, events);
+    num_late, total_slot_priority, _ = score_schedule(slots, events);
+
+    return score(num_late, total_slot_priority);
+
+@pytest.mark.parametrize('encoding', ['random_key', 'permutation'])
+@pytest.mark.parametrize('n_events, n_slots, seed', [(10, 28, 0), (30, 28, 1), (100, 120, 2), (300, 1460, 3)])
+def test_greedy_seed_decodes_to_greedy(n_events, n_slots, seed, encoding):
+    slots, events = synthetic_calendar(n_events, n_slots, seed);
+    for index, slot in enumerate(slots): slot.time_used = 15 * (index % 2);
+
+    greedy_slots, greedy_events = deepcopy(slots), deepcopy(events);
+    greedy_scheduler(greedy_slots, greedy_events);
+    seed_x = warm_start_seeds(slots, events, None, greedy_events)[-1];
+
+    problem = VectorizedSchedulerProblem(slots, events, encoding=encoding, first_fit=True);
+    if encoding == 'permutation':
+        seed_x = from_random_keys(seed_x, problem.arrays)[0];
+    total_slot_priority, num_late, _, _ = decode_schedule(seed_x, problem.arrays, problem.decode);
+
+    assert score(num_late, total_slot_priority) <= greedy_score(slots, events);
+
+def test_genetic_beats_greedy():
+    # greedy gives every event its longest duration first and runs out of room before the due dates
+    slots, events = synthetic_calendar(30, 28, 0);
+    _, report = run_engine('genetic', deepcopy(slots), deepcopy(events), EngineOptions(local_search=0));
+
+    assert report.score < greedy_score(slots, events);
+
+def test_encodings_search_differently():
+    slots, events = synthetic_calendar(30, 28, 1);
+    histories = {};
+    for encoding in ['random_key', 'permutation']:
+        callback = ConvergenceCallback();
+        _, report = run_engine('genetic', deepcopy(slots), deepcopy(events), EngineOptions(callback=callback, encoding=encoding, local_search=0));
+        histories[encoding] = [value for _, value in callback.history];
+
+        assert report.score < greedy_score(slots, events);
+
+    assert histories['random_key'] != histories['permutation'];
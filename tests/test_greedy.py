@@ -0,0 +1,36 @@
+from copy import deepcopy
+from datetime import timedelta
+from typing import List
+
+import pytest
+
+from benchmark import synthetic_calendar
+from model import Slot, Event
+from optimize import greedy_scheduler
+
+def reference_greedy(slots: List[Slot], events: List[Event]) -> tuple[List[Event], List[Slot]]:
+    """The original greedy_scheduler, returning after every event rather than the first"""
+    for event in events:
+        for minutes in range(int(event.max_time.total_seconds() / 60), int(event.min_time.total_seconds() / 60) - 1, -15):
+            duration = timedelta(minutes=minutes);
+            slot = next((slot for slot in slots if duration <= slot.capacity and slot.start + duration <= event.due_date), None);
+            if slot:
+                event.schedule_event(slot.adj_start, slot.adj_start + duration);
+                slot.time_used += minutes;
+                break;
+
+        if not event.is_scheduled: event.is_failed = True;
+
+    return (events, slots);
+
+@pytest.mark.parametrize('n_events, n_slots, seed', [(0, 5, 0), (5, 0, 1), (10, 4, 2), (150, 60, 3), (150, 160, 4), (400, 1460, 5)])
+def test_greedy_matches_reference(n_events, n_slots, seed):
+    slots, events = synthetic_calendar(n_events, n_slots, seed);
+
+    assert greedy_scheduler(deepcopy(slots), deepcopy(events)) == reference_greedy(deepcopy(slots), deepcopy(events));
+
+def test_greedy_respects_used_time():
+    slots, events = synthetic_calendar(60, 40, 6);
+    for index, slot in enumerate(slots): slot.time_used = 15 * (index % 3);
+
+    assert greedy_scheduler(deepcopy(slots), deepcopy(events)) == reference_greedy(deepcopy(slots), deepcopy(events));
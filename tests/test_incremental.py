@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+from random import Random
+
+import pytest
+
+from database import SchedulerStorage
+from optimize import Scheduler
+
+DAYS = 14;
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SchedulerStorage(str(tmp_path / 'scheduler.db'));
+    yield storage;
+    storage.close();
+
+def day(offset: int) -> datetime:
+    return (datetime.now() + timedelta(days=offset)).replace(hour=0, minute=0, second=0, microsecond=0);
+
+def save_week(storage: SchedulerStorage, first: int, slots: list) -> None:
+    """Replace the slots of the week starting `first` days from now, marking it dirty like the save_slots route"""
+    conn = storage.get_db_connection();
+    cursor = conn.cursor();
+    if storage.replace_slots(cursor, day(first), day(first + 7), slots): storage.mark_window_dirty(cursor, day(first), day(first + 7));
+    conn.commit();
+    conn.close();
+
+def add_events(storage: SchedulerStorage, rng: Random, count: int) -> None:
+    conn = storage.get_db_connection();
+    cursor = conn.cursor();
+    for index in range(count):
+        min_time = rng.choice([15, 30, 45, 60]);
+        cursor.execute("""
+            INSERT INTO events (name, due_date, min_time, max_time, priority)
+            VALUES (?, ?, ?, ?, ?)
+        """, (f'event {index}', (day(rng.randint(2, DAYS)) + timedelta(hours=rng.randint(8, 20))).isoformat(), min_time, min_time + rng.choice([0, 15, 30]), rng.randint(1, 5)));
+        storage.mark_event_dirty(cursor, cursor.lastrowid);
+    conn.commit();
+    conn.close();
+
+def optimize(storage: SchedulerStorage, method: str, incremental: bool) -> None:
+    scheduler = Scheduler(storage, incremental=incremental);
+    scheduler.schedule(method);
+    scheduler.save_scheduled_events();
+
+def assert_no_overlaps(storage: SchedulerStorage) -> None:
+    conn = storage.get_db_connection();
+    placed = sorted((datetime.fromisoformat(row['start']), datetime.fromisoformat(row['end'])) for row in conn.execute("SELECT start, end FROM events WHERE start IS NOT NULL"));
+    slots = [(datetime.fromisoformat(row['start']), datetime.fromisoformat(row['end'])) for row in conn.execute("SELECT start, end FROM slots")];
+    conn.close();
+
+    assert placed;
+    for (_, end), (start, _) in zip(placed, placed[1:]):
+        assert end <= start;
+    for start, end in placed:
+        assert any(slot_start <= start and end <= slot_end for slot_start, slot_end in slots);
+
+@pytest.mark.parametrize('method', ['greedy', 'genetic'])
+def test_incremental_runs_never_overlap(storage, method):
+    rng = Random(0);
+    slots = lambda first, hours: [(day(first + offset) + timedelta(hours=hour), day(first + offset) + timedelta(hours=hour + 2), rng.randint(1, 5)) for offset in range(1, 7) for hour in hours];
+
+    save_week(storage, 0, slots(0, [9, 14]));
+    save_week(storage, 7, slots(7, [9, 14]));
+    add_events(storage, rng, 30);
+    optimize(storage, method, incremental=False);
+    assert_no_overlaps(storage);
+
+    # new events, an edit, and a week whose slots moved, each repaired on top of the kept schedule
+    add_events(storage, rng, 10);
+    conn = storage.get_db_connection();
+    cursor = conn.cursor();
+    event_id = cursor.execute("SELECT id FROM events WHERE start IS NOT NULL ORDER BY start LIMIT 1").fetchone()['id'];
+    cursor.execute("UPDATE events SET min_time = 60, max_time = 90 WHERE id = ?", (event_id,));
+    storage.mark_event_dirty(cursor, event_id);
+    conn.commit();
+    conn.close();
+    save_week(storage, 7, slots(7, [10, 15]));
+
+    optimize(storage, method, incremental=True);
+    assert_no_overlaps(storage);
+
+    add_events(storage, rng, 10);
+    optimize(storage, method, incremental=True);
+    assert_no_overlaps(storage);
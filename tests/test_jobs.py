@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+from random import Random
+from time import monotonic
+
+import pytest
+
+from database import SchedulerStorage
+from jobs import JobManager, OptimizeJob
+
+DAYS = 28;
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SchedulerStorage(str(tmp_path / 'scheduler.db'));
+    fill(storage, Random(0), 300);
+    yield storage;
+    storage.close();
+
+def day(offset: int) -> datetime:
+    return (datetime.now() + timedelta(days=offset)).replace(hour=0, minute=0, second=0, microsecond=0);
+
+def fill(storage: SchedulerStorage, rng: Random, n_events: int) -> None:
+    """Two slots a day for DAYS days and n_events open events due inside them"""
+    conn = storage.get_db_connection();
+    cursor = conn.cursor();
+    slots = [(day(offset) + timedelta(hours=hour), day(offset) + timedelta(hours=hour + 2), rng.randint(1, 5)) for offset in range(1, DAYS) for hour in (9, 14)];
+    storage.replace_slots(cursor, day(1), day(DAYS), slots);
+    for index in range(n_events):
+        min_time = rng.choice([15, 30, 45, 60]);
+        cursor.execute("""
+            INSERT INTO events (name, due_date, min_time, max_time, priority)
+            VALUES (?, ?, ?, ?, ?)
+        """, (f'event {index}', (day(rng.randint(2, DAYS)) + timedelta(hours=rng.randint(8, 20))).isoformat(), min_time, min_time + rng.choice([0, 15, 30]), rng.randint(1, 5)));
+    conn.commit();
+    conn.close();
+
+def placed(storage: SchedulerStorage) -> int:
+    conn = storage.get_db_connection();
+    try:
+        return conn.execute("SELECT count(*) FROM events WHERE start IS NOT NULL").fetchone()[0];
+    finally:
+        conn.close();
+
+def finish(job: OptimizeJob, timeout: float = 60) -> OptimizeJob:
+    deadline = monotonic() + timeout;
+    version = job.version;
+    while job.active and monotonic() < deadline:
+        version = job.wait(version, 1);
+    assert not job.active;
+    return job;
+
+def test_job_runs_and_saves(storage):
+    job = finish(JobManager(storage).submit('greedy'));
+
+    assert job.state == 'done' and job.error is None;
+    assert job.report['engine'] == 'greedy';
+    assert placed(storage) > 0;
+
+def test_identical_submissions_share_a_job(storage):
+    manager = JobManager(storage);
+    first = manager.submit('genetic');
+    second = manager.submit('genetic');
+    other = manager.submit('greedy');
+
+    assert second is first and other is not first;
+    # a cancelled job is not handed out again
+    manager.cancel(first.id);
+    assert manager.submit('genetic') is not first;
+
+    for job in list(manager.jobs.values()):
+        manager.cancel(job.id);
+        finish(job);
+
+def test_cancel_a_queued_job(storage):
+    manager = JobManager(storage);
+    running = manager.submit('genetic');
+    queued = manager.submit('greedy');
+    manager.cancel(queued.id);
+    manager.cancel(running.id);
+
+    assert finish(queued).state == 'cancelled' and queued.started is None;
+    finish(running);
+
+def test_cancel_a_running_job(storage):
+    manager = JobManager(storage);
+    job = manager.submit('genetic', time_budget=30);
+    while job.generation < 1 and job.active: job.wait(job.version, 1);
+
+    began = monotonic();
+    manager.cancel(job.id);
+
+    assert finish(job).state == 'cancelled';
+    assert monotonic() - began < 10;
+    # a cancelled run saves nothing
+    assert placed(storage) == 0;
+
+def test_failed_job_reports_the_error(storage):
+    job = finish(JobManager(storage).submit('simulated_annealing'));
+
+    assert job.state == 'failed' and job.error;
+
+def test_previews_start_at_generation_zero(storage, monkeypatch):
+    generations = [];
+    publish = OptimizeJob.publish;
+    def record(job, **changes):
+        if 'preview' in changes: generations.append(changes['preview']['generation']);
+        publish(job, **changes);
+    monkeypatch.setattr(OptimizeJob, 'publish', record);
+
+    job = finish(JobManager(storage).submit('genetic', time_budget=1));
+
+    assert job.state == 'done';
+    assert generations[0] == 0 and generations == sorted(generations);
+
+def test_cancel_endpoint(client):
+    assert client.post('/optimize_cancel/nope').status_code == 404;
+
+    job = client.get('/optimize/genetic').get_json()['job'];
+    response = client.post(f"/optimize_cancel/{job['id']}");
+
+    assert response.status_code == 200;
+    assert response.get_json()['id'] == job['id'];
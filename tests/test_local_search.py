@@ -0,0 +1,64 @@
+from copy import deepcopy
+
+import pytest
+
+from benchmark import synthetic_calendar
+from exact import score, score_schedule
+from local_search import local_search
+from optimize import greedy_scheduler
+
+def cost(slots, events) -> tuple[float, float]:
+    num_late, total_slot_priority, sooness = score_schedule(slots, events);
+    return (score(num_late, total_slot_priority), sooness);
+
+def greedy(n_events: int, n_slots: int, seed: int):
+    slots, events = synthetic_calendar(n_events, n_slots, seed);
+    for index, slot in enumerate(slots): slot.time_used = 15 * (index % 3 == 0);
+    greedy_scheduler(slots, events);
+    return (slots, events);
+
+@pytest.mark.parametrize('n_events, n_slots, seed', [(10, 28, 0), (30, 28, 1), (60, 40, 2), (100, 120, 3), (300, 400, 4)])
+def test_never_worse(n_events, n_slots, seed):
+    slots, events = greedy(n_events, n_slots, seed);
+    before = cost(slots, events);
+    local_search(slots, events);
+
+    assert cost(slots, events) <= (before[0] + 1e-9, before[1] + 1e-9);
+
+@pytest.mark.parametrize('seed', [5, 6, 7])
+def test_schedule_stays_valid(seed):
+    slots, events = greedy(80, 50, seed);
+    local_search(slots, events);
+
+    for event in events:
+        if not event.is_scheduled: continue;
+        assert event.min_time <= event.end - event.start <= event.max_time;
+        # inside the used part of some slot
+        assert any(slot.start <= event.start and event.end <= slot.adj_start for slot in slots);
+
+    placed = sorted((event.start, event.end) for event in events if event.is_scheduled);
+    for (_, end), (start, _) in zip(placed, placed[1:]):
+        assert end <= start;
+    # time used before greedy ran (pinned events) is never given back
+    assert all(slot.time_used >= 15 * (index % 3 == 0) for index, slot in enumerate(slots));
+
+def test_same_schedule_same_moves():
+    first, second = greedy(100, 60, 8), greedy(100, 60, 8);
+    moves = local_search(*first), local_search(*second);
+
+    assert moves[0] == moves[1] > 0;
+    assert [(event.start, event.end) for event in first[1]] == [(event.start, event.end) for event in second[1]];
+
+def test_improves_on_greedy():
+    slots, events = greedy(30, 28, 1);
+    before = cost(slots, events);
+
+    assert local_search(slots, events) > 0;
+    assert cost(slots, events)[0] < before[0];
+
+def test_no_passes_no_moves():
+    slots, events = greedy(30, 28, 1);
+    expected = deepcopy((slots, events));
+
+    assert local_search(slots, events, passes=0) == 0;
+    assert (slots, events) == expected;
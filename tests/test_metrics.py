@@ -0,0 +1,96 @@
+from time import monotonic, sleep
+
+import numpy as np
+
+from benchmark import synthetic_calendar
+from metrics import DEBUG_HOOKS, METRICS, Metrics, timed
+from optimize import EngineOptions, optimize_schedule, run_engine
+
+def test_render_is_prometheus_text():
+    metrics = Metrics();
+    metrics.inc('scheduler_runs_total', method='greedy', state='done');
+    metrics.inc('scheduler_runs_total', 2, state='done', method='greedy');
+    metrics.set('scheduler_generation', 7);
+    metrics.observe('save', 0.5);
+    metrics.observe('save', 0.25);
+    lines = metrics.render().splitlines();
+
+    assert '# TYPE scheduler_runs_total counter' in lines;
+    # labels are sorted, whatever order they came in
+    assert 'scheduler_runs_total{method="greedy",state="done"} 3' in lines;
+    assert 'scheduler_generation 7' in lines and '# TYPE scheduler_generation gauge' in lines;
+    assert 'scheduler_phase_seconds_sum{phase="save"} 0.750000' in lines;
+    assert 'scheduler_phase_seconds_count{phase="save"} 2' in lines;
+
+def test_merge_adds_counters_and_replaces_gauges():
+    here, there = Metrics(), Metrics();
+    for metrics in (here, there):
+        metrics.inc('scheduler_local_moves_total', 3);
+        metrics.observe('engine', 1.0);
+    here.set('scheduler_generation', 10);
+    there.set('scheduler_generation', 4);
+    here.merge(there.snapshot());
+
+    values, timings = here.snapshot();
+    assert values['scheduler_local_moves_total'][()] == 6;
+    assert values['scheduler_generation'][()] == 4;
+    assert timings['engine'] == [2.0, 2];
+
+def test_timed_counts_every_call():
+    METRICS.reset();
+    @timed('nap')
+    def nap(depth: int) -> None:
+        sleep(0.01);
+        if depth: nap(depth - 1);
+
+    nap(2);
+    with timed('nap'): pass;
+
+    seconds, count = METRICS.snapshot()[1]['nap'];
+    # the outer call holds its own start time while the inner ones run
+    assert count == 4 and 0.05 <= seconds < 1;
+
+def test_runs_are_counted():
+    slots, events = synthetic_calendar(40, 20, 0);
+    METRICS.reset();
+    result, report = run_engine('greedy', slots, events, EngineOptions());
+    values, timings = METRICS.snapshot();
+
+    assert values['scheduler_evaluations_total'][(('engine', 'greedy'),)] == report.evaluations;
+    assert values['scheduler_local_moves_total'][()] == report.local_moves;
+    assert values['scheduler_events_failed_total'][()] == sum(not event.is_scheduled for event in result.events);
+    assert timings['engine'][1] == timings['local_search'][1] == 1;
+
+def test_hooks_only_run_when_added():
+    slots, events = synthetic_calendar(5, 4, 0);
+    seen = [];
+    optimize_schedule(np.full(10, 0.5), slots, events);
+    assert seen == [];
+
+    DEBUG_HOOKS.append(lambda name, values: seen.append((name, sorted(values))));
+    try:
+        optimize_schedule(np.full(10, 0.5), slots, events);
+    finally:
+        DEBUG_HOOKS.clear();
+
+    assert seen == [('optimize_schedule', ['x']), ('optimize_schedule', ['slots'])];
+
+def test_metrics_endpoint(client):
+    response = client.get('/metrics');
+
+    assert response.status_code == 200;
+    assert response.mimetype == 'text/plain';
+    assert 'scheduler_jobs{state="running"} 0' in response.get_data(as_text=True).splitlines();
+
+def test_profile_endpoint(client):
+    assert client.get('/optimize_profile/nope').status_code == 404;
+
+    job = client.get('/optimize/greedy?profile=1').get_json()['job'];
+    deadline = monotonic() + 30;
+    while job['state'] in ('queued', 'running') and monotonic() < deadline:
+        sleep(0.05);
+        job = client.get(f"/optimize_status/{job['id']}").get_json();
+    response = client.get(f"/optimize_profile/{job['id']}");
+
+    assert job['state'] == 'done';
+    assert response.status_code == 200 and 'cumulative' in response.get_data(as_text=True);
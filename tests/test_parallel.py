@@ -0,0 +1,59 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from benchmark import synthetic_calendar
+from decoder import build_arrays, decode_permutations, decode_population
+from optimize import VectorizedSchedulerProblem
+from parallel import PopulationPool
+from permutation import from_random_keys
+
+@pytest.mark.parametrize('kind', ['process', 'thread'])
+@pytest.mark.parametrize('rows', [1, 3, 50])
+def test_pool_matches_serial(kind, rows):
+    slots, events = synthetic_calendar(40, 30, 0);
+    arrays = build_arrays(slots, events);
+    X = np.random.default_rng(rows).random((rows, 80));
+    decode = partial(decode_population, first_fit=True);
+
+    with PopulationPool(arrays, 4, kind, decode) as pool:
+        F, G = pool.evaluate(X);
+
+    expected_F, expected_G = decode(X, arrays);
+    np.testing.assert_array_equal(F, expected_F);
+    np.testing.assert_array_equal(G, expected_G);
+
+def test_pool_takes_the_permutation_decoder():
+    slots, events = synthetic_calendar(40, 30, 1);
+    arrays = build_arrays(slots, events);
+    X = from_random_keys(np.random.default_rng(1).random((20, 80)), arrays);
+
+    with PopulationPool(arrays, 2, 'process', decode_permutations) as pool:
+        F, G = pool.evaluate(X);
+
+    expected_F, expected_G = decode_permutations(X, arrays);
+    np.testing.assert_array_equal(F, expected_F);
+    np.testing.assert_array_equal(G, expected_G);
+
+def test_unknown_pool_kind():
+    with pytest.raises(ValueError):
+        PopulationPool(build_arrays(*synthetic_calendar(2, 2, 2)), 2, 'fiber');
+
+@pytest.mark.parametrize('encoding', ['random_key', 'permutation'])
+def test_problem_on_a_pool_matches_serial(encoding):
+    slots, events = synthetic_calendar(30, 20, 3);
+    serial = VectorizedSchedulerProblem(slots, events, encoding=encoding, first_fit=True);
+    pooled = VectorizedSchedulerProblem(slots, events, 2, 'process', encoding=encoding, first_fit=True);
+    X = np.random.default_rng(3).random((30, 60));
+    if encoding == 'permutation': X = from_random_keys(X, serial.arrays);
+
+    try:
+        expected, out = {}, {};
+        serial._evaluate(X, expected);
+        pooled._evaluate(X, out);
+    finally:
+        pooled.close();
+
+    np.testing.assert_array_equal(out['F'], expected['F']);
+    np.testing.assert_array_equal(out['G'], expected['G']);
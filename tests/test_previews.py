@@ -0,0 +1,28 @@
+from copy import deepcopy
+
+import pytest
+
+from benchmark import synthetic_calendar
+from exact import score, score_schedule
+from optimize import AnytimeCallback, EngineOptions, greedy_scheduler, run_engine
+
+def preview_scores(previews) -> list:
+    return [(score(preview.num_late, preview.slot_priority), preview.sooness) for preview in previews];
+
+@pytest.mark.parametrize('n_events, n_slots, seed', [(10, 28, 0), (30, 28, 1), (60, 120, 2)])
+def test_previews_only_improve_on_greedy(n_events, n_slots, seed):
+    slots, events = synthetic_calendar(n_events, n_slots, seed);
+    previews = [];
+    _, report = run_engine('genetic', deepcopy(slots), deepcopy(events), EngineOptions(callback=AnytimeCallback(previews.append), local_search=0));
+
+    greedy_slots, greedy_events = deepcopy(slots), deepcopy(events);
+    greedy_scheduler(greedy_slots, greedy_events);
+    num_late, total_slot_priority, sooness = score_schedule(greedy_slots, greedy_events);
+
+    scores = preview_scores(previews);
+    assert previews[0].generation == 0;
+    assert scores[0] == (score(num_late, total_slot_priority), sooness);
+    assert scores == sorted(scores, reverse=True) and len(set(scores)) == len(scores);
+
+    # the last preview scores like the schedule that comes back, ties aside it is that schedule
+    assert scores[-1] == pytest.approx((report.score, report.sooness));
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from random import Random
+
+import pytest
+
+from database import SchedulerStorage
+import routes.cal_routes as cal
+
+START = datetime(2020, 1, 1, 8, 0);
+
+@pytest.fixture(scope='module')
+def storage(tmp_path_factory):
+    """Five years of events and slots, analyzed so the planner sees a real history"""
+    rng = Random(0);
+    storage = SchedulerStorage(str(tmp_path_factory.mktemp('plans') / 'scheduler.db'));
+    conn = storage.get_db_connection();
+
+    events = [];
+    for index in range(5_000):
+        start = START + timedelta(days=rng.randint(0, 5 * 365), minutes=15 * rng.randint(0, 48));
+        events.append((f'event {index}', start.isoformat(), (start + timedelta(minutes=30)).isoformat(),
+                       (start + timedelta(days=1)).isoformat(), 30, 60, rng.randint(1, 5), rng.randint(0, 1)));
+    conn.executemany("""
+        INSERT INTO events (name, start, end, due_date, min_time, max_time, priority, completed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, events);
+
+    slots = [(START + timedelta(days=day, hours=hour), START + timedelta(days=day, hours=hour + 2), rng.randint(1, 5), rng.choice([None, 1, 2]))
+             for day in range(5 * 365) for hour in (0, 6)];
+    conn.executemany("INSERT INTO slots (start, end, time_used, priority, person_id) VALUES (?, ?, 0, ?, ?)", slots);
+
+    conn.commit();
+    conn.execute("ANALYZE");
+    conn.close();
+
+    yield storage;
+    storage.close();
+
+QUERIES = {
+    'month summary': (cal.DAILY_SUMMARY_QUERY, (*cal.month_days(2023, 6), None)),
+    'day events': (cal.DAY_EVENTS_QUERY, cal.day_bounds(2023, 6, 14)),
+    'week slots': (cal.WEEK_SLOTS_QUERY, (None, datetime(2023, 6, 11), datetime(2023, 6, 18))),
+};
+
+@pytest.mark.parametrize('name', list(QUERIES))
+def test_calendar_queries_use_an_index(storage, name):
+    query, params = QUERIES[name];
+    plan = storage.query_plan(query, params);
+
+    lookups = [detail for detail in plan if detail.startswith(('SEARCH', 'SCAN'))];
+    assert lookups;
+    assert all('USING' in detail and 'INDEX' in detail for detail in lookups), plan;
@@ -0,0 +1,120 @@
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+import pytest
+
+from database import SchedulerStorage
+from model import Slot
+from optimize import Scheduler
+from recurrence import SlotTemplate, expand_templates, template_slots, with_templates
+
+MONDAY = datetime(2030, 1, 7);
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SchedulerStorage(str(tmp_path / 'scheduler.db'));
+    yield storage;
+    storage.close();
+
+def template(id: int, weekday: int, hour: int, **fields) -> SlotTemplate:
+    return SlotTemplate(id, weekday, hour * 60, 90, 2, fields.pop('valid_from', MONDAY.date()), **fields);
+
+def starts(slots) -> list:
+    return [slot.start for slot in slots];
+
+def test_templates_repeat_weekly():
+    templates = [template(1, 0, 9), template(2, 2, 14), template(3, 0, 8, valid_until=date(2030, 1, 21))];
+    slots = list(expand_templates(templates, MONDAY, MONDAY + timedelta(weeks=3), set()));
+
+    assert starts(slots) == [
+        MONDAY + timedelta(hours=8), MONDAY + timedelta(hours=9), MONDAY + timedelta(days=2, hours=14),
+        MONDAY + timedelta(days=7, hours=8), MONDAY + timedelta(days=7, hours=9), MONDAY + timedelta(days=9, hours=14),
+        MONDAY + timedelta(days=14, hours=9), MONDAY + timedelta(days=16, hours=14),
+    ];
+    assert all(slot.end - slot.start == timedelta(minutes=90) and slot.time_used == 0 for slot in slots);
+    # ids are negative and unique, so they never meet a slot row's
+    assert len({slot.id for slot in slots}) == len(slots) and max(slot.id for slot in slots) < 0;
+
+def test_expansion_keeps_to_the_range():
+    templates = [template(1, 0, 9), template(2, 3, 9, valid_from=date(2030, 1, 14))];
+    slots = list(expand_templates(templates, MONDAY + timedelta(hours=10), MONDAY + timedelta(days=10, hours=9), set()));
+
+    # the first Monday's slot starts before the range, the first Thursday is before valid_from
+    # and the second starts right at its end
+    assert starts(slots) == [MONDAY + timedelta(days=7, hours=9)];
+
+def test_skipped_days_and_people():
+    templates = [template(1, 0, 9), template(2, 0, 9, person_id=4)];
+    slots = list(expand_templates(templates, MONDAY, MONDAY + timedelta(weeks=2), {(None, MONDAY.date()), (4, date(2030, 1, 14))}));
+
+    assert [(slot.person_id, slot.start.date()) for slot in slots] == [(4, date(2030, 1, 7)), (None, date(2030, 1, 14))];
+
+def test_expansion_is_lazy():
+    slots = expand_templates([template(1, 0, 9)], MONDAY, datetime(9999, 1, 1), set());
+
+    assert starts(islice(slots, 2)) == [MONDAY + timedelta(hours=9), MONDAY + timedelta(days=7, hours=9)];
+
+def test_saved_templates_expand(storage):
+    conn = storage.get_db_connection();
+    cursor = conn.cursor();
+    storage.replace_templates(cursor, MONDAY, [(0, 540, 90, 2), (1, 600, 60, 3)]);
+    # a new pattern from the third week on ends the first one there
+    storage.replace_templates(cursor, MONDAY + timedelta(weeks=2), [(4, 480, 30, 1)]);
+    storage.replace_slots(cursor, MONDAY + timedelta(days=7), MONDAY + timedelta(days=8), [(MONDAY + timedelta(days=7, hours=13), MONDAY + timedelta(days=7, hours=14), 5)]);
+    storage.skip_templates(cursor, MONDAY + timedelta(days=8), MONDAY + timedelta(days=9));
+    conn.commit();
+
+    cursor.execute("SELECT start, end, priority FROM slots");
+    rows = [Slot(datetime.fromisoformat(row['start']), datetime.fromisoformat(row['end']), row['priority'], 0) for row in cursor.fetchall()];
+    slots = list(template_slots(cursor, MONDAY, MONDAY + timedelta(weeks=4), rows));
+    conn.close();
+
+    assert starts(slots) == [
+        MONDAY + timedelta(hours=9), MONDAY + timedelta(days=1, hours=10),
+        # the second week's Monday has a slot row and its Tuesday an exception
+        MONDAY + timedelta(days=18, hours=8), MONDAY + timedelta(days=25, hours=8),
+    ];
+
+def test_with_templates_sorts_like_the_loaders(storage):
+    conn = storage.get_db_connection();
+    cursor = conn.cursor();
+    storage.replace_templates(cursor, MONDAY, [(0, 540, 90, 1), (2, 540, 90, 4)]);
+    rows = [Slot(MONDAY + timedelta(days=1, hours=9), MONDAY + timedelta(days=1, hours=10), 3, 0)];
+    slots = with_templates(cursor, rows, MONDAY, MONDAY + timedelta(days=7));
+    # nothing to add hands back the same list
+    unchanged = with_templates(cursor, rows, MONDAY + timedelta(days=1), MONDAY + timedelta(days=2));
+    conn.close();
+
+    assert [(slot.priority, slot.start.weekday()) for slot in slots] == [(1, 0), (3, 1), (4, 2)];
+    assert unchanged is rows;
+
+def test_scheduler_loads_template_slots(storage):
+    week = datetime.combine(date.today() + timedelta(days=7 - date.today().weekday()), datetime.min.time());
+    conn = storage.get_db_connection();
+    cursor = conn.cursor();
+    storage.replace_templates(cursor, week, [(weekday, 540, 120, 2) for weekday in range(5)]);
+    cursor.execute("""
+        INSERT INTO events (name, due_date, min_time, max_time, priority)
+        VALUES ('report', ?, 60, 60, 3)
+    """, ((week + timedelta(weeks=2)).isoformat(),));
+    conn.commit();
+    conn.close();
+
+    slots = Scheduler(storage).slots;
+
+    # two weeks of weekdays up to the due date, without a slot row written
+    assert len(slots) == 10 and all(slot.id < 0 for slot in slots);
+    assert all(slot.start.weekday() < 5 and slot.start.hour == 9 for slot in slots);
+
+def test_saved_week_becomes_the_template(client):
+    week = {'date': [2030, 1, 8], 'slots': [{'slot_year': 2030, 'slot_month': 1, 'slot_day': 8, 'start': 600, 'duration': 60, 'priority': 2}]};
+    assert client.post('/save_slots', json=week).status_code == 200;
+    assert client.post('/save_template', json={'date': [2030, 1, 8]}).get_json()['slots'] == 1;
+
+    later = client.get('/get_slots?year=2030&month=2&day=5').get_json()['slots'];
+    assert later == [{'start': 120, 'duration': 60, 'day': 5, 'priority': 2}];
+
+    # a week saved empty stays empty
+    assert client.post('/save_slots', json={'date': [2030, 2, 5], 'slots': []}).status_code == 200;
+    assert client.get('/get_slots?year=2030&month=2&day=5').get_json()['slots'] == [];
+    assert client.get('/get_slots?year=2030&month=2&day=12').get_json()['slots'] != [];
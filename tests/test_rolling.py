@@ -0,0 +1,39 @@
+from copy import deepcopy
+from dataclasses import replace
+from datetime import timedelta
+
+import pytest
+
+from benchmark import synthetic_calendar
+from optimize import EngineOptions, ENGINES, rolling_horizon, solved_slots
+
+def twin_calendar(n_events: int, n_slots: int, seed: int):
+    """A synthetic calendar where every slot has a shorter, lower priority twin starting with it"""
+    slots, events = synthetic_calendar(n_events, n_slots, seed);
+    twins = [replace(slot, end=slot.start + (slot.end - slot.start) / 2, priority=min(slot.priority + 1, 5), id=slot.id + n_slots) for slot in slots];
+
+    return (slots + twins, events);
+
+def test_one_window_matches_the_engine():
+    slots, events = twin_calendar(40, 28, 0);
+    whole = ENGINES['greedy'](deepcopy(slots), deepcopy(events), EngineOptions());
+    rolled = rolling_horizon('greedy', deepcopy(slots), deepcopy(events), EngineOptions(window_days=365));
+
+    assert [slot.time_used for slot in rolled.slots] == [slot.time_used for slot in whole.slots];
+    assert [(event.start, event.end) for event in rolled.events] == [(event.start, event.end) for event in whole.events];
+
+@pytest.mark.parametrize('method, window_days, overlap_days', [('greedy', 3, 1), ('greedy', 7, 0), ('genetic', 4, 2)])
+def test_windows_keep_every_slot_prefix(method, window_days, overlap_days):
+    slots, events = twin_calendar(120, 120, 1);
+    result = rolling_horizon(method, deepcopy(slots), deepcopy(events), EngineOptions(window_days=window_days, overlap_days=overlap_days));
+    scheduled = [event for event in result.events if event.is_scheduled];
+
+    # every placement sits in the used prefix of a slot of its own
+    assert len(solved_slots(slots, result.slots, scheduled)) == len(scheduled);
+    assert sum(slot.time_used for slot in result.slots) >= sum((event.end - event.start) // timedelta(minutes=1) for event in scheduled);
+
+def test_negative_window_is_rejected(client):
+    response = client.get('/optimize/greedy?window=-3');
+
+    assert response.status_code == 400;
+    assert 'error' in response.get_json();
@@ -0,0 +1,64 @@
+from dataclasses import replace
+from datetime import datetime, timedelta
+from sqlite3 import connect, Row
+
+import numpy as np
+
+from benchmark import synthetic_calendar
+from decoder import to_minutes
+from model import TimeWindow
+from tables import NO_TIME, EventTable, SlotTable, minutes_array, split_windows, to_datetimes
+
+def slot_rows(slots) -> list:
+    """sqlite3.Row objects of (id, start, end, priority), the way the app reads them"""
+    conn = connect(':memory:');
+    conn.row_factory = Row;
+    conn.execute("CREATE TABLE slots (id INTEGER, start DATETIME, end DATETIME, priority INTEGER)");
+    conn.executemany("INSERT INTO slots VALUES (?, ?, ?, ?)", [(slot.id, slot.start.isoformat(), slot.end.isoformat(), slot.priority) for slot in slots]);
+    return conn.execute("SELECT id, start, end, priority FROM slots").fetchall();
+
+def test_minutes_match_the_decoder():
+    values = [datetime(2030, 1, 7, 8, 15), datetime(1999, 12, 31, 23, 59, 59), datetime(2030, 6, 1)];
+
+    assert minutes_array(values).tolist() == [to_minutes(value) for value in values];
+    assert minutes_array([value.isoformat() for value in values]).tolist() == [to_minutes(value) for value in values];
+    assert to_datetimes(minutes_array(values[:1])) == values[:1];
+
+def test_slots_round_trip():
+    slots, _ = synthetic_calendar(0, 40, 0);
+    slots = [replace(slot, time_used=index % 4 * 15, person_id=None if index % 3 else index) for index, slot in enumerate(slots)];
+    table = SlotTable.from_models(slots);
+
+    assert table.to_models() == slots;
+    assert table.capacity.tolist() == [slot.capacity // timedelta(minutes=1) for slot in slots];
+    assert to_datetimes(table.adj_start) == [slot.adj_start for slot in slots];
+
+def test_slot_rows_match_models():
+    slots, _ = synthetic_calendar(0, 10, 1);
+    table = SlotTable.from_rows(slot_rows(slots));
+    expected = SlotTable.from_models(slots);
+
+    for name in ('id', 'start', 'end', 'priority', 'time_used', 'person'):
+        np.testing.assert_array_equal(getattr(table, name), getattr(expected, name));
+
+def test_events_round_trip():
+    _, events = synthetic_calendar(30, 10, 2);
+    events[0].schedule_event(datetime(2030, 1, 7, 9), datetime(2030, 1, 7, 9) + events[0].min_time);
+    table = EventTable.from_models(events);
+
+    assert table.scheduled.tolist() == [True] + [False] * 29;
+    assert table.start[1] == NO_TIME;
+    assert table.placements() == {events[0].id: (events[0].start, events[0].end)};
+    # models come back unscheduled, the way the optimizer wants them
+    assert table.to_models() == [replace(event, start=None, end=None, is_scheduled=False) for event in events];
+
+def test_split_windows():
+    joined = [
+        {'id': 1, 'window_start': '2030-01-07T09:00:00', 'window_end': '2030-01-07T12:00:00', 'window_priority': 1},
+        {'id': 1, 'window_start': '2030-01-08T09:00:00', 'window_end': '2030-01-08T12:00:00', 'window_priority': 2},
+        {'id': 2, 'window_start': None, 'window_end': None, 'window_priority': None},
+    ];
+    events, windows = split_windows(joined);
+
+    assert [event['id'] for event in events] == [1, 2];
+    assert windows == {1: [TimeWindow(datetime(2030, 1, 7, 9), datetime(2030, 1, 7, 12), 1), TimeWindow(datetime(2030, 1, 8, 9), datetime(2030, 1, 8, 12), 2)]};
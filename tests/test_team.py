@@ -0,0 +1,72 @@
+from collections import Counter
+from copy import deepcopy
+
+import pytest
+
+from benchmark import team_calendar
+from metrics import METRICS
+from optimize import EngineOptions
+from team import attendees_of, partition, solve_team
+
+def counted(name: str) -> float:
+    values, _ = METRICS.snapshot();
+    return sum(values.get(name, {}).values());
+
+@pytest.mark.parametrize('workers, pool_kind', [(0, 'process'), (2, 'thread'), (2, 'process')])
+def test_metrics_count_every_cluster(workers, pool_kind):
+    clusters = partition(*team_calendar(8, 2, 6, 0.0, 0));
+    METRICS.reset();
+    _, _, report = solve_team(clusters, 'greedy', EngineOptions(), workers, pool_kind);
+
+    assert counted('scheduler_evaluations_total') == report.evaluations > 1;
+    assert counted('scheduler_local_moves_total') == report.local_moves;
+    # one engine run timed per cluster, wherever it ran
+    assert METRICS.snapshot()[1]['engine'][1] == len(clusters);
+
+def test_partition_keeps_people_apart():
+    slots, events = team_calendar(12, 4, 5, 0.3, 1);
+    clusters = partition(slots, events);
+    people = Counter(person for cluster in clusters for person in cluster.people);
+
+    assert sorted(id(event) for cluster in clusters for event in cluster.events) == sorted(id(event) for event in events);
+    assert max(people.values()) == 1;
+    # meetings never cross teams of 4
+    assert all(len({(person - 1) // 4 for person in cluster.people}) == 1 for cluster in clusters);
+
+    for cluster in clusters:
+        assert all(set(attendees_of(event)) <= set(cluster.people) for event in cluster.events);
+        assert all(slot.person_id in cluster.people for slot in cluster.slots);
+        # list order is kept, it is the order the engines fill in
+        members = {id(event) for event in cluster.events};
+        assert [id(event) for event in cluster.events] == [id(event) for event in events if id(event) in members];
+
+def test_people_without_events_are_left_out():
+    slots, events = team_calendar(6, 3, 4, 0.0, 2);
+    events = [event for event in events if event.attendees != [6]];
+    clusters = partition(slots, events);
+
+    assert all(6 not in cluster.people for cluster in clusters);
+    assert all(slot.person_id != 6 for cluster in clusters for slot in cluster.slots);
+
+@pytest.mark.parametrize('workers, pool_kind', [(0, 'process'), (3, 'thread'), (3, 'process')])
+def test_nobody_is_double_booked(workers, pool_kind):
+    slots, events = team_calendar(12, 4, 8, 0.4, 3);
+    events, slots, _ = solve_team(partition(slots, events), 'greedy', EngineOptions(), workers, pool_kind);
+    assert any(len(event.attendees) > 1 and event.is_scheduled for event in events);
+
+    for person in {slot.person_id for slot in slots}:
+        booked = sorted((event.start, event.end) for event in events if event.is_scheduled and person in attendees_of(event));
+        for (_, end), (start, _) in zip(booked, booked[1:]):
+            assert end <= start;
+
+        # each booking sits in the used part of one of this person's slots
+        used = [(slot.start, slot.adj_start) for slot in slots if slot.person_id == person];
+        for start, end in booked:
+            assert any(slot_start <= start and end <= used_until for slot_start, used_until in used);
+
+def test_pool_matches_sequential():
+    slots, events = team_calendar(12, 4, 8, 0.4, 4);
+    expected, _, _ = solve_team(partition(*deepcopy((slots, events))), 'greedy', EngineOptions());
+    pooled, _, _ = solve_team(partition(*deepcopy((slots, events))), 'greedy', EngineOptions(), 3, 'process');
+
+    assert sorted((event.id, event.start, event.end) for event in pooled) == sorted((event.id, event.start, event.end) for event in expected);
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from view_cache import ViewCache
+
+DAY = datetime(2030, 3, 14, 9);
+DAY_ARGS = 'year=2030&month=3&day=14';
+
+def put(cache: ViewCache, key: tuple, body: bytes = b'view') -> None:
+    cache.put(key, body, 'text/html', cache.epoch);
+
+def add_scheduled(name: str, start: datetime) -> int:
+    """An event placed at start, straight into the app's database"""
+    import server;
+    conn = server.storage.get_db_connection();
+    try:
+        cursor = conn.execute("""
+            INSERT INTO events (name, start, end, due_date, min_time, max_time, priority)
+            VALUES (?, ?, ?, ?, 30, 30, 3)
+        """, (name, start.isoformat(), (start + timedelta(minutes=30)).isoformat(), (start + timedelta(days=2)).isoformat()));
+        conn.commit();
+        return cursor.lastrowid;
+    finally:
+        conn.close();
+
+def test_least_recently_used_goes_first():
+    cache = ViewCache(size=2);
+    put(cache, ('day', 2030, 3, 1));
+    put(cache, ('day', 2030, 3, 2));
+    cache.get(('day', 2030, 3, 1));
+    put(cache, ('day', 2030, 3, 3));
+
+    assert list(cache.views) == [('day', 2030, 3, 1), ('day', 2030, 3, 3)];
+
+def test_invalidate_drops_only_the_prefix():
+    cache = ViewCache();
+    keys = [('month', 2030, 3, 'today'), ('month', 2030, 4, 'today'), ('day', 2030, 3, 14), ('slots', None, 'monday')];
+    for key in keys: put(cache, key);
+    cache.invalidate('month', 2030, 3);
+
+    assert list(cache.views) == keys[1:];
+
+def test_views_read_before_a_write_are_not_kept():
+    cache = ViewCache();
+    epoch = cache.epoch;
+    cache.invalidate('day', 2030, 3, 14);
+    view = cache.put(('day', 2030, 3, 14), b'stale', 'text/html', epoch);
+
+    # the caller still gets its response, it just is not cached
+    assert view.body == b'stale' and not cache.views;
+
+def test_matching_etag_gets_304(client):
+    add_scheduled('dentist', DAY);
+    first = client.get(f'/events_on_day?{DAY_ARGS}');
+    again = client.get(f'/events_on_day?{DAY_ARGS}', headers={'If-None-Match': first.headers['ETag']});
+
+    assert first.status_code == 200 and [event['name'] for event in first.get_json()] == ['dentist'];
+    assert again.status_code == 304 and again.get_data() == b'';
+    assert client.get(f'/events_on_day?{DAY_ARGS}', headers={'If-None-Match': '"other"'}).status_code == 200;
+
+def test_writes_refresh_the_views_they_touch(client):
+    event_id = add_scheduled('dentist', DAY);
+    day, month = client.get(f'/events_on_day?{DAY_ARGS}'), client.get('/?year=2030&month=3');
+    other_day = client.get('/events_on_day?year=2030&month=3&day=15');
+
+    assert client.post(f'/set_done/{event_id}/1').status_code == 200;
+
+    assert client.get(f'/events_on_day?{DAY_ARGS}', headers={'If-None-Match': day.headers['ETag']}).get_json()[0]['completed'] == 1;
+    assert client.get('/?year=2030&month=3', headers={'If-None-Match': month.headers['ETag']}).status_code == 200;
+    # a day the event is not on keeps its cached view
+    assert client.get('/events_on_day?year=2030&month=3&day=15', headers={'If-None-Match': other_day.headers['ETag']}).status_code == 304;
+
+    assert client.delete(f'/delete_event/{event_id}').status_code == 200;
+    assert client.get(f'/events_on_day?{DAY_ARGS}').get_json() == [];
+
+def test_saved_slots_show_up(client):
+    week = {'date': [2030, 3, 14], 'slots': [{'slot_year': 2030, 'slot_month': 3, 'slot_day': 12, 'start': 600, 'duration': 90, 'priority': 2}]};
+    empty = client.get(f'/get_slots?{DAY_ARGS}');
+    assert empty.get_json() == {'slots': []};
+
+    assert client.post('/save_slots', json=week).status_code == 200;
+    saved = client.get(f'/get_slots?{DAY_ARGS}', headers={'If-None-Match': empty.headers['ETag']});
+
+    assert saved.status_code == 200;
+    assert saved.get_json()['slots'] == [{'start': 120, 'duration': 90, 'day': 12, 'priority': 2}];
+    # saving the same week again changes nothing, and keeps the cached view
+    assert client.post('/save_slots', json=week).status_code == 200;
+    assert client.get(f'/get_slots?{DAY_ARGS}', headers={'If-None-Match': saved.headers['ETag']}).status_code == 304;